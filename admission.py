@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_USER_RATE_PER_MIN = float(os.getenv("LLM_USER_RATE_PER_MIN", "6"))
+LLM_USER_BURST = int(os.getenv("LLM_USER_BURST", "3"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "20"))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class Admission:
+    def __init__(self, admitted, reason="", waited=0.0):
+        self.admitted = admitted
+        self.reason = reason  # "", "rate_limited" or "saturated"
+        self.waited = waited
+
+
+class AdmissionController:
+    """Process-wide gate in front of the ScaleDown + Gemini pipeline.
+
+    - At most `max_concurrency` calls run at once.
+    - Each user draws from their own token bucket, so one tenant cannot
+      drain the shared quota. With a `store` the buckets live there and
+      are shared by every replica; the concurrency limit stays per process.
+    - Waiting callers are served round-robin across users (a fair queue):
+      a user with ten queued questions does not delay someone with one.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY,
+                 rate_per_min=LLM_USER_RATE_PER_MIN,
+                 burst=LLM_USER_BURST, max_wait=LLM_QUEUE_TIMEOUT, store=None):
+        self.max_concurrency = max_concurrency
+        self.rate = rate_per_min / 60.0
+        self.burst = burst
+        self.max_wait = max_wait
+        self.store = store
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queues = OrderedDict()  # user_id -> deque of waiting tickets
+        self._buckets = {}
+        self._waits = deque(maxlen=500)
+        self._counts = {"admitted": 0, "rate_limited": 0, "saturated": 0, "cancelled": 0}
+
+    def _next_ticket(self):
+        for q in self._queues.values():
+            return q[0]
+        return None
+
+    def _dequeue(self, user_id, ticket):
+        q = self._queues.get(user_id)
+        if q is None:
+            return
+        try:
+            q.remove(ticket)
+        except ValueError:
+            pass
+        if q:
+            # Rotate the user to the back so other users get the next slot
+            self._queues.move_to_end(user_id)
+        else:
+            del self._queues[user_id]
+
+    def _take_token(self, user_id):
+        if self.store is not None:
+            try:
+                return self.store.take_token(f"ratelimit:{user_id}", self.rate, self.burst)
+            except Exception:
+                pass  # store unreachable: fall back to this process's buckets
+        with self._cond:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(self.rate, self.burst)
+            return bucket.take()
+
+    def acquire(self, user_id, deadline=None):
+        """`deadline` (deadline.Deadline) shortens the wait to the turn's
+        remaining budget; cancelling it takes the caller out of the queue."""
+        start = time.monotonic()
+        allowed = self._take_token(user_id)
+        with self._cond:
+            if not allowed:
+                self._counts["rate_limited"] += 1
+                return Admission(False, "rate_limited")
+
+            ticket = object()
+            self._queues.setdefault(user_id, deque()).append(ticket)
+            give_up = start + self.max_wait
+            if deadline is not None:
+                give_up = min(give_up, time.monotonic() + deadline.remaining())
+            while not (self._next_ticket() is ticket and self._active < self.max_concurrency):
+                remaining = give_up - time.monotonic()
+                reason = "cancelled" if deadline is not None and deadline.cancelled else \
+                    "saturated" if remaining <= 0 else None
+                if reason:
+                    self._dequeue(user_id, ticket)
+                    self._counts[reason] += 1
+                    self._cond.notify_all()
+                    return Admission(False, reason, time.monotonic() - start)
+                # Wake up now and then to notice a cancelled deadline
+                self._cond.wait(remaining if deadline is None else min(remaining, 0.25))
+
+            self._dequeue(user_id, ticket)
+            self._active += 1
+            waited = time.monotonic() - start
+            self._waits.append(waited)
+            self._counts["admitted"] += 1
+            self._cond.notify_all()
+            return Admission(True, "", waited)
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, user_id, deadline=None):
+        admission = self.acquire(user_id, deadline)
+        try:
+            yield admission
+        finally:
+            if admission.admitted:
+                self.release()
+
+    def stats(self):
+        with self._cond:
+            waits = sorted(self._waits)
+            depth = sum(len(q) for q in self._queues.values())
+            return {
+                "active": self._active,
+                "queue_depth": depth,
+                "waiting_users": len(self._queues),
+                "avg_wait": sum(waits) / len(waits) if waits else 0.0,
+                "p95_wait": waits[int(len(waits) * 0.95) - 1] if waits else 0.0,
+                **self._counts,
+            }
+
+
+def _shared_controller():
+    from shared_store import get_store
+
+    try:
+        return AdmissionController(store=get_store())
+    except Exception:
+        return AdmissionController()
+
+
+# Shared by every Streamlit session in this process; rate limits are shared
+# across processes through the store
+controller = _shared_controller()
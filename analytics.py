@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANALYTICS_DB_PATH = os.getenv(
+    "ANALYTICS_DB_PATH",
+    os.path.join(os.path.dirname(__file__), ".analytics.db"),
+)
+ANALYTICS_REFRESH_SECONDS = float(os.getenv("ANALYTICS_REFRESH_SECONDS", "30"))
+
+# (table, high-water-mark column) pairs the aggregates are fed from
+FEEDS = {
+    "payments": ("payments", "created_at"),
+    "complaints_opened": ("complaints", "date"),
+    "complaints_resolved": ("complaints", "resolved_at"),
+    "feedback": ("feedback", "date"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (feed TEXT PRIMARY KEY, hwm TEXT, ids_at_hwm TEXT);
+CREATE TABLE IF NOT EXISTS daily_collections (day TEXT PRIMARY KEY, amount REAL, payments INTEGER);
+CREATE TABLE IF NOT EXISTS daily_complaints (day TEXT PRIMARY KEY, opened INTEGER, resolved INTEGER);
+CREATE TABLE IF NOT EXISTS feedback_ratings (month TEXT, rating INTEGER, count INTEGER,
+                                             PRIMARY KEY (month, rating));
+"""
+
+
+def _day(series):
+    return pd.to_datetime(series, errors="coerce", utc=True).dt.strftime("%Y-%m-%d")
+
+
+class Analytics:
+    """Pre-aggregated admin metrics kept in a small local SQLite file.
+
+    Each feed remembers the highest timestamp it has consumed; `refresh()`
+    only asks Supabase for rows at or after that mark and folds them into the
+    daily/monthly aggregates. Reading a chart never touches the base tables,
+    so cost stays flat as payment and complaint history grows.
+    """
+
+    def __init__(self, path=ANALYTICS_DB_PATH, fetch=None):
+        self.path = path
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._last_refresh = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def _fetch_since(self, table, column, since):
+        if self._fetch is None:
+            from database import get_rows_since
+            self._fetch = get_rows_since
+        return self._fetch(table, column, since)
+
+    def _new_rows(self, feed):
+        table, column = FEEDS[feed]
+        row = self._conn.execute(
+            "SELECT hwm, ids_at_hwm FROM watermarks WHERE feed = ?", (feed,)
+        ).fetchone()
+        hwm, seen = (row[0], set(row[1].split(","))) if row else (None, set())
+        rows = [r for r in self._fetch_since(table, column, hwm)
+                if r.get(column) and str(r.get("id")) not in seen]
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows)
+        # Rows sharing the newest timestamp are remembered by id, so a later
+        # fetch starting at that timestamp doesn't count them twice
+        new_hwm = df[column].max()
+        at_hwm = df.loc[df[column] == new_hwm, "id"].astype(str)
+        ids = set(at_hwm) | (seen if new_hwm == hwm else set())
+        self._conn.execute(
+            "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+            (feed, new_hwm, ",".join(sorted(ids))),
+        )
+        return df
+
+    def _add(self, table, key, frame):
+        cols = list(frame.columns)
+        updates = ", ".join(f"{c} = {c} + excluded.{c}" for c in cols if c not in key)
+        self._conn.executemany(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+            f" ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}",
+            frame.itertuples(index=False, name=None),
+        )
+
+    def refresh(self, force=False):
+        if not force and time.monotonic() - self._last_refresh < ANALYTICS_REFRESH_SECONDS:
+            return
+        with self._lock:
+            pay = self._new_rows("payments")
+            if not pay.empty:
+                day = _day(pay["date"] if "date" in pay else pay["created_at"]).fillna(_day(pay["created_at"]))
+                agg = pd.DataFrame({"day": day, "amount": pd.to_numeric(pay["amount"], errors="coerce").fillna(0.0)})
+                agg = agg.groupby("day").agg(amount=("amount", "sum"), payments=("amount", "size")).reset_index()
+                self._add("daily_collections", ["day"], agg)
+
+            opened = self._new_rows("complaints_opened")
+            if not opened.empty:
+                agg = opened.groupby(_day(opened["date"])).size().rename("opened").reset_index()
+                agg.columns = ["day", "opened"]
+                self._add("daily_complaints", ["day"], agg.assign(resolved=0))
+
+            resolved = self._new_rows("complaints_resolved")
+            if not resolved.empty:
+                agg = resolved.groupby(_day(resolved["resolved_at"])).size().reset_index()
+                agg.columns = ["day", "resolved"]
+                self._add("daily_complaints", ["day"], agg.assign(opened=0)[["day", "opened", "resolved"]])
+
+            fb = self._new_rows("feedback")
+            if not fb.empty:
+                month = pd.to_datetime(fb["date"], errors="coerce", utc=True).dt.strftime("%Y-%m")
+                agg = fb.assign(month=month, rating=pd.to_numeric(fb["rating"], errors="coerce"))
+                agg = agg.dropna(subset=["rating"]).astype({"rating": int})
+                agg = agg.groupby(["month", "rating"]).size().rename("count").reset_index()
+                self._add("feedback_ratings", ["month", "rating"], agg)
+
+            self._conn.commit()
+            self._last_refresh = time.monotonic()
+
+    def _read(self, sql):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn)
+
+    def daily_collections(self):
+        df = self._read("SELECT day, amount, payments FROM daily_collections ORDER BY day")
+        df["day"] = pd.to_datetime(df["day"])
+        return df
+
+    def monthly_collections(self):
+        df = self._read(
+            "SELECT substr(day, 1, 7) AS month, SUM(amount) AS amount, SUM(payments) AS payments"
+            " FROM daily_collections GROUP BY month ORDER BY month"
+        )
+        df["month"] = pd.to_datetime(df["month"])
+        return df
+
+    def complaint_trend(self):
+        df = self._read(
+            "SELECT substr(day, 1, 7) AS month, SUM(opened) AS opened, SUM(resolved) AS resolved"
+            " FROM daily_complaints GROUP BY month ORDER BY month"
+        )
+        df["month"] = pd.to_datetime(df["month"])
+        return df
+
+    def rating_distribution(self):
+        return self._read(
+            "SELECT rating, SUM(count) AS count FROM feedback_ratings GROUP BY rating ORDER BY rating"
+        )
+
+    def totals(self):
+        row = self._read(
+            "SELECT (SELECT COALESCE(SUM(amount), 0) FROM daily_collections) AS collected,"
+            " (SELECT COALESCE(SUM(opened), 0) FROM daily_complaints) AS opened,"
+            " (SELECT COALESCE(SUM(resolved), 0) FROM daily_complaints) AS resolved"
+        ).iloc[0]
+        opened, resolved = int(row["opened"]), int(row["resolved"])
+        return {
+            "collected": float(row["collected"]),
+            "complaints_opened": opened,
+            "complaints_resolved": resolved,
+            "resolve_rate": resolved / opened if opened else 0.0,
+        }
+
+
+_analytics = None
+_init_lock = threading.Lock()
+
+
+def get_analytics():
+    global _analytics
+    if _analytics is None:
+        with _init_lock:
+            if _analytics is None:
+                _analytics = Analytics()
+    _analytics.refresh()
+    return _analytics
+
+
+def collections_chart(analytics):
+    import altair as alt
+
+    df = analytics.monthly_collections()
+    return alt.Chart(df).mark_bar(color="#4a7fe8").encode(
+        x=alt.X("yearmonth(month):T", title="Month"),
+        y=alt.Y("amount:Q", title="Collected"),
+        tooltip=[alt.Tooltip("yearmonth(month):T", title="Month"), "amount:Q", "payments:Q"],
+    ).properties(height=240)
+
+
+def complaints_chart(analytics):
+    import altair as alt
+
+    df = analytics.complaint_trend().melt("month", var_name="status", value_name="count")
+    return alt.Chart(df).mark_line(point=True).encode(
+        x=alt.X("yearmonth(month):T", title="Month"),
+        y=alt.Y("count:Q", title="Complaints"),
+        color=alt.Color("status:N", scale=alt.Scale(range=["#c49a3a", "#3a7d5c"])),
+    ).properties(height=240)
+
+
+def ratings_chart(analytics):
+    import altair as alt
+
+    df = analytics.rating_distribution()
+    return alt.Chart(df).mark_bar(color="#f6b26b").encode(
+        x=alt.X("rating:O", title="Rating"),
+        y=alt.Y("count:Q", title="Responses"),
+    ).properties(height=200)
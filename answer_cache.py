@@ -0,0 +1,116 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "86400"))
+# How long an answer that finished after its asker gave up is served as-is
+LATE_ANSWER_TTL = int(os.getenv("LATE_ANSWER_TTL", "600"))
+
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace so trivial
+    variations of the same question share a cache entry."""
+    text = re.sub(r"[^a-z0-9\s]", " ", (question or "").lower())
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """Small thread-safe LRU of recent Gemini answers keyed on the
+    normalized question. Used to serve degraded answers under load.
+
+    With a `store` (see shared_store.py) the LRU sits in front of a shared
+    cache, so an answer generated on one replica is available on all of
+    them. Store errors are ignored; the local LRU keeps working.
+    """
+
+    def __init__(self, max_entries=256, store=None, ttl=ANSWER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.store = store
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._late = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, answer):
+        with self._lock:
+            self._data[key] = answer
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                return self._data[key]
+        if self.store is not None and key:
+            try:
+                answer = self.store.get(f"answer:{key}")
+            except Exception:
+                answer = None
+            if answer:
+                self._remember(key, answer)
+                return answer
+        return None
+
+    def put(self, question, answer):
+        key = normalize_question(question)
+        if not key:
+            return
+        self._remember(key, answer)
+        if self.store is not None:
+            try:
+                self.store.set(f"answer:{key}", answer, self.ttl)
+            except Exception:
+                pass
+
+
+    def put_late(self, question, answer):
+        """Keep an answer whose asker stopped waiting. Besides the regular
+        entry, get_late() hands it straight to the next ask of the same
+        question for LATE_ANSWER_TTL seconds instead of calling Gemini again."""
+        self.put(question, answer)
+        key = normalize_question(question)
+        if not key:
+            return
+        with self._lock:
+            self._late[key] = (answer, time.time() + LATE_ANSWER_TTL)
+            self._late.move_to_end(key)
+            while len(self._late) > self.max_entries:
+                self._late.popitem(last=False)
+        if self.store is not None:
+            try:
+                self.store.set(f"late:{key}", answer, LATE_ANSWER_TTL)
+            except Exception:
+                pass
+
+    def get_late(self, question):
+        key = normalize_question(question)
+        with self._lock:
+            answer, expires = self._late.get(key, (None, 0))
+        if answer and expires > time.time():
+            return answer
+        if self.store is not None and key:
+            try:
+                return self.store.get(f"late:{key}")
+            except Exception:
+                return None
+        return None
+
+
+def _shared_answer_cache():
+    from shared_store import get_store
+
+    try:
+        return AnswerCache(store=get_store())
+    except Exception:
+        return AnswerCache()
+
+
+answer_cache = _shared_answer_cache()
@@ -0,0 +1,289 @@
+# HTTP API over the same chat pipeline and database functions the Streamlit
+# UI uses. Run several worker processes behind a load balancer:
+#
+#     uvicorn api:app --host 0.0.0.0 --port 8000 --workers 4
+#
+# Every request needs "Authorization: Bearer $API_TOKEN". The API is meant
+# for trusted clients (the UI, the Node server, load tests), not browsers.
+import asyncio
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import List, Optional
+from dotenv import load_dotenv
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+import database
+import chat_service
+from complaint_clusters import get_complaint_clusters
+from conversation import ConversationMemory
+from deadline import Deadline
+from question_log import log_question
+from shared_store import get_json, set_json
+from write_queue import get_queue, submit_complaint, submit_feedback, submit_chat_turn
+
+load_dotenv()
+
+API_TOKEN = os.getenv("API_TOKEN", "")
+# Threads per process for blocking Supabase/Gemini/ScaleDown calls
+API_WORKERS = int(os.getenv("API_WORKERS", "16"))
+API_SESSION_TTL = int(os.getenv("API_SESSION_TTL", "3600"))
+
+app = FastAPI(title="Riverside Apartments Tenant Services API")
+_pool = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix="api")
+
+
+def require_token(authorization: str = Header(default="")):
+    if not API_TOKEN:
+        raise HTTPException(503, "API_TOKEN is not configured")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token, API_TOKEN):
+        raise HTTPException(401, "Invalid or missing API token")
+
+
+async def run(fn, *args, **kwargs):
+    """Run a blocking call on the worker pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pool, partial(fn, *args, **kwargs))
+
+
+# Conversation memory per chat session lives in the shared store, so any
+# worker or replica can continue a conversation
+def _memory(session_id):
+    if not session_id:
+        return None
+    return ConversationMemory.from_dict(get_json(f"chatmem:{session_id}"))
+
+
+def _public(user):
+    return {k: v for k, v in (user or {}).items() if k != "password_hash"}
+
+
+class ChatRequest(BaseModel):
+    question: str
+    user_id: int
+    unit: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+class LoginRequest(BaseModel):
+    username: str
+    password: str
+
+
+class RegisterRequest(BaseModel):
+    username: str
+    password: str
+    name: str
+    email: str
+    unit: str
+    phone: str = ""
+
+
+class PaymentRequest(BaseModel):
+    user_id: int
+    tenant_name: str
+    unit: str
+    amount: float
+    date: Optional[str] = None
+
+
+class ComplaintRequest(BaseModel):
+    user_id: int
+    tenant_name: str
+    unit: str
+    subject: str
+    category: str
+    message: str
+
+
+class FeedbackRequest(BaseModel):
+    user_id: int
+    tenant_name: str
+    unit: str
+    topic: str
+    rating: int
+    details: str = ""
+    follow_up: bool = False
+
+
+class ResolveRequest(BaseModel):
+    ids: List[int]
+
+
+class AnnouncementRequest(BaseModel):
+    title: str
+    message: str
+    priority: str = "Normal"
+
+
+def _record_turn(req, memory, answer, trace):
+    if memory is not None:
+        set_json(f"chatmem:{req.session_id}", memory.to_dict(), API_SESSION_TTL)
+    submit_chat_turn(req.user_id, req.session_id, req.question, answer)
+    log_question({"id": req.user_id, "unit": req.unit}, req.question, answer, trace)
+
+
+@app.get("/health")
+async def health():
+    return {"ok": True, "outbox": await run(get_queue().stats)}
+
+
+@app.post("/chat", dependencies=[Depends(require_token)])
+async def chat(req: ChatRequest, request: Request):
+    trace = {}
+    deadline = Deadline()
+    memory = await run(_memory, req.session_id)
+    pending = asyncio.ensure_future(run(
+        chat_service.answer_question, req.question, req.user_id, memory, trace, deadline))
+    while not pending.done():
+        await asyncio.wait({pending}, timeout=0.5)
+        if not pending.done() and await request.is_disconnected():
+            # The turn finishes on its own; unstarted stages are skipped and
+            # a late answer still reaches the shared cache
+            deadline.cancel("client disconnected")
+            return Response(status_code=499)
+    answer, orig_tokens, comp_tokens, note = pending.result()
+    await run(_record_turn, req, memory, answer, trace)
+    return {"answer": answer, "note": note, "original_tokens": orig_tokens,
+            "compressed_tokens": comp_tokens, "trace": trace}
+
+
+@app.post("/chat/stream", dependencies=[Depends(require_token)])
+async def chat_stream(req: ChatRequest):
+    trace = {}
+    deadline = Deadline()
+    memory = await run(_memory, req.session_id)
+    chunks = chat_service.stream_answer(req.question, req.user_id, memory, trace, deadline)
+    done = object()
+
+    async def body():
+        parts = []
+        try:
+            while True:
+                # next() blocks on Gemini, so it runs on the pool too
+                chunk = await run(next, chunks, done)
+                if chunk is done:
+                    break
+                parts.append(chunk)
+                yield chunk
+        finally:
+            # Closing releases the admission slot if the client went away
+            deadline.cancel("client disconnected")
+            await run(chunks.close)
+        await run(_record_turn, req, memory, "".join(parts), trace)
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
+
+@app.post("/auth/login", dependencies=[Depends(require_token)])
+async def login(req: LoginRequest):
+    user = await run(database.login_user, req.username, req.password)
+    if not user:
+        raise HTTPException(401, "Invalid username or password")
+    return _public(user)
+
+
+@app.post("/auth/register", dependencies=[Depends(require_token)])
+async def register(req: RegisterRequest):
+    ok, message = await run(database.register_user, req.username, req.password,
+                            req.name, req.email, req.unit, req.phone)
+    if not ok:
+        raise HTTPException(400, message)
+    return {"message": message}
+
+
+@app.get("/tenants", dependencies=[Depends(require_token)])
+async def tenants():
+    return [_public(t) for t in await run(database.get_all_tenants)]
+
+
+@app.get("/tenants/{user_id}/dashboard", dependencies=[Depends(require_token)])
+async def tenant_dashboard(user_id: int):
+    return await run(database.get_tenant_dashboard, user_id) or {}
+
+
+@app.get("/tenants/{user_id}/payments", dependencies=[Depends(require_token)])
+async def tenant_payments(user_id: int):
+    return await run(database.get_tenant_payments, user_id)
+
+
+@app.get("/payments", dependencies=[Depends(require_token)])
+async def payments():
+    return await run(database.get_all_payments)
+
+
+@app.post("/payments", dependencies=[Depends(require_token)])
+async def add_payment(req: PaymentRequest):
+    if req.date:
+        ok = await run(database.record_manual_payment, req.user_id, req.tenant_name,
+                       req.unit, req.amount, req.date)
+    else:
+        ok = await run(database.add_payment, req.user_id, req.tenant_name, req.unit, req.amount)
+    if not ok:
+        raise HTTPException(502, "Payment could not be recorded")
+    return {"ok": True}
+
+
+@app.get("/rent-roll", dependencies=[Depends(require_token)])
+async def rent_roll():
+    return await run(database.get_rent_roll)
+
+
+@app.get("/complaints", dependencies=[Depends(require_token)])
+async def complaints():
+    return await run(database.get_all_complaints)
+
+
+@app.post("/complaints", dependencies=[Depends(require_token)])
+async def add_complaint(req: ComplaintRequest):
+    reference = await run(submit_complaint, req.user_id, req.tenant_name, req.unit,
+                          req.subject, req.category, req.message)
+    return {"reference": reference}
+
+
+@app.get("/complaints/groups", dependencies=[Depends(require_token)])
+async def complaint_groups():
+    groups = await run(lambda: get_complaint_clusters().groups())
+    return [{k: g[k] for k in ("key", "ids", "units", "latest")} | {"subject": g["rows"][0].get("subject")}
+            for g in groups]
+
+
+@app.post("/complaints/resolve", dependencies=[Depends(require_token)])
+async def resolve_many(req: ResolveRequest):
+    if not await run(database.resolve_complaints, req.ids):
+        raise HTTPException(502, "Complaints could not be resolved")
+    return {"ok": True, "resolved": len(req.ids)}
+
+
+@app.post("/complaints/{complaint_id}/resolve", dependencies=[Depends(require_token)])
+async def resolve(complaint_id: int):
+    if not await run(database.resolve_complaint, complaint_id):
+        raise HTTPException(502, "Complaint could not be resolved")
+    return {"ok": True}
+
+
+@app.get("/feedback", dependencies=[Depends(require_token)])
+async def feedback():
+    return await run(database.get_all_feedback)
+
+
+@app.post("/feedback", dependencies=[Depends(require_token)])
+async def add_feedback(req: FeedbackRequest):
+    reference = await run(submit_feedback, req.user_id, req.tenant_name, req.unit,
+                          req.topic, req.rating, req.details, req.follow_up)
+    return {"reference": reference}
+
+
+@app.get("/announcements", dependencies=[Depends(require_token)])
+async def announcements():
+    return await run(database.get_announcements)
+
+
+@app.post("/announcements", dependencies=[Depends(require_token)])
+async def add_announcement(req: AnnouncementRequest):
+    if not await run(database.add_announcement, req.title, req.message, req.priority):
+        raise HTTPException(502, "Announcement could not be posted")
+    return {"ok": True}
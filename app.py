@@ -1,371 +1,47 @@
 import streamlit as st
-import requests
+import hashlib
 import os
-import random
+import time
+from concurrent.futures import wait
 import pandas as pd
-import google.generativeai as genai
 from dotenv import load_dotenv
 from database import (
-    login_user, register_user, get_all_tenants,
-    get_all_payments, add_payment, add_complaint,
-    resolve_complaint, get_all_complaints,
-    add_feedback, get_all_feedback, add_announcement,
-    get_announcements, record_manual_payment,
-    get_tenant_payments, update_user_balance
+    login_user, register_user, add_payment,
+    resolve_complaint, resolve_complaints, get_all_feedback,
+    add_announcement, record_manual_payment,
+    get_tenant_payments, update_user_balance, get_rent_roll,
+    get_tenant_dashboard
 )
+from admission import controller as llm_gate
+from model_router import router as model_router
+from chat_service import (
+    SCALEDOWN_API_KEY, GEMINI_API_KEY, submit_answer, context_cache
+)
+from deadline import Deadline
+from chat_history import ChatHistory
+from billing import run_month_end_close, AGING_BUCKETS
+from lease_terms import LEASE_TERMS
+from analytics import get_analytics, collections_chart, complaints_chart, ratings_chart
+from change_feed import get_feed
+from write_queue import get_queue, submit_complaint, submit_feedback, submit_chat_turn
+from question_log import log_question
+from shared_store import create_session, load_session, save_session, end_session, SESSION_REFRESH_SECONDS
+from search_index import search_tenants, search_complaints, search_feedback
+from complaint_clusters import get_complaint_clusters
+from snapshot import tenant_view, tenant_counts, payments_table, TENANT_VIEW_COLUMNS
+import ui
 
 load_dotenv()
 
-SCALEDOWN_API_KEY = os.getenv("SCALEDOWN_API_KEY")
-SCALEDOWN_URL = os.getenv("SCALEDOWN_API_URL", "https://api.scaledown.xyz/compress/raw/")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-# Configure Gemini
-genai.configure(api_key=GEMINI_API_KEY)
-gemini_model = genai.GenerativeModel("gemini-2.5-flash")
-
-# Load knowledge base files
-def load_knowledge_base():
-    base_dir = os.path.join(os.path.dirname(__file__), 'data')
-    lease_text = open(os.path.join(base_dir, 'lease_agreement.txt'), 'r', encoding='utf-8').read()
-    policy_text = open(os.path.join(base_dir, 'building_policies.txt'), 'r', encoding='utf-8').read()
-    return lease_text, policy_text
-
-lease_text, policy_text = load_knowledge_base()
-full_knowledge = f"=== LEASE AGREEMENT ===\n{lease_text}\n\n=== BUILDING POLICIES ===\n{policy_text}"
-
-# Step 1: Use ScaleDown to compress the knowledge base
-def compress_knowledge(question):
-    headers = {
-        "x-api-key": SCALEDOWN_API_KEY,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "context": full_knowledge,
-        "prompt": question,
-        "scaledown": { "rate": "auto" }
-    }
-    try:
-        response = requests.post(SCALEDOWN_URL, json=payload, headers=headers, timeout=15)
-        if response.status_code == 200:
-            result = response.json()
-            compressed = result["results"]["compressed_prompt"]
-            original_tokens = result["results"].get("original_prompt_tokens", 0)
-            compressed_tokens = result["results"].get("compressed_prompt_tokens", 0)
-            return compressed, original_tokens, compressed_tokens
-    except Exception:
-        pass
-    return question, 0, 0  # fallback: use original question if compression fails
-
-# Step 2: Use Gemini to answer using compressed context
-def get_gemini_answer(question, compressed_context):
-    prompt = f"""You are a helpful tenant services assistant for Riverside Apartments.
-Use ONLY the information below to answer the tenant's question.
-If the answer is not in the information, say: "I don't have that information — please contact leasing at leasing@riversideapts.com or call (512) 847-3300"
-Be friendly, concise and professional.
-
-When writing monetary amounts, use the form "USD 500" (the letters USD, a space, then the amount) instead of the dollar sign. The UI will convert this back to a dollar sign for display.
-
-KNOWLEDGE BASE (compressed):
-{compressed_context}
-
-TENANT QUESTION: {question}
-
-ANSWER:"""
-    try:
-        response = gemini_model.generate_content(prompt)
-        raw = response.text
-        return format_answer(raw)
-    except Exception as e:
-        return f"Unable to get answer from Gemini: {str(e)}"
-
-
-def format_answer(text: str) -> str:
-    """Post-process Gemini output:
-    - Convert 'USD 500' back to '$500'
-    - Escape dollar signs so Streamlit does not interpret them as LaTeX
-    """
-    if not isinstance(text, str):
-        return text
-    # Replace the temporary USD token back to dollar sign
-    out = text.replace("USD ", "$")
-    # Escape dollar signs for Streamlit/Markdown rendering
-    out = out.replace("$", "\\$")
-    return out
+# How often open tenant dashboards re-check the announcement feed
+CHANGE_FEED_UI_SECONDS = float(os.getenv("CHANGE_FEED_UI_SECONDS", "15"))
 
 # Streamlit UI
 st.set_page_config(page_title="Tenant Services Chatbot", layout="wide")
 
-# Theme and fonts
-st.markdown("""
-<style>
-@import url('https://fonts.googleapis.com/css2?family=DM+Sans:wght@300;400;500;600&display=swap');
-
-html, body, [class*="css"] {
-    font-family: 'DM Sans', sans-serif;
-    background-color: #0d0f14;
-    color: #e8eaf0;
-}
-.stApp { background-color: #0d0f14; }
-.stSidebar { background-color: #111318; border-right: 1px solid #252830; }
-.stChatMessage { background-color: #161920; border: 1px solid #252830; border-radius: 8px; margin-bottom: 8px; }
-
-/* Sidebar brand/title */
-.sidebar-brand {
-    color: #f6b26b;
-    font-size: 1.4rem;
-    font-weight: 700;
-    letter-spacing: 0.01em;
-    margin: 0.2rem 0 0.6rem 0;
-    line-height: 1.2;
-}
-
-/* Sidebar link style (used by buttons visually) */
-.sidebar-link {
-    display: block;
-    color: #a0a6b4;
-    font-size: 13px;
-    font-weight: 400;
-    padding: 6px 0;
-    cursor: pointer;
-    text-decoration: none;
-    transition: color 0.25s ease, padding-left 0.25s ease;
-    border: none;
-    background: none;
-}
-.sidebar-link:hover {
-    color: #f6b26b;
-    padding-left: 6px;
-}
-
-/* Make all st.button look like plain text links */
-.stButton > button {
-    background: none !important;
-    border: none !important;
-    border-radius: 0 !important;
-    color: #a0a6b4 !important;
-    font-size: 13px !important;
-    font-weight: 400 !important;
-    padding: 5px 0 !important;
-    text-align: left !important;
-    width: 100% !important;
-    transition: color 0.25s ease, padding-left 0.25s ease, background-size 0.3s ease !important;
-    box-shadow: none !important;
-    background-image: linear-gradient(#f6b26b, #f6b26b) !important;
-    background-position: 0 100% !important;
-    background-repeat: no-repeat !important;
-    background-size: 0% 1px !important;
-}
-.stButton > button:hover {
-    color: #f6b26b !important;
-    padding-left: 8px !important;
-    background-size: 100% 1px !important;
-    border: none !important;
-}
-.stButton > button:focus {
-    box-shadow: none !important;
-    border: none !important;
-    outline: none !important;
-    background-size: 100% 1px !important;
-}
-
-/* Sidebar-specific hover color tuning */
-section[data-testid="stSidebar"] .stButton > button {
-    color: #a0a6b4 !important;
-    transition: color 0.3s ease, padding-left 0.25s ease, background-size 0.3s ease !important;
-}
-section[data-testid="stSidebar"] .stButton > button:hover {
-    color: #f6b26b !important;
-}
-
-/* Title and text brightness */
-h1 {
-    color: #e8eaf0 !important;
-    font-weight: 600 !important;
-    letter-spacing: -0.5px;
-    font-size: 2.2rem !important;
-}
-h2, h3 {
-    color: #d0d4de !important;
-    font-weight: 500 !important;
-}
-p, li, .stMarkdown {
-    color: #b8bdc9 !important;
-}
-
-/* Replace muted label color */
-.metric-label, .metric-sub, .section-header { color: #a0a6b4 !important; }
-
-/* Tabs styling */
-.stTabs [data-baseweb="tab-list"] {
-    background-color: transparent;
-    border-bottom: 1px solid #252830;
-    gap: 4px;
-}
-.stTabs [data-baseweb="tab"] {
-    color: #a0a6b4;
-    font-size: 13px;
-    font-weight: 400;
-    background: transparent;
-    border: none;
-    padding: 10px 20px;
-    transition: color 0.3s ease, background-size 0.3s ease;
-    background-image: linear-gradient(#f6b26b, #f6b26b);
-    background-position: 0 100%;
-    background-repeat: no-repeat;
-    background-size: 0% 1px;
-}
-.stTabs [data-baseweb="tab"]:hover {
-    color: #f6b26b;
-    background-size: 100% 1px;
-}
-.stTabs [aria-selected="true"] {
-    color: #7a9fd4 !important;
-    font-weight: 500 !important;
-    border-bottom: 2px solid #7a9fd4 !important;
-    transition: border-color 0.35s ease, color 0.35s ease !important;
-}
-
-/* Inputs, textareas, selects */
-.stTextInput > div > div > input {
-    background-color: #161920 !important;
-    border: 1px solid #252830 !important;
-    color: #e8eaf0 !important;
-    border-radius: 6px !important;
-}
-.stTextInput > div > div > input:focus {
-    border-color: #4a7fe8 !important;
-    box-shadow: none !important;
-}
-.stTextArea > div > div > textarea {
-    background-color: #161920 !important;
-    border: 1px solid #252830 !important;
-    color: #e8eaf0 !important;
-    border-radius: 6px !important;
-    resize: vertical;
-}
-.stTextArea > div > div > textarea:focus {
-    border-color: #4a7fe8 !important;
-    box-shadow: none !important;
-}
-.stSelectbox > div > div {
-    background-color: #161920 !important;
-    border: 1px solid #252830 !important;
-    color: #e8eaf0 !important;
-    border-radius: 6px !important;
-}
-.stSelectbox svg { fill: #a0a6b4 !important; }
-.stSlider > div > div { background-color: transparent !important; }
-.stChatInput > div { background-color: #0f1114 !important; border: 1px solid #1f2226 !important; border-radius: 8px !important; color: #e8eaf0 !important; }
-.stChatInput > div:focus-within { border-color: #4a7fe8 !important; }
-
-/* Dataframes */
-div[data-testid="stDataFrame"] {
-    background-color: rgba(59, 130, 246, 0.08) !important;
-    border: 1px solid rgba(125, 171, 245, 0.28) !important;
-    border-radius: 10px !important;
-    padding: 6px !important;
-    box-shadow: inset 0 1px 0 rgba(255, 255, 255, 0.02) !important;
-}
-.stDataFrame { background-color: transparent !important; }
-div[data-testid="stDataFrame"] table,
-div[data-testid="stDataFrame"] thead,
-div[data-testid="stDataFrame"] tbody,
-div[data-testid="stDataFrame"] tr {
-    background-color: rgba(59, 130, 246, 0.08) !important;
-}
-div[data-testid="stDataFrame"] th {
-    background-color: rgba(59, 130, 246, 0.12) !important;
-    color: #dbe8ff !important;
-    border-color: rgba(125, 171, 245, 0.22) !important;
-}
-div[data-testid="stDataFrame"] td {
-    background-color: rgba(59, 130, 246, 0.08) !important;
-    color: #d9deea !important;
-    border-color: rgba(125, 171, 245, 0.16) !important;
-}
-iframe[title="st_dataframe"] { filter: invert(0) !important; }
-
-.stCheckbox > label { color: #b8bdc9 !important; }
-.block-container { background-color: #0d0f14 !important; }
-section[data-testid="stSidebar"] { background-color: #111318 !important; }
-
-/* Top header / toolbar */
-header, .stHeader, .stTopNav {
-    background-color: #0b0d10 !important;
-    border-bottom: 1px solid #1b1e22 !important;
-}
-
-/* Placeholder */
-input::placeholder, textarea::placeholder { color: #555a66 !important; }
-
-/* Metric cards and badges */
-.metric-card { background-color: #161920; border: 1px solid #252830; border-radius: 8px; padding: 20px; margin-bottom: 12px; }
-.metric-value { font-size: 28px; font-weight: 600; color: #e8eaf0; }
-.badge-green { background-color: #1a2e24; color: #3a7d5c; border-radius: 4px; padding: 2px 8px; font-size: 12px; }
-.badge-amber { background-color: #2a2010; color: #c49a3a; border-radius: 4px; padding: 2px 8px; font-size: 12px; }
-.badge-blue { background-color: #1a2040; color: #4a7fe8; border-radius: 4px; padding: 2px 8px; font-size: 12px; }
-.building-alert-card {
-    background-color: rgba(84, 149, 108, 0.14);
-    border: 1px solid rgba(112, 183, 137, 0.35);
-}
-.section-icon {
-    display: inline-flex;
-    align-items: center;
-    justify-content: center;
-    width: 14px;
-    height: 14px;
-    margin-right: 7px;
-    color: #99c7a7;
-    vertical-align: text-top;
-}
-.section-icon svg {
-    width: 14px;
-    height: 14px;
-    stroke: currentColor;
-    stroke-width: 1.8;
-    fill: none;
-}
-
-/* Chat input — force dark background with high specificity */
-div[data-testid="stChatInput"] {
-    background-color: #161920 !important;
-    border: 1px solid #252830 !important;
-    border-radius: 8px !important;
-}
-div[data-testid="stChatInput"] > div {
-    background-color: #161920 !important;
-    border-radius: 8px !important;
-}
-div[data-testid="stChatInput"] textarea {
-    background-color: #161920 !important;
-    color: #e8eaf0 !important;
-    caret-color: #e8eaf0 !important;
-    font-family: 'DM Sans', sans-serif !important;
-}
-div[data-testid="stChatInput"] textarea::placeholder {
-    color: #555a66 !important;
-}
-div[data-testid="stChatInput"] button {
-    background-color: #161920 !important;
-    color: #8b909e !important;
-    border: none !important;
-}
-div[data-testid="stChatInput"] button:hover {
-    color: #c0544a !important;
-}
-
-.auth-button > button {
-    background-color: #4a7fe8 !important;
-    color: white !important;
-    border-radius: 6px !important;
-    width: 100% !important;
-    padding: 10px !important;
-    font-weight: 500 !important;
-}
-
-</style>
-""", unsafe_allow_html=True)
+# Theme colors and fonts come from .streamlit/config.toml; this is only the
+# small residual stylesheet, minified once per process
+st.markdown(ui.theme_style(), unsafe_allow_html=True)
 
 st.title("Tenant Services Chatbot")
 
@@ -386,11 +62,85 @@ if "role" not in st.session_state:
     st.session_state["role"] = None
 
 # Initialize chat history and feedback log
-if "messages" not in st.session_state:
-    st.session_state["messages"] = []
+if "chat" not in st.session_state:
+    st.session_state["chat"] = ChatHistory()
 if "feedback_log" not in st.session_state:
     st.session_state["feedback_log"] = []
 
+def browser_key():
+    """Hash of the token in Streamlit's _streamlit_xsrf cookie: stable for
+    this browser, sent with every request and never part of the URL. None
+    when XSRF protection is off (server.enableXsrfProtection)."""
+    raw = st.context.cookies.get("_streamlit_xsrf")
+    if not raw:
+        return None
+    parts = raw.split("|")
+    try:
+        # Tornado's v2 format re-masks the token on every write: 2|mask|masked|ts
+        mask, masked = bytes.fromhex(parts[1]), bytes.fromhex(parts[2])
+        token = bytes(b ^ mask[i % len(mask)] for i, b in enumerate(masked))
+    except (IndexError, ValueError):
+        token = raw.encode()
+    return hashlib.sha256(token).hexdigest()
+
+
+# Sessions live in the shared store, keyed by the ?sid= URL parameter, so any
+# replica behind the load balancer can pick up a signed-in tenant; restoring
+# one also needs the browser it was created in (see browser_key)
+if not st.session_state["logged_in"]:
+    saved = load_session(st.query_params.get("sid"), browser_key())
+    if saved:
+        st.session_state["logged_in"] = True
+        st.session_state["user"] = saved["user"]
+        st.session_state["role"] = saved["role"]
+        st.session_state["chat"] = ChatHistory.from_dict(saved.get("chat") or {})
+
+
+def session_snapshot():
+    return {
+        "user": st.session_state["user"],
+        "role": st.session_state["role"],
+        "chat": st.session_state["chat"].to_dict(),
+    }
+
+
+def persist_session():
+    save_session(st.query_params.get("sid"), session_snapshot(), browser_key())
+    st.session_state["session_saved_at"] = time.monotonic()
+
+
+def cancel_chat_turn(reason):
+    turn = st.session_state.pop("chat_turn", None)
+    if turn is not None:
+        turn["deadline"].cancel(reason)
+
+
+def wait_for_answer(question, trace):
+    """Run the chat turn on a worker thread and wait for it here, writing a
+    progress line once a second. Each write lets Streamlit end this run
+    when the tenant clicks something; the turn keeps going and the next run
+    picks it up again if `question` is still the one pending. A turn that
+    gets superseded is cancelled (see cancel_chat_turn)."""
+    turn = st.session_state.get("chat_turn")
+    if turn is None or turn["question"] != question:
+        cancel_chat_turn("superseded")
+        deadline = Deadline()
+        turn = st.session_state["chat_turn"] = {
+            "question": question, "trace": trace, "deadline": deadline,
+            "future": submit_answer(question, user["id"], chat.memory, trace, deadline),
+        }
+    progress = st.empty()
+    shown = 0
+    while not wait([turn["future"]], timeout=0.25).done:
+        elapsed = int(time.monotonic() - turn["deadline"].started)
+        if elapsed != shown:
+            progress.caption(f"Still working… {elapsed}s")
+            shown = elapsed
+    progress.empty()
+    st.session_state.pop("chat_turn", None)
+    trace.update(turn["trace"])
+    return turn["future"].result()
+
 # ── AUTH GATE ──────────────────────────────────────────────────────────────────
 if not st.session_state["logged_in"]:
     st.markdown(
@@ -411,9 +161,12 @@ if not st.session_state["logged_in"]:
             if st.button("Sign In", key="signin_btn"):
                 user = login_user(username, password)
                 if user:
+                    user = {k: v for k, v in user.items() if k != "password_hash"}
                     st.session_state["logged_in"] = True
                     st.session_state["user"] = user
                     st.session_state["role"] = user.get("role", "tenant")
+                    st.query_params["sid"] = create_session(session_snapshot(), browser_key())
+                    st.session_state["session_saved_at"] = time.monotonic()
                     st.rerun()
                 else:
                     st.error("Invalid username or password")
@@ -451,19 +204,18 @@ if not st.session_state["logged_in"]:
 
     st.stop()
 
+# Any signed-in rerun is activity: push the session's expiry back, at most
+# once every SESSION_REFRESH_SECONDS so clicks don't each write the store
+saved_at = st.session_state.get("session_saved_at")
+if saved_at is None or time.monotonic() - saved_at > SESSION_REFRESH_SECONDS:
+    persist_session()
+
 # ── SIDEBAR (post-login) ───────────────────────────────────────────────────────
 user = st.session_state["user"]
 role = st.session_state["role"]
 
 st.sidebar.markdown(
-    f"<div class='sidebar-brand' style='font-size:1.35rem;font-weight:700;"
-    f"color:#f6b26b;letter-spacing:0.01em;margin-bottom:4px;'>"
-    f"{user['name']}</div>",
-    unsafe_allow_html=True,
-)
-st.sidebar.markdown(
-    f"<div style='color:#a0a6b4;font-size:13px;margin-bottom:4px;'>"
-    f"{'Admin' if role == 'admin' else 'Unit ' + user['unit']}</div>",
+    ui.sidebar_brand(user["name"], "Admin" if role == "admin" else "Unit " + user["unit"]),
     unsafe_allow_html=True,
 )
 st.sidebar.markdown("---")
@@ -479,8 +231,10 @@ if role == "tenant":
     }
     for label, prefill in quick_questions.items():
         if st.sidebar.button(label):
-            if not st.session_state["messages"] or st.session_state["messages"][-1]["content"] != prefill:
-                st.session_state["messages"].append({"role": "user", "content": prefill})
+            last_msg = st.session_state["chat"].last()
+            if not last_msg or last_msg["content"] != prefill:
+                st.session_state["chat"].append("user", prefill)
+                persist_session()
                 st.rerun()
 else:
     for label in ["Overview", "Tenants", "Payments", "Complaints", "Announcements"]:
@@ -493,9 +247,34 @@ st.sidebar.markdown("leasing@riversideapts.com")
 st.sidebar.markdown("---")
 
 if st.sidebar.button("Sign Out"):
+    cancel_chat_turn("signed out")
+    st.session_state["chat"].clear()
+    end_session(st.query_params.get("sid"))
+    st.query_params.clear()
     st.session_state.clear()
     st.rerun()
 
+# ── CHANGE FEED ────────────────────────────────────────────────────────────────
+# Announcements, complaints and payments are served from a process-wide cache
+# kept current by the change feed; each session has its own inbox of changes.
+feed = get_feed()
+if "feed_sub" not in st.session_state:
+    st.session_state["feed_sub"] = feed.subscribe(["announcements"] if role == "tenant" else None)
+
+
+@st.fragment(run_every=CHANGE_FEED_UI_SECONDS)
+def announcement_feed():
+    new_items = {row["id"] for _, op, row in st.session_state["feed_sub"].drain("announcements") if op == "INSERT"}
+    st.session_state["seen_new_announcements"] = st.session_state.get("seen_new_announcements", set()) | new_items
+    latest = feed.rows("announcements", limit=5)
+    if not latest:
+        st.markdown("<div class='metric-sub'>No announcements yet.</div>", unsafe_allow_html=True)
+    for a in latest:
+        st.markdown(ui.announcement_card(
+            a.get("title", ""), a.get("message", ""), str(a.get("date", ""))[:10],
+            a.get("priority", "Low"), a["id"] in st.session_state["seen_new_announcements"],
+        ), unsafe_allow_html=True)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # ADMIN VIEW
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -504,84 +283,114 @@ if role == "admin":
 
     # ── Overview ───────────────────────────────────────────────────────────────
     with admin_tabs[0]:
-        st.markdown("<div class='section-header'>Admin Overview</div>", unsafe_allow_html=True)
-        tenants = get_all_tenants()
-        payments = get_all_payments()
-        complaints = get_all_complaints()
-        pending = sum(1 for t in tenants if t.get("balance", 0) > 0)
-        open_complaints = sum(1 for c in complaints if c.get("status") == "Open")
-        total_collected = sum(p.get("amount", 0) for p in payments)
+        st.markdown(ui.section_header("Admin Overview"), unsafe_allow_html=True)
+        tenant_total, pending = tenant_counts()
+        analytics = get_analytics()
+        stats = analytics.totals()
+        open_complaints = stats["complaints_opened"] - stats["complaints_resolved"]
+        total_collected = stats["collected"]
         c1, c2, c3, c4 = st.columns(4)
         with c1:
-            st.markdown(f"""
-            <div class='metric-card'>
-              <div class='metric-label'>Total Tenants</div>
-              <div class='metric-value'>{len(tenants)}</div>
-            </div>""", unsafe_allow_html=True)
+            st.markdown(ui.metric_card("Total Tenants", tenant_total), unsafe_allow_html=True)
         with c2:
-            st.markdown(f"""
-            <div class='metric-card'>
-              <div class='metric-label'>Rent Collected</div>
-              <div class='metric-value'>₹{total_collected:,.0f}</div>
-            </div>""", unsafe_allow_html=True)
+            st.markdown(ui.metric_card("Rent Collected", f"₹{total_collected:,.0f}"), unsafe_allow_html=True)
         with c3:
-            st.markdown(f"""
-            <div class='metric-card'>
-              <div class='metric-label'>Pending Payments</div>
-              <div class='metric-value'>{pending}</div>
-            </div>""", unsafe_allow_html=True)
+            st.markdown(ui.metric_card("Pending Payments", pending), unsafe_allow_html=True)
         with c4:
-            st.markdown(f"""
-            <div class='metric-card'>
-              <div class='metric-label'>Open Complaints</div>
-              <div class='metric-value'>{open_complaints}</div>
-            </div>""", unsafe_allow_html=True)
+            st.markdown(ui.metric_card("Open Complaints", open_complaints), unsafe_allow_html=True)
+
+        gate = llm_gate.stats()
+        st.caption(
+            f"Assistant load: {gate['active']} running, {gate['queue_depth']} queued "
+            f"(avg wait {gate['avg_wait']:.1f}s, p95 {gate['p95_wait']:.1f}s) · "
+            f"{gate['rate_limited']} rate-limited, {gate['saturated']} shed"
+        )
+        outbox = get_queue().stats()
+        if outbox["pending"] or outbox["failed"]:
+            st.caption(
+                f"Submission queue: {outbox['pending']} waiting to sync "
+                f"(oldest {outbox['oldest_pending'] or '-'}), {outbox['failed']} failed"
+            )
+            if outbox["failed"] and st.button("Retry failed submissions", key="retry_outbox"):
+                get_queue().retry_failed()
+                st.rerun()
+        for route, rs in model_router.stats().items():
+            st.caption(
+                f"Route {route} ({rs['model']}): {rs['calls']} calls, "
+                f"avg {rs['avg_latency']:.2f}s, p95 {rs['p95_latency']:.2f}s, "
+                f"{rs['fallbacks']} fallbacks, {rs['errors']} errors"
+            )
+        cache_stats = context_cache.stats()
+        if cache_stats["enabled"]:
+            live = ", ".join(f"{m} ({ttl // 60} min left)" for m, ttl in cache_stats["entries"].items())
+            st.caption(f"Knowledge base context cache v{cache_stats['version']}: {live or 'not created yet'}")
 
     # ── Tenants ────────────────────────────────────────────────────────────────
     with admin_tabs[1]:
-        st.markdown("<div class='section-header'>All Tenants</div>", unsafe_allow_html=True)
-        tenants = get_all_tenants()
-        if tenants:
-            rows = []
-            for t in tenants:
-                rows.append({
-                    "Name": t.get("name", ""),
-                    "Unit": t.get("unit", ""),
-                    "Email": t.get("email", ""),
-                    "Phone": t.get("phone", ""),
-                    "Rent": f"₹{t.get('rent', 0):,.0f}",
-                    "Balance": f"₹{t.get('balance', 0):,.0f}",
-                    "Status": "Overdue" if t.get("balance", 0) > 0 else "Current",
-                })
-            df_tenants = pd.DataFrame(rows)
-            def highlight_status(val):
-                if val == "Overdue":
-                    return "background-color: #2a2010; color: #c49a3a"
-                return "background-color: #1a2e24; color: #3a7d5c"
-            styled_t = df_tenants.style.applymap(highlight_status, subset=["Status"])
-            st.dataframe(styled_t, use_container_width=True)
+        st.markdown(ui.section_header("All Tenants"), unsafe_allow_html=True)
+        tenant_query = st.text_input("Search tenants", placeholder="Name, unit or email", key="tenant_search")
+        if tenant_query.strip():
+            df_tenants = tenant_view([t["id"] for t in search_tenants(tenant_query, limit=50)])
+        else:
+            df_tenants = tenant_view()
+        if df_tenants.num_rows:
+            st.dataframe(
+                df_tenants, use_container_width=True, hide_index=True, column_order=TENANT_VIEW_COLUMNS,
+                column_config={"Status": st.column_config.MultiselectColumn(
+                    options=["Overdue", "Current"], color=["#c49a3a", "#3a7d5c"],
+                )},
+            )
+        elif tenant_query.strip():
+            st.info("No tenants match that search.")
         else:
             st.info("No tenants found.")
 
     # ── Payments ───────────────────────────────────────────────────────────────
     with admin_tabs[2]:
-        st.markdown("<div class='section-header'>All Payments</div>", unsafe_allow_html=True)
-        payments = get_all_payments()
-        if payments:
-            df_pay = pd.DataFrame(payments)
+        st.markdown(ui.section_header("All Payments"), unsafe_allow_html=True)
+        df_pay = payments_table()
+        if df_pay.num_rows:
             st.dataframe(df_pay, use_container_width=True)
-            total = sum(p.get("amount", 0) for p in payments)
-            st.markdown(f"**Total Collected: ₹{total:,.0f}**")
+            st.markdown(f"**Total Collected: ₹{analytics.totals()['collected']:,.0f}**")
+            st.altair_chart(collections_chart(analytics), use_container_width=True)
         else:
             st.info("No payments recorded.")
 
         st.markdown("---")
-        st.markdown("<div class='section-header'>Record Manual Payment</div>", unsafe_allow_html=True)
-        all_tenants = get_all_tenants()
-        if all_tenants:
-            tenant_names = [t["name"] for t in all_tenants]
-            sel_tenant_name = st.selectbox("Tenant", tenant_names, key="manual_pay_tenant")
-            sel_tenant = next((t for t in all_tenants if t["name"] == sel_tenant_name), None)
+        st.markdown(ui.section_header("Rent Roll & Aging"), unsafe_allow_html=True)
+        if st.button("Run Month-End Close", key="month_end_close"):
+            with st.spinner("Building charges, late fees and aging for all tenants..."):
+                ok, _roll = run_month_end_close()
+            if ok:
+                st.success("Rent roll updated.")
+            else:
+                st.error("Failed to write the rent roll.")
+        rent_roll = get_rent_roll()
+        if rent_roll:
+            df_roll = pd.DataFrame(rent_roll)
+            totals = df_roll[["balance", *AGING_BUCKETS, "late_fees"]].sum()
+            a1, a2, a3, a4, a5 = st.columns(5)
+            for col, label, key in zip(
+                (a1, a2, a3, a4, a5),
+                ("Outstanding", "Current", "30 Days", "60 Days", "90+ Days"),
+                ("balance", *AGING_BUCKETS),
+            ):
+                with col:
+                    st.markdown(ui.metric_card(label, f"₹{totals[key]:,.0f}"), unsafe_allow_html=True)
+            st.dataframe(df_roll, use_container_width=True)
+        else:
+            st.info("No rent roll yet — run the month-end close.")
+
+        st.markdown("---")
+        st.markdown(ui.section_header("Record Manual Payment"), unsafe_allow_html=True)
+        pay_query = st.text_input("Find tenant", placeholder="Name, unit or email", key="manual_pay_search")
+        matches = {t["id"]: t for t in search_tenants(pay_query)}
+        if matches:
+            sel_id = st.selectbox(
+                "Tenant", list(matches), key="manual_pay_tenant",
+                format_func=lambda i: f"{matches[i]['name']} — Unit {matches[i]['unit']} · {matches[i]['email']}",
+            )
+            sel_tenant = matches.get(sel_id)
             manual_amount = st.number_input("Amount ($)", min_value=0.0, step=50.0, key="manual_amount")
             manual_date = st.date_input("Date", key="manual_date")
             if st.button("Record Payment"):
@@ -595,47 +404,95 @@ if role == "admin":
                         st.success("Payment recorded.")
                     else:
                         st.error("Failed to record payment.")
+        elif pay_query.strip():
+            st.info("No tenants match that search.")
 
     # ── Complaints ─────────────────────────────────────────────────────────────
     with admin_tabs[3]:
-        st.markdown("<div class='section-header'>Complaints</div>", unsafe_allow_html=True)
-        complaints = get_all_complaints()
-        if complaints:
-            for c in complaints:
-                badge = "<span class='badge-green'>Resolved</span>" if c.get("status") == "Resolved" else "<span class='badge-amber'>Open</span>"
-                st.markdown(f"""
-                <div class='metric-card'>
-                  <div><strong>{c.get('tenant_name','')}</strong> — Unit {c.get('unit','')} &nbsp;{badge}</div>
-                  <div class='metric-sub'><strong>Category:</strong> {c.get('category','')}</div>
-                  <div class='metric-sub'><strong>Subject:</strong> {c.get('subject','')}</div>
-                  <div class='metric-sub'>{c.get('message','')}</div>
-                  <div class='metric-sub'>Filed: {c.get('date','')}</div>
-                </div>""", unsafe_allow_html=True)
+        st.markdown(ui.section_header("Complaints"), unsafe_allow_html=True)
+        stats = analytics.totals()
+        st.caption(
+            f"{stats['complaints_opened']} filed · {stats['complaints_resolved']} resolved "
+            f"({stats['resolve_rate']:.0%} resolve rate)"
+        )
+        st.altair_chart(complaints_chart(analytics), use_container_width=True)
+        changed = len(st.session_state["feed_sub"].drain("complaints"))
+        if changed:
+            st.caption(f"{changed} complaint update(s) since you last looked")
+
+        def show_complaints(rows):
+            for c in rows:
+                st.markdown(ui.complaint_card(
+                    c.get("tenant_name", ""), c.get("unit", ""), c.get("category", ""),
+                    c.get("subject", ""), c.get("message", ""), c.get("date", ""),
+                    c.get("status") == "Resolved",
+                ), unsafe_allow_html=True)
                 if c.get("status") != "Resolved":
                     if st.button("Mark Resolved", key=f"resolve_{c['id']}"):
                         resolve_complaint(c["id"])
+                        feed.poll()
                         st.rerun()
+
+        complaint_query = st.text_input("Search complaints", placeholder="Words in the subject or message",
+                                        key="complaint_search")
+        if complaint_query.strip():
+            complaints = search_complaints(complaint_query, limit=50)
+            if complaints:
+                show_complaints(complaints)
+            else:
+                st.info("No complaints match that search.")
         else:
-            st.info("No complaints filed.")
+            # Open complaints grouped by incident; a group's reports render
+            # only when expanded
+            groups = get_complaint_clusters().groups()
+            if groups:
+                st.caption(f"{sum(len(g['ids']) for g in groups)} open complaint(s) in {len(groups)} incident(s)")
+            for g in groups:
+                if len(g["ids"]) == 1:
+                    show_complaints(g["rows"])
+                    continue
+                first = g["rows"][0]
+                st.markdown(ui.complaint_group_card(
+                    first.get("subject", ""), first.get("category", ""), len(g["ids"]),
+                    tuple(g["units"]), str(first.get("date", ""))[:10], g["latest"][:10],
+                ), unsafe_allow_html=True)
+                g1, g2 = st.columns(2)
+                with g1:
+                    expanded = st.toggle(f"Show {len(g['ids'])} reports", key=f"group_rows_{g['key']}")
+                with g2:
+                    if st.button(f"Resolve all {len(g['ids'])}", key=f"resolve_group_{g['key']}"):
+                        resolve_complaints(g["ids"])
+                        feed.poll()
+                        st.rerun()
+                if expanded:
+                    show_complaints(g["rows"])
+            resolved = [c for c in feed.rows("complaints") if c.get("status") == "Resolved"][:10]
+            if resolved:
+                st.caption("Recently resolved")
+                show_complaints(resolved)
+            elif not groups:
+                st.info("No complaints filed.")
 
         st.markdown("---")
-        st.markdown("<div class='section-header'>Feedback</div>", unsafe_allow_html=True)
-        feedbacks = get_all_feedback()
+        st.markdown(ui.section_header("Feedback"), unsafe_allow_html=True)
+        st.altair_chart(ratings_chart(analytics), use_container_width=True)
+        feedback_query = st.text_input("Search feedback", placeholder="Words in the topic or details",
+                                       key="feedback_search")
+        feedbacks = search_feedback(feedback_query, limit=50) if feedback_query.strip() else get_all_feedback()
         if feedbacks:
             for f in feedbacks:
-                st.markdown(f"""
-                <div class='metric-card'>
-                  <div><strong>{f.get('tenant_name','')}</strong> — Unit {f.get('unit','')}</div>
-                  <div class='metric-sub'><strong>Topic:</strong> {f.get('topic','')} | <strong>Rating:</strong> {f.get('rating','')}/5</div>
-                  <div class='metric-sub'>{f.get('details','')}</div>
-                  <div class='metric-sub'>Follow-up: {'Yes' if f.get('follow_up') else 'No'}</div>
-                </div>""", unsafe_allow_html=True)
+                st.markdown(ui.feedback_card(
+                    f.get("tenant_name", ""), f.get("unit", ""), f.get("topic", ""),
+                    f.get("rating", ""), f.get("details", ""), bool(f.get("follow_up")),
+                ), unsafe_allow_html=True)
+        elif feedback_query.strip():
+            st.info("No feedback matches that search.")
         else:
             st.info("No feedback submitted.")
 
     # ── Announcements ──────────────────────────────────────────────────────────
     with admin_tabs[4]:
-        st.markdown("<div class='section-header'>Post Announcement</div>", unsafe_allow_html=True)
+        st.markdown(ui.section_header("Post Announcement"), unsafe_allow_html=True)
         ann_title = st.text_input("Title", key="ann_title")
         ann_message = st.text_area("Message", key="ann_message")
         ann_priority = st.selectbox("Priority", ["Low", "Medium", "High"], key="ann_priority")
@@ -644,32 +501,60 @@ if role == "admin":
                 ok = add_announcement(ann_title, ann_message, ann_priority)
                 if ok:
                     st.success("Announcement posted.")
+                    feed.poll()
                     st.rerun()
                 else:
                     st.error("Failed to post announcement.")
             else:
                 st.error("Title and message are required.")
 
-        st.markdown("<div class='section-header'>All Announcements</div>", unsafe_allow_html=True)
-        announcements = get_announcements()
+        st.markdown(ui.section_header("All Announcements"), unsafe_allow_html=True)
+        announcements = feed.rows("announcements")
         for a in announcements:
-            priority = a.get("priority", "Low")
-            badge_cls = "badge-amber" if priority == "High" else "badge-blue" if priority == "Medium" else "badge-green"
-            st.markdown(f"""
-            <div class='metric-card'>
-              <div><strong>{a.get('title','')}</strong> &nbsp;<span class='{badge_cls}'>{priority}</span></div>
-              <div class='metric-sub'>{a.get('message','')}</div>
-              <div class='metric-sub'>{a.get('date','')}</div>
-            </div>""", unsafe_allow_html=True)
+            st.markdown(ui.announcement_card(
+                a.get("title", ""), a.get("message", ""), a.get("date", ""), a.get("priority", "Low"),
+            ), unsafe_allow_html=True)
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # TENANT VIEW
 # ═══════════════════════════════════════════════════════════════════════════════
 else:
+    from datetime import date, timedelta
     tenant_name = user["name"]
     tenant_unit = user["unit"]
-    tenant_rent = user["rent"]
-    tenant_balance = user["balance"]
+    # One cached round trip for the live figures; the login-time user row is
+    # only a fallback if the dashboard call fails
+    dash = get_tenant_dashboard(user["id"]) or {}
+
+    def _field(name):
+        value = dash.get(name)
+        return value if value is not None else user.get(name)
+
+    def _as_date(value, default=None):
+        try:
+            return date.fromisoformat(str(value)[:10]) if value else default
+        except ValueError:
+            return default
+
+    # Only this tenant's own figures; the sample lease's dates are not theirs
+    tenant_rent = _field("rent")
+    tenant_balance = _field("balance") or 0
+    rent_label = f"₹{tenant_rent:,.0f}" if tenant_rent is not None else "Not on file"
+
+    today = date.today()
+    lease_start = _as_date(_field("lease_start"))
+    lease_end = _as_date(_field("lease_end"))
+    # The next 1st from today (or the lease start, if later); a date from an
+    # older rent roll never wins, and nothing is due after the lease ends
+    next_due = today.replace(day=1)
+    if today.day > 1:
+        next_due = (next_due.replace(day=28) + timedelta(days=4)).replace(day=1)
+    if lease_start and lease_start > next_due:
+        next_due = lease_start
+    next_due = max(next_due, _as_date(dash.get("next_due_date"), next_due))
+    if lease_end and next_due > lease_end:
+        next_due = None
+    open_requests = dash.get("open_complaints", 0)
 
     tabs = st.tabs(["Dashboard", "Chat Assistant", "Rent & Payments", "Feedback"])
 
@@ -678,69 +563,57 @@ else:
     ####################
     with tabs[0]:
         st.markdown(
-            f"<div class='section-header'>Good to see you, {tenant_name}. Unit {tenant_unit} summary.</div>",
+            ui.section_header(f"Good to see you, {tenant_name}. Unit {tenant_unit} summary."),
             unsafe_allow_html=True,
         )
         col1, col2, col3 = st.columns(3)
         with col1:
-            balance_badge = (
-                "<span class='badge-amber'>Payment Due</span>"
-                if tenant_balance > 0
-                else "<span class='badge-green'>On Time</span>"
-            )
-            st.markdown(f"""
-            <div class='metric-card'>
-              <div class='metric-label'>Rent Status</div>
-              <div class='metric-value'>₹{tenant_rent:,.0f}</div>
-              <div class='metric-sub'>Balance Due: ₹{tenant_balance:,.0f}</div>
-              <div style='margin-top:8px;'>{balance_badge}</div>
-            </div>
-            """, unsafe_allow_html=True)
+            balance_badge = ui.badge("Payment Due", "amber") if tenant_balance > 0 else ui.badge("On Time")
+            st.markdown(ui.metric_card(
+                "Rent Status", rent_label, f"Balance Due: ₹{tenant_balance:,.0f}", balance_badge,
+            ), unsafe_allow_html=True)
         with col2:
-            st.markdown("""
-            <div class='metric-card'>
-              <div class='metric-label'>Lease Status</div>
-              <div class='metric-value'>Active</div>
-              <div class='metric-sub'>Expires December 31, 2025</div>
-              <div style='margin-top:8px;'><span class='badge-blue'>182 days remaining</span></div>
-            </div>
-            """, unsafe_allow_html=True)
+            if lease_end is None:
+                lease_status, lease_sub, lease_badge = "Active", "No end date on file", ""
+            else:
+                lease_days = (lease_end - today).days
+                lease_status = "Active" if lease_days >= 0 else "Expired"
+                lease_sub = f"{'Expires' if lease_days >= 0 else 'Expired'} {lease_end.strftime('%B %d, %Y')}"
+                lease_badge = (
+                    ui.badge(f"{lease_days} days remaining", "blue")
+                    if lease_days >= 0 else ui.badge("Renewal needed", "amber")
+                )
+            st.markdown(ui.metric_card("Lease Status", lease_status, lease_sub, lease_badge),
+                        unsafe_allow_html=True)
         with col3:
-            st.markdown("""
-            <div class='metric-card'>
-              <div class='metric-label'>Open Maintenance</div>
-              <div class='metric-value'>0</div>
-              <div class='metric-sub'>No active requests</div>
-              <div style='margin-top:8px;'><span class='badge-green'>All Clear</span></div>
-            </div>
-            """, unsafe_allow_html=True)
-
-        st.markdown("<div class='section-header'>Upcoming</div>", unsafe_allow_html=True)
+            maint_sub = "No active requests" if not open_requests else f"{open_requests} awaiting resolution"
+            maint_badge = ui.badge("All Clear") if not open_requests else ui.badge("In Progress", "amber")
+            st.markdown(ui.metric_card("Open Maintenance", open_requests, maint_sub, maint_badge),
+                        unsafe_allow_html=True)
+
+        st.markdown(ui.section_header("Upcoming"), unsafe_allow_html=True)
         r1, r2 = st.columns(2)
-        from datetime import date
-        today = date.today()
-        next_due = date(2025, 12, 1)
-        days_until = (next_due - today).days
         with r1:
-            st.markdown(f"""
-            <div class='metric-card'>
-              <div class='metric-label'>Next Rent Due</div>
-              <div class='metric-value'>₹{tenant_rent:,.0f}</div>
-              <div class='metric-sub'>Due {next_due.strftime('%B %d, %Y')}</div>
-              <div style='margin-top:8px;'><strong style='color:#4a7fe8'>{days_until} days remaining</strong></div>
-            </div>
-            """, unsafe_allow_html=True)
+            if next_due is None:
+                st.markdown(ui.metric_card("Next Rent Due", "—", "Lease has ended"), unsafe_allow_html=True)
+            else:
+                days_until = (next_due - today).days
+                st.markdown(ui.metric_card(
+                    "Next Rent Due", rent_label, f"Due {next_due.strftime('%B %d, %Y')}",
+                    f"<span class='metric-highlight'>{days_until} days remaining</span>",
+                ), unsafe_allow_html=True)
         with r2:
-            st.markdown("""
-            <div class='metric-card building-alert-card'>
-              <div class='metric-label'><span class='section-icon' aria-hidden='true'><svg viewBox='0 0 24 24'><path d='M12 9v4m0 3h.01M10.29 3.86l-8.18 14.15A1 1 0 0 0 3 19.5h18a1 1 0 0 0 .87-1.49L13.71 3.86a1 1 0 0 0-1.42 0z'/></svg></span>Building Alerts</div>
-              <div class='metric-sub'>Elevator C maintenance scheduled Feb 25 — use elevators A or B</div>
-              <div class='metric-sub'>Pool opens May 1 — registration opens April 15</div>
-              <div class='metric-sub'>Pest control treatment second Tuesday of each month</div>
-            </div>
-            """, unsafe_allow_html=True)
-
-        st.markdown("<div class='section-header'><span class='section-icon' aria-hidden='true'><svg viewBox='0 0 24 24'><path d='M4 7h16M4 12h16M4 17h10'/></svg></span>Amenity Hours</div>", unsafe_allow_html=True)
+            st.markdown(ui.BUILDING_ALERTS, unsafe_allow_html=True)
+
+        st.markdown(ui.section_header("Announcements"), unsafe_allow_html=True)
+        announcement_feed()
+
+        recent_payments = dash.get("recent_payments") or []
+        if recent_payments:
+            st.markdown(ui.section_header("Recent Payments"), unsafe_allow_html=True)
+            st.dataframe(pd.DataFrame(recent_payments), use_container_width=True)
+
+        st.markdown(ui.section_header("Amenity Hours", "list"), unsafe_allow_html=True)
         amenities = [
             ["Fitness Center", "5:00 AM – 11:00 PM", "Floor 2", "Key fob required"],
             ["Swimming Pool", "8:00 AM – 9:00 PM", "Rooftop", "May 1 – Oct 31 only"],
@@ -752,15 +625,8 @@ else:
         df_amen = pd.DataFrame(amenities, columns=["Amenity", "Hours", "Location", "Notes"])
         st.table(df_amen)
 
-        st.markdown("<div class='section-header'><span class='section-icon' aria-hidden='true'><svg viewBox='0 0 24 24'><path d='M12 2l8 4v6c0 5-3.4 9.4-8 10-4.6-.6-8-5-8-10V6l8-4z'/><path d='M12 8v4m0 4h.01'/></svg></span>Emergency Contacts</div>", unsafe_allow_html=True)
-        st.markdown("""
-        <div class='metric-card'>
-          <div class='metric-sub'><strong>Leasing Office:</strong> +91 98765 43210 | leasing@riversideapts.com</div>
-          <div class='metric-sub'><strong>Emergency Maintenance:</strong> +91 98765 43211 (24/7)</div>
-          <div class='metric-sub'><strong>Non-emergency police:</strong> 100</div>
-          <div class='metric-sub'><strong>Fire / Medical:</strong> 112</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(ui.section_header("Emergency Contacts", "shield"), unsafe_allow_html=True)
+        st.markdown(ui.EMERGENCY_CONTACTS, unsafe_allow_html=True)
 
         st.markdown("---")
 
@@ -771,69 +637,83 @@ else:
         st.markdown("### Ask anything about your lease, building policies, or maintenance.")
         st.caption("Knowledge base powered by ScaleDown compression")
 
+        chat = st.session_state["chat"]
+        # A turn still running for a question that is no longer pending
+        # (e.g. a quick-question button replaced it) has nobody to answer
+        turn = st.session_state.get("chat_turn")
+        if turn is not None and turn["question"] != chat.pending:
+            cancel_chat_turn("superseded")
+
+        # Only the in-memory window is rendered; older turns load on demand
+        if chat.has_earlier():
+            if st.button(f"Show earlier messages ({chat.archived - len(chat.earlier)} more)", key="chat_show_earlier"):
+                chat.load_earlier()
+                st.rerun()
+
         # Display chat history
-        for msg in st.session_state["messages"]:
+        for msg in chat.visible():
             with st.chat_message(msg["role"]):
                 st.write(msg["content"])
 
         # Process any prefilled messages immediately (those added by sidebar buttons)
-        if st.session_state["messages"] and st.session_state["messages"][-1]["role"] == "user":
-            last = st.session_state["messages"][-1]["content"]
-            # If last message has not yet been answered (no assistant reply after it), process
-            idx = len(st.session_state["messages"]) - 1
-            answered = False
-            if idx + 1 < len(st.session_state["messages"]):
-                for m in st.session_state["messages"][idx+1:]:
-                    if m["role"] == "assistant":
-                        answered = True
-                        break
-            if not answered:
-                with st.chat_message("assistant"):
-                    with st.spinner("Compressing with ScaleDown + thinking with Gemini..."):
-                        compressed, orig_tokens, comp_tokens = compress_knowledge(last)
-                        answer = get_gemini_answer(last, compressed)
-                        st.markdown(answer)
-                        if orig_tokens and comp_tokens:
-                            st.caption(f"ScaleDown compressed {orig_tokens} -> {comp_tokens} tokens before sending to Gemini")
-                st.session_state["messages"].append({"role": "assistant", "content": answer})
+        if chat.pending is not None:
+            last = chat.pending
+            with st.chat_message("assistant"):
+                with st.spinner("Compressing with ScaleDown + thinking with Gemini..."):
+                    trace = {}
+                    answer, orig_tokens, comp_tokens, note = wait_for_answer(last, trace)
+                    st.markdown(answer)
+                    if note:
+                        st.caption(note)
+                    if orig_tokens and comp_tokens:
+                        st.caption(f"ScaleDown compressed {orig_tokens} -> {comp_tokens} tokens before sending to Gemini")
+                    elif trace.get("cached_tokens"):
+                        st.caption(f"Knowledge base read from Gemini's context cache ({trace['cached_tokens']} cached "
+                                   f"tokens); sent {trace['prompt_tokens']} new tokens")
+            chat.append("assistant", answer)
+            persist_session()
+            submit_chat_turn(user["id"], chat.session_id, last, answer)
+            log_question(user, last, answer, trace)
 
         # Chat input
         question = st.chat_input("Ask anything about your lease, maintenance, payments or amenities...")
 
         if question:
-            st.session_state["messages"].append({"role": "user", "content": question})
+            chat.append("user", question)
             with st.chat_message("user"):
                 st.write(question)
 
             with st.chat_message("assistant"):
                 with st.spinner("Compressing with ScaleDown + thinking with Gemini..."):
-                    compressed, orig_tokens, comp_tokens = compress_knowledge(question)
-                    answer = get_gemini_answer(question, compressed)
+                    trace = {}
+                    answer, orig_tokens, comp_tokens, note = wait_for_answer(question, trace)
                     st.markdown(answer)
+                    if note:
+                        st.caption(note)
                     if orig_tokens and comp_tokens:
                         st.caption(f"ScaleDown compressed {orig_tokens} -> {comp_tokens} tokens before sending to Gemini")
-            st.session_state["messages"].append({"role": "assistant", "content": answer})
+                    elif trace.get("cached_tokens"):
+                        st.caption(f"Knowledge base read from Gemini's context cache ({trace['cached_tokens']} cached "
+                                   f"tokens); sent {trace['prompt_tokens']} new tokens")
+            chat.append("assistant", answer)
+            persist_session()
+            submit_chat_turn(user["id"], chat.session_id, question, answer)
+            log_question(user, question, answer, trace)
 
     ########################
     # Tab 3: Rent & Payments
     ########################
     with tabs[2]:
-        st.markdown("<div class='section-header'>Payment Summary</div>", unsafe_allow_html=True)
-        # Refresh balance from session state (may have updated)
-        tenant_balance = st.session_state["user"]["balance"]
-        if tenant_balance == 0:
-            st.markdown("<span class='badge-green'>No Payment Due</span>", unsafe_allow_html=True)
+        st.markdown(ui.section_header("Payment Summary"), unsafe_allow_html=True)
+        if tenant_balance <= 0:
+            st.markdown(ui.badge("No Payment Due"), unsafe_allow_html=True)
         else:
-            st.markdown(f"<span class='badge-amber'>Payment Due: ₹{tenant_balance:,.0f}</span>", unsafe_allow_html=True)
+            st.markdown(ui.badge(f"Payment Due: ₹{tenant_balance:,.0f}", "amber"), unsafe_allow_html=True)
 
-        st.markdown(f"""
-        <div class='metric-card'>
-          <div class='metric-label'>Monthly Rent</div>
-          <div class='metric-value'>₹{tenant_rent:,.0f}</div>
-          <div class='metric-sub'>Balance Due: ₹{tenant_balance:,.0f}</div>
-          <div class='metric-sub'>Late Fee if missed: ₹75</div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(ui.metric_card("Monthly Rent", rent_label, (
+            f"Balance Due: ₹{tenant_balance:,.0f}",
+            f"Late Fee if paid after day {LEASE_TERMS['grace_days']}: ₹{LEASE_TERMS['late_fee']:,.0f}",
+        )), unsafe_allow_html=True)
 
         with st.form("payment_form"):
             st.markdown("#### Payment Details")
@@ -854,13 +734,12 @@ else:
                         user["id"], tenant_name, tenant_unit, tenant_balance
                     )
                     if ok:
-                        st.session_state["user"]["balance"] = 0
                         st.success("Payment processed successfully")
                         st.balloons()
                     else:
                         st.error("Payment failed. Please try again.")
 
-        st.markdown("<div class='section-header'>Payment History</div>", unsafe_allow_html=True)
+        st.markdown(ui.section_header("Payment History"), unsafe_allow_html=True)
         payment_history = get_tenant_payments(user["id"])
         if payment_history:
             df_hist = pd.DataFrame(payment_history)
@@ -872,36 +751,29 @@ else:
     # Tab 4: Feedback
     ########################
     with tabs[3]:
-        st.markdown("<div class='section-header'>Feedback</div>", unsafe_allow_html=True)
+        st.markdown(ui.section_header("Feedback"), unsafe_allow_html=True)
         topic = st.selectbox("What is your feedback about?", ["General", "Maintenance", "Amenities", "Leasing Office", "Building Cleanliness", "Noise Complaint", "Other"])
         rating = st.select_slider("Rate your experience", options=[1,2,3,4,5], value=5, format_func=lambda x: {1:'Poor',2:'Fair',3:'Good',4:'Very Good',5:'Excellent'}[x])
         details = st.text_area("Tell us more (optional)", placeholder="Share any details about your experience...")
         follow = st.checkbox("I would like a follow-up from the leasing team")
         if st.button("Submit Feedback"):
-            ok = add_feedback(
+            ref = submit_feedback(
                 user["id"], tenant_name, tenant_unit,
                 topic, rating, details, follow
             )
-            if ok:
-                st.success("Thank you for your feedback. Our team reviews all submissions within 2 business days.")
-            else:
-                st.error("Failed to submit feedback.")
+            st.success(f"Thank you for your feedback (reference {ref}). Our team reviews all submissions within 2 business days.")
 
         st.markdown("---")
-        st.markdown("<div class='section-header'>Submit a Complaint</div>", unsafe_allow_html=True)
+        st.markdown(ui.section_header("Submit a Complaint"), unsafe_allow_html=True)
         c_subject = st.text_input("Subject", key="complaint_subject")
         c_category = st.selectbox("Category", ["Noise", "Maintenance", "Neighbor", "Building Issue", "Other"], key="complaint_category")
         c_message = st.text_area("Describe your complaint", key="complaint_message")
         if st.button("Submit Complaint"):
             if c_subject and c_message:
-                ok = add_complaint(
+                ref = submit_complaint(
                     user["id"], tenant_name, tenant_unit,
                     c_subject, c_category, c_message
                 )
-                if ok:
-                    ref = random.randint(1000, 9999)
-                    st.success(f"Complaint submitted. Reference #: {ref}")
-                else:
-                    st.error("Failed to submit complaint.")
+                st.success(f"Complaint submitted. Reference #: {ref}")
             else:
                 st.error("Subject and message are required.")
@@ -0,0 +1,139 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from lease_terms import LEASE_TERMS
+
+AGING_BUCKETS = ["current", "days_30", "days_60", "days_90"]
+ROLL_COLUMNS = ["user_id", "as_of", "balance", *AGING_BUCKETS, "late_fees", "next_due_date"]
+
+
+def _to_dates(series):
+    parsed = pd.to_datetime(series, errors="coerce", utc=True)
+    return parsed.dt.tz_localize(None).dt.normalize()
+
+
+def _first_of_month(ordinal):
+    """Month ordinal (year * 12 + month - 1) -> Timestamp of the 1st."""
+    ordinal = np.asarray(ordinal)
+    return pd.to_datetime(pd.DataFrame({"year": ordinal // 12, "month": ordinal % 12 + 1, "day": 1}))
+
+
+def build_rent_roll(users, payments, as_of=None, terms=LEASE_TERMS):
+    """Rent roll for every tenant in one vectorized pass.
+
+    - One rent charge per tenant per month, from the month their lease
+      started (or they were created, without a lease_start) through the
+      month it ends, capped at `as_of`, due on the lease due day (or on
+      move-in for the first month). Tenants without a lease_end are billed
+      month to month.
+    - A late fee for each month where the payments received by the end of
+      the grace period don't cover the rent charged so far.
+    - Payments are applied to the oldest charges first; whatever is left
+      unpaid is aged into current / 30 / 60 / 90+ day buckets.
+
+    `users` and `payments` are lists of rows (as returned by database.py) or
+    DataFrames. Returns a DataFrame with ROLL_COLUMNS, one row per tenant.
+    """
+    as_of = pd.Timestamp(as_of or date.today()).normalize()
+    users = pd.DataFrame(users)
+    if users.empty:
+        return pd.DataFrame(columns=ROLL_COLUMNS)
+    if "role" in users:
+        users = users[users["role"].fillna("tenant") == "tenant"]
+    tenants = pd.DataFrame({"user_id": users["id"].to_numpy()})
+    rent = users["rent"] if "rent" in users else pd.Series(np.nan, index=users.index)
+    missing = pd.Series(None, index=users.index)
+    created = _to_dates(users["created_at"] if "created_at" in users else missing)
+    lease_start = _to_dates(users["lease_start"] if "lease_start" in users else missing)
+    lease_end = _to_dates(users["lease_end"] if "lease_end" in users else missing)
+    tenants["rent"] = pd.to_numeric(rent, errors="coerce").fillna(terms["monthly_rent"]).to_numpy()
+    tenants["start"] = lease_start.fillna(created).fillna(as_of).to_numpy()
+    tenants["end"] = lease_end.to_numpy()
+
+    # Monthly rent charges: repeat each tenant once per billed month. The
+    # last month is the one holding the lease end, unless it ends before
+    # that month's due day.
+    as_of_ord = as_of.year * 12 + as_of.month - 1
+    start_ord = tenants["start"].dt.year * 12 + tenants["start"].dt.month - 1
+    end_ord = (tenants["end"].dt.year * 12 + tenants["end"].dt.month - 1
+               - (tenants["end"].dt.day < terms["due_day"]))
+    end_ord = end_ord.fillna(as_of_ord).clip(upper=as_of_ord).astype(int)
+    months = (end_ord - start_ord + 1).clip(lower=0).to_numpy()
+    start_ord = start_ord.clip(upper=as_of_ord)
+    rent = tenants.loc[tenants.index.repeat(months), ["user_id", "rent"]].reset_index(drop=True)
+    offset = rent.groupby("user_id").cumcount().to_numpy()
+    rent["date"] = _first_of_month(np.repeat(start_ord.to_numpy(), months) + offset)
+    rent["date"] += pd.Timedelta(days=terms["due_day"] - 1)
+    # A tenant who moves in mid-month is billed from their move-in date
+    rent["date"] = np.maximum(rent["date"], np.repeat(tenants["start"].to_numpy(), months))
+    rent = rent.rename(columns={"rent": "amount"})
+    rent["cum_rent"] = rent.groupby("user_id")["amount"].cumsum()
+
+    pay = pd.DataFrame(payments)
+    if pay.empty:
+        pay = pd.DataFrame({"user_id": pd.Series(dtype=rent["user_id"].dtype),
+                            "amount": pd.Series(dtype=float), "date": pd.Series(dtype="datetime64[ns]")})
+    else:
+        paid_on = _to_dates(pay["date"]) if "date" in pay else pd.Series(pd.NaT, index=pay.index)
+        if "created_at" in pay:
+            paid_on = paid_on.fillna(_to_dates(pay["created_at"]))
+        pay = pd.DataFrame({
+            "user_id": pay["user_id"].astype(rent["user_id"].dtype),
+            "amount": pd.to_numeric(pay["amount"], errors="coerce").fillna(0.0),
+            "date": paid_on.fillna(as_of),
+        })
+        pay = pay[pay["date"] <= as_of]
+    pay = pay.sort_values("date")
+    pay["cum_paid"] = pay.groupby("user_id")["amount"].cumsum()
+    total_paid = pay.groupby("user_id")["amount"].sum()
+
+    # Late fees: compare rent charged so far with what was paid by the deadline
+    rent["deadline"] = (rent["date"] + pd.Timedelta(days=terms["grace_days"] - 1)).astype("datetime64[ns]")
+    pay["date"] = pay["date"].astype("datetime64[ns]")
+    rent = rent.sort_values("deadline")
+    rent = pd.merge_asof(
+        rent, pay[["user_id", "date", "cum_paid"]].rename(columns={"date": "paid_date"}),
+        left_on="deadline", right_on="paid_date", by="user_id", direction="backward",
+    )
+    rent["cum_paid"] = rent["cum_paid"].fillna(0.0)
+    late = (rent["deadline"] < as_of) & (rent["cum_paid"] + 0.005 < rent["cum_rent"])
+    fees = pd.DataFrame({
+        "user_id": rent.loc[late, "user_id"],
+        "amount": float(terms["late_fee"]),
+        "date": rent.loc[late, "deadline"] + pd.Timedelta(days=1),
+        "is_fee": True,
+    })
+
+    # Apply payments oldest-charge-first and age what is left
+    charges = pd.concat([rent[["user_id", "amount", "date"]].assign(is_fee=False), fees], ignore_index=True)
+    charges = charges.sort_values(["user_id", "date", "is_fee"], kind="stable")
+    charges["cum"] = charges.groupby("user_id")["amount"].cumsum()
+    paid = charges["user_id"].map(total_paid).fillna(0.0)
+    charges["unpaid"] = np.minimum(np.maximum(charges["cum"] - paid, 0.0), charges["amount"])
+    age = (as_of - charges["date"]).dt.days
+    charges["bucket"] = np.select([age >= 90, age >= 60, age >= 30], AGING_BUCKETS[:0:-1], "current")
+
+    aging = charges.pivot_table(index="user_id", columns="bucket", values="unpaid",
+                                aggfunc="sum", fill_value=0.0).reindex(columns=AGING_BUCKETS, fill_value=0.0)
+    totals = charges.groupby("user_id").agg(charged=("amount", "sum"))
+    totals["late_fees"] = charges[charges["is_fee"]].groupby("user_id")["amount"].sum()
+
+    roll = tenants[["user_id"]].set_index("user_id").join(totals).join(aging).fillna(0.0)
+    roll["balance"] = roll["charged"] - roll.index.map(total_paid).fillna(0.0)
+    next_due = _first_of_month([as_of_ord + 1])[0] + pd.Timedelta(days=terms["due_day"] - 1)
+    if as_of.day <= terms["due_day"]:
+        next_due = as_of.replace(day=terms["due_day"])
+    roll["next_due_date"] = next_due.strftime("%Y-%m-%d")
+    roll["as_of"] = as_of.strftime("%Y-%m-%d")
+    roll = roll.reset_index()
+    roll[["balance", *AGING_BUCKETS, "late_fees"]] = roll[["balance", *AGING_BUCKETS, "late_fees"]].round(2)
+    return roll[ROLL_COLUMNS]
+
+
+def run_month_end_close(as_of=None):
+    """Rebuild the rent roll for all tenants and write it back in one call."""
+    from database import get_all_tenants, get_all_payments, apply_rent_roll
+
+    roll = build_rent_roll(get_all_tenants(), get_all_payments(), as_of)
+    ok = apply_rent_roll(roll.to_dict("records")) if not roll.empty else True
+    return ok, roll
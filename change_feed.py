@@ -0,0 +1,250 @@
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "realtime" subscribes to Supabase Realtime; "poll" re-reads rows past each
+# table's timestamp high-water mark (also the fallback if realtime fails)
+CHANGE_FEED_MODE = os.getenv("CHANGE_FEED_MODE", "realtime")
+CHANGE_FEED_POLL_SECONDS = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "10"))
+
+# table -> timestamp columns that move when a row is inserted or changed
+TABLES = {
+    "announcements": ["date"],
+    "complaints": ["date", "resolved_at"],
+    "payments": ["created_at"],
+}
+ORDER_COLUMN = {"announcements": "date", "complaints": "date", "payments": "created_at"}
+# Tables the feed only streams: their rows live in the shared Arrow snapshot
+# (snapshot.py), so the feed keeps a fingerprint per id just to drop repeats
+STREAM_ONLY = {"payments"}
+
+
+def _fingerprint(row):
+    return hash(tuple(sorted((k, repr(v)) for k, v in row.items())))
+
+
+class Subscription:
+    """Per-session inbox of change events. Sessions drain it on rerun (or
+    from an auto-refreshing fragment) to show what's new since last look."""
+
+    def __init__(self, tables, max_events=200):
+        self.tables = set(tables)
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    def push(self, table, op, row):
+        if table in self.tables:
+            with self._lock:
+                self._events.append((table, op, row))
+
+    def pending(self, table=None):
+        with self._lock:
+            return sum(1 for t, _, _ in self._events if table is None or t == table)
+
+    def drain(self, table=None):
+        with self._lock:
+            taken = [e for e in self._events if table is None or e[0] == table]
+            self._events = deque(
+                (e for e in self._events if not (table is None or e[0] == table)),
+                maxlen=self._events.maxlen,
+            )
+        return taken
+
+
+class ChangeFeed:
+    """Process-wide cache of announcements and complaints kept current by a
+    change feed instead of full-table reads; payments go through the same
+    feed but are only passed on to listeners (see STREAM_ONLY).
+
+    The tables are loaded once at start; afterwards only inserts/updates are
+    applied, and each one is fanned out to every open session's Subscription.
+    """
+
+    def __init__(self, mode=CHANGE_FEED_MODE, fetch_since=None, fetch_latest=None,
+                 poll_seconds=CHANGE_FEED_POLL_SECONDS):
+        self.mode = mode
+        self.poll_seconds = poll_seconds
+        self._fetch = fetch_since
+        self._fetch_last = fetch_latest
+        self._rows = {t: {} for t in TABLES}
+        self._marks = {(t, c): None for t, cols in TABLES.items() for c in cols}
+        self._subs = weakref.WeakSet()
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._started = False
+        self.last_event = None
+
+    def _fetch_since(self, table, column, since):
+        if self._fetch is None:
+            from database import get_rows_since
+            self._fetch = get_rows_since
+        return self._fetch(table, column, since)
+
+    def _fetch_latest(self, table, column):
+        if self._fetch_last is None:
+            from database import get_latest_row
+            self._fetch_last = get_latest_row
+        return self._fetch_last(table, column)
+
+    def add_listener(self, fn):
+        self._listeners.append(fn)
+
+    def apply(self, table, op, row, notify=True):
+        """Apply one insert/update/delete. Returns True if the cache changed."""
+        if table not in self._rows or not row or row.get("id") is None:
+            return False
+        with self._lock:
+            current = self._rows[table].get(row["id"])
+            if op == "DELETE":
+                if current is None:
+                    return False
+                del self._rows[table][row["id"]]
+                if isinstance(current, dict):
+                    # Delete payloads may carry only the id; pass on the
+                    # row as it was so listeners know whose it was
+                    row = {**current, **row}
+            elif table in STREAM_ONLY:
+                fingerprint = _fingerprint(row)
+                if fingerprint == current:
+                    return False
+                self._rows[table][row["id"]] = fingerprint
+            else:
+                merged = {**(current or {}), **row}
+                if merged == current:
+                    return False
+                self._rows[table][row["id"]] = merged
+                row = merged
+            for column in TABLES[table]:
+                value = row.get(column)
+                mark = self._marks[(table, column)]
+                if value and (mark is None or str(value) > mark):
+                    self._marks[(table, column)] = str(value)
+            subs = list(self._subs) if notify else []
+            self.last_event = time.time()
+        for sub in subs:
+            sub.push(table, op, row)
+        for fn in self._listeners:
+            try:
+                fn(table, op, row)
+            except Exception:
+                pass
+        return True
+
+    def poll(self, notify=True):
+        """Read rows at or past each high-water mark and apply them. Rows
+        already cached unchanged are ignored, so the overlap is harmless."""
+        changed = 0
+        for (table, column), mark in list(self._marks.items()):
+            for row in self._fetch_since(table, column, mark):
+                op = "INSERT" if row.get("id") not in self._rows[table] else "UPDATE"
+                changed += self.apply(table, op, row, notify)
+        return changed
+
+    def bootstrap(self):
+        """Load the cached tables and start every high-water mark, without
+        notifying sessions: existing rows are not "new" to anyone. Stream-only
+        tables are loaded by their snapshot, so only their newest row is read
+        here, to start the mark."""
+        for (table, column), mark in list(self._marks.items()):
+            if table in STREAM_ONLY:
+                latest = self._fetch_latest(table, column)
+                if latest:
+                    self.apply(table, "INSERT", latest, notify=False)
+            else:
+                for row in self._fetch_since(table, column, mark):
+                    self.apply(table, "INSERT", row, notify=False)
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        self.bootstrap()
+        target = self._run_realtime if self.mode == "realtime" else self._run_polling
+        threading.Thread(target=target, name="change-feed", daemon=True).start()
+
+    def _run_polling(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.poll()
+            except Exception:
+                pass
+
+    def _on_realtime(self, table, payload):
+        data = payload.get("data", payload)
+        op = data.get("type") or data.get("eventType") or "UPDATE"
+        row = data.get("record") or data.get("new") or data.get("old_record") or data.get("old")
+        self.apply(table, str(op).upper(), row)
+
+    def _run_realtime(self):
+        import asyncio
+
+        async def listen():
+            from supabase import acreate_client
+            client = await acreate_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+            channel = client.channel("tenant-portal-changes")
+            for table in TABLES:
+                channel.on_postgres_changes(
+                    "*", schema="public", table=table,
+                    callback=lambda payload, t=table: self._on_realtime(t, payload),
+                )
+            await channel.subscribe()
+            while True:
+                await asyncio.sleep(3600)
+
+        try:
+            asyncio.run(listen())
+        except Exception:
+            self._run_polling()
+
+    def subscribe(self, tables=None):
+        sub = Subscription(tables or TABLES.keys())
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def rows(self, table, limit=None):
+        if table in STREAM_ONLY:
+            raise ValueError(f"{table} rows are not kept by the feed; use snapshot.py")
+        with self._lock:
+            rows = list(self._rows[table].values())
+        key = ORDER_COLUMN[table]
+        rows.sort(key=lambda r: str(r.get(key) or ""), reverse=True)
+        return rows[:limit] if limit else rows
+
+
+def dashboard_invalidator(invalidate):
+    """Listener that drops the cached dashboard of the tenant a complaint or
+    payment belongs to. Events without a user_id are skipped, since
+    invalidate(None) clears every tenant's dashboard."""
+    def listener(table, op, row):
+        user_id = row.get("user_id")
+        if table in ("complaints", "payments") and user_id is not None:
+            invalidate(user_id)
+    return listener
+
+
+_feed = None
+_init_lock = threading.Lock()
+
+
+def get_feed():
+    global _feed
+    if _feed is None:
+        with _init_lock:
+            if _feed is None:
+                feed = ChangeFeed()
+                from database import invalidate_dashboard
+
+                # Another replica's writes reach us here; keep cached tenant
+                # dashboards in step with them
+                feed.add_listener(dashboard_invalidator(invalidate_dashboard))
+                feed.start()
+                _feed = feed
+    return _feed
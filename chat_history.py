@@ -0,0 +1,133 @@
+import os
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from dotenv import load_dotenv
+from conversation import ConversationMemory
+
+load_dotenv()
+
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", "30"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+CHAT_ARCHIVE_PATH = os.getenv(
+    "CHAT_ARCHIVE_PATH",
+    os.path.join(os.path.dirname(__file__), ".chat_archive.db"),
+)
+
+_lock = threading.Lock()
+_conn = None
+
+
+def _db():
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CHAT_ARCHIVE_PATH, check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS chat_pages ("
+            " session_id TEXT, seq INTEGER, role TEXT, content TEXT,"
+            " PRIMARY KEY (session_id, seq))"
+        )
+        _conn.commit()
+    return _conn
+
+
+class ChatHistory:
+    """Chat transcript for one session.
+
+    Only the newest `window` messages stay in memory; older ones are paged
+    out to a local SQLite archive and brought back a page at a time when the
+    tenant clicks "Show earlier". `pending` holds the latest unanswered user
+    message so callers don't have to rescan the transcript, and `memory`
+    carries the conversation context used to build follow-up prompts.
+    """
+
+    def __init__(self, window=CHAT_WINDOW, page_size=CHAT_PAGE_SIZE):
+        self.session_id = uuid.uuid4().hex
+        self.window = window
+        self.page_size = page_size
+        self.recent = deque()
+        self.earlier = []         # archived messages loaded back for display
+        self.archived = 0         # messages written to the archive
+        self.next_seq = 0
+        self.pending = None
+        self.memory = ConversationMemory()
+
+    def __len__(self):
+        return self.archived + len(self.recent)
+
+    def append(self, role, content):
+        self.recent.append({"seq": self.next_seq, "role": role, "content": content})
+        self.next_seq += 1
+        self.pending = content if role == "user" else None
+        if len(self.recent) > self.window:
+            self._page_out(len(self.recent) - self.window)
+
+    def last(self):
+        return self.recent[-1] if self.recent else None
+
+    def _page_out(self, count):
+        rows = [self.recent.popleft() for _ in range(count)]
+        with _lock:
+            conn = _db()
+            conn.executemany(
+                "INSERT OR REPLACE INTO chat_pages VALUES (?, ?, ?, ?)",
+                [(self.session_id, m["seq"], m["role"], m["content"]) for m in rows],
+            )
+            conn.commit()
+        self.archived += count
+
+    def has_earlier(self):
+        return len(self.earlier) < self.archived
+
+    def load_earlier(self):
+        """Pull the previous page of archived messages back for display."""
+        if not self.has_earlier():
+            return
+        oldest = self.earlier[0]["seq"] if self.earlier else (
+            self.recent[0]["seq"] if self.recent else self.next_seq)
+        with _lock:
+            rows = _db().execute(
+                "SELECT seq, role, content FROM chat_pages"
+                " WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (self.session_id, oldest, self.page_size),
+            ).fetchall()
+        page = [{"seq": s, "role": r, "content": c} for s, r, c in reversed(rows)]
+        self.earlier = page + self.earlier
+
+    def visible(self):
+        return self.earlier + list(self.recent)
+
+    def to_dict(self):
+        """Window, counters and memory, for the shared session store. The
+        paged-out archive stays in CHAT_ARCHIVE_PATH."""
+        return {
+            "session_id": self.session_id,
+            "recent": list(self.recent),
+            "archived": self.archived,
+            "next_seq": self.next_seq,
+            "pending": self.pending,
+            "memory": self.memory.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        chat = cls()
+        chat.session_id = data.get("session_id", chat.session_id)
+        chat.recent = deque(data.get("recent", []))
+        chat.archived = data.get("archived", 0)
+        chat.next_seq = data.get("next_seq", len(chat.recent))
+        chat.pending = data.get("pending")
+        chat.memory = ConversationMemory.from_dict(data.get("memory"))
+        return chat
+
+    def clear(self):
+        with _lock:
+            conn = _db()
+            conn.execute("DELETE FROM chat_pages WHERE session_id = ?", (self.session_id,))
+            conn.commit()
+        self.recent.clear()
+        self.earlier = []
+        self.archived = 0
+        self.pending = None
+        self.memory.clear()
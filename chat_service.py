@@ -0,0 +1,345 @@
+# Chat pipeline shared by the Streamlit UI (app.py) and the HTTP API (api.py).
+# Keep Streamlit out of this module so it can run in any worker process.
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import google.generativeai as genai
+from dotenv import load_dotenv
+from admission import controller as llm_gate
+from answer_cache import answer_cache
+from model_router import router as model_router
+from context_cache import ContextCache
+from deadline import Deadline
+from conversation import estimate_tokens, HISTORY_TOKEN_BUDGET, PROMPT_TOKEN_BUDGET
+from extractive import get_answerer
+
+load_dotenv()
+
+SCALEDOWN_API_KEY = os.getenv("SCALEDOWN_API_KEY")
+SCALEDOWN_URL = os.getenv("SCALEDOWN_API_URL", "https://api.scaledown.xyz/compress/raw/")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+# Latency budget for one Gemini call; past it we answer from the documents
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "30"))
+# Threads running chat turns for submit_answer(); admission still limits
+# how many reach ScaleDown/Gemini at once
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "32"))
+
+# Configure Gemini (models are picked per question by model_router)
+genai.configure(api_key=GEMINI_API_KEY)
+
+_workers = ThreadPoolExecutor(max_workers=CHAT_WORKERS, thread_name_prefix="chat")
+
+# Load knowledge base files
+def load_knowledge_base():
+    base_dir = os.path.join(os.path.dirname(__file__), 'data')
+    lease_text = open(os.path.join(base_dir, 'lease_agreement.txt'), 'r', encoding='utf-8').read()
+    policy_text = open(os.path.join(base_dir, 'building_policies.txt'), 'r', encoding='utf-8').read()
+    return lease_text, policy_text
+
+lease_text, policy_text = load_knowledge_base()
+full_knowledge = f"=== LEASE AGREEMENT ===\n{lease_text}\n\n=== BUILDING POLICIES ===\n{policy_text}"
+
+# Step 1: Use ScaleDown to compress the knowledge base
+def compress_knowledge(question, deadline=None):
+    headers = {
+        "x-api-key": SCALEDOWN_API_KEY,
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "context": full_knowledge,
+        "prompt": question,
+        "scaledown": { "rate": "auto" }
+    }
+    timeout = deadline.timeout(15) if deadline is not None else 15
+    try:
+        if timeout <= 0:
+            raise TimeoutError("no time left for compression")
+        response = requests.post(SCALEDOWN_URL, json=payload, headers=headers, timeout=timeout)
+        if response.status_code == 200:
+            result = response.json()
+            compressed = result["results"]["compressed_prompt"]
+            original_tokens = result["results"].get("original_prompt_tokens", 0)
+            compressed_tokens = result["results"].get("compressed_prompt_tokens", 0)
+            return compressed, original_tokens, compressed_tokens
+    except Exception:
+        pass
+    # fallback: local excerpt of the most relevant sections if compression fails
+    return get_answerer().context(question), 0, 0
+
+GEMINI_ERROR_PREFIX = "Unable to get answer from Gemini: "
+BUSY_MESSAGE = ("The assistant is busy right now. Please try again in a moment, "
+                "or contact leasing at leasing@riversideapts.com or call (512) 847-3300.")
+UNAVAILABLE_MESSAGE = ("I don't have that information right now — please contact leasing at "
+                       "leasing@riversideapts.com or call (512) 847-3300")
+SLOW_DOWN_MESSAGE = "You're sending questions quickly. Please wait a few seconds and try again."
+
+INSTRUCTIONS = """You are a helpful tenant services assistant for Riverside Apartments.
+Use ONLY the information below to answer the tenant's question.
+If the answer is not in the information, say: "I don't have that information — please contact leasing at leasing@riversideapts.com or call (512) 847-3300"
+Be friendly, concise and professional.
+
+When writing monetary amounts, use the form "USD 500" (the letters USD, a space, then the amount) instead of the dollar sign. The UI will convert this back to a dollar sign for display."""
+
+# The static prompt prefix, cached on Gemini once per knowledge-base version
+context_cache = ContextCache(INSTRUCTIONS, f"KNOWLEDGE BASE:\n{full_knowledge}")
+
+
+# The per-turn part of the prompt: conversation so far and the question
+def turn_prompt(question, history=""):
+    conversation = f"""
+CONVERSATION SO FAR (use it to resolve follow-up questions; the knowledge base stays the only source of facts):
+{history}
+""" if history else ""
+    return f"""{conversation}
+TENANT QUESTION: {question}
+
+ANSWER:"""
+
+def build_prompt(question, compressed_context, history=""):
+    return f"""{INSTRUCTIONS}
+
+KNOWLEDGE BASE (compressed):
+{compressed_context}
+{turn_prompt(question, history)}"""
+
+# Step 2: Use Gemini to answer. `models` are the cached-prefix models from
+# cached_models(), in which case `prompt` is only turn_prompt().
+def get_gemini_answer(question, prompt, trace=None, models=None, deadline=None):
+    try:
+        response, route = model_router.generate(question, prompt, timeout=GEMINI_TIMEOUT,
+                                                models=models, deadline=deadline)
+        raw = response.text
+        if trace is not None:
+            usage = getattr(response, "usage_metadata", None)
+            cached = getattr(usage, "cached_content_token_count", None) or 0
+            trace["route"] = route
+            # Fresh input only; the cached prefix is billed separately
+            trace["prompt_tokens"] = (getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)) - cached
+            trace["answer_tokens"] = getattr(usage, "candidates_token_count", None) or estimate_tokens(raw)
+            if cached:
+                trace["cached_tokens"] = cached
+        return format_answer(raw)
+    except Exception as e:
+        if models:
+            # The cache entry may have been deleted; look it up again next turn
+            context_cache.invalidate()
+        return f"{GEMINI_ERROR_PREFIX}{str(e)}"
+
+
+def format_answer(text: str) -> str:
+    """Post-process Gemini output:
+    - Convert 'USD 500' back to '$500'
+    - Escape dollar signs so Streamlit does not interpret them as LaTeX
+    """
+    if not isinstance(text, str):
+        return text
+    # Replace the temporary USD token back to dollar sign
+    out = text.replace("USD ", "$")
+    # Escape dollar signs for Streamlit/Markdown rendering
+    out = out.replace("$", "\\$")
+    return out
+
+
+# Cached answer first, then the offline extractive answerer. Returns
+# (answer, note) or None if neither has anything for this question.
+def degraded_answer(question, cached, reason):
+    if cached:
+        return cached, f"{reason} — showing a saved answer."
+    offline = get_answerer().answer(question)
+    if offline:
+        return format_answer(offline), f"{reason} — answered directly from the lease and policy documents."
+    return None
+
+
+def _elapsed_ms(since):
+    return round((time.perf_counter() - since) * 1000, 1)
+
+
+# Models bound to the cached instructions + knowledge prefix for every
+# route, or None to send the knowledge with each prompt
+def cached_models():
+    return context_cache.models(model_router.model_names.values())
+
+
+# The prompt for this turn plus as much conversation history as the prompt
+# budget allows. Without cached `models` the knowledge base is compressed
+# into the prompt. Returns (prompt, original_tokens, compressed_tokens).
+def prepare_context(question, memory, trace, models=None, deadline=None):
+    if models:
+        # Knowledge is in the cached prefix: no ScaleDown call, and the
+        # prompt is just the conversation and the question
+        trace.update(compress_ms=0.0, context_cache=context_cache.version)
+        compressed, orig_tokens, comp_tokens = None, 0, 0
+    else:
+        query = memory.retrieval_query(question) if memory is not None else question
+        stage = time.perf_counter()
+        compressed, orig_tokens, comp_tokens = compress_knowledge(query, deadline)
+        trace.update(compress_ms=_elapsed_ms(stage), original_tokens=orig_tokens, compressed_tokens=comp_tokens)
+
+    def render(history=""):
+        return turn_prompt(question, history) if models else build_prompt(question, compressed, history)
+
+    history = ""
+    if memory is not None:
+        room = PROMPT_TOKEN_BUDGET - estimate_tokens(render())
+        history = memory.render(min(HISTORY_TOKEN_BUDGET, room))
+    return render(history), orig_tokens, comp_tokens
+
+
+# Full pipeline behind the shared admission gate. Returns
+# (answer, original_tokens, compressed_tokens, note) where note explains
+# a degraded answer, if any. `memory` is the session's ConversationMemory;
+# answered turns are recorded into it. `trace`, if given, receives cache
+# status, stage latencies (ms) and token counts for the question log.
+# `deadline` bounds the whole turn; once it is cancelled, stages that
+# haven't started are skipped and a late answer only goes to the cache.
+def answer_question(question, user_id, memory=None, trace=None, deadline=None):
+    trace = {} if trace is None else trace
+    deadline = Deadline() if deadline is None else deadline
+    started = time.perf_counter()
+    follow_up = memory is not None and memory.is_follow_up(question)
+    # Follow-ups depend on earlier turns, so they never share cache entries
+    late = None if follow_up else answer_cache.get_late(question)
+    if late:
+        # Someone asked this moments ago and left before the answer came
+        if memory is not None:
+            memory.add_exchange(question, late)
+        trace.update(cache="late", served_from="late_cache", total_ms=_elapsed_ms(started))
+        return late, 0, 0, None
+    cached = None if follow_up else answer_cache.get(question)
+    trace["cache"] = "bypass" if follow_up else "hit" if cached else "miss"
+
+    def degrade(reason, message):
+        fallback = degraded_answer(question, cached, reason)
+        trace["total_ms"] = _elapsed_ms(started)
+        if fallback:
+            trace["served_from"] = "cache" if fallback[0] is cached else "extractive"
+            return fallback[0], 0, 0, fallback[1]
+        trace["served_from"] = "none"
+        return message, 0, 0, None
+
+    def cancelled():
+        trace.update(served_from="cancelled", total_ms=_elapsed_ms(started))
+        return BUSY_MESSAGE, 0, 0, None
+
+    with llm_gate.slot(user_id, deadline) as admission:
+        trace["admission_ms"] = _elapsed_ms(started)
+        if not admission.admitted:
+            if admission.reason == "cancelled":
+                return cancelled()
+            return degrade("Assistant is busy",
+                           SLOW_DOWN_MESSAGE if admission.reason == "rate_limited" else BUSY_MESSAGE)
+        models = cached_models()
+        prompt, orig_tokens, comp_tokens = prepare_context(question, memory, trace, models, deadline)
+        if deadline.expired:
+            # Nobody is waiting any more, or no time is left for Gemini
+            return cancelled() if deadline.cancelled else degrade("Assistant took too long", UNAVAILABLE_MESSAGE)
+        stage = time.perf_counter()
+        answer = get_gemini_answer(question, prompt, trace, models, deadline)
+        trace["generate_ms"] = _elapsed_ms(stage)
+    if answer.startswith(GEMINI_ERROR_PREFIX):
+        if deadline.cancelled:
+            return cancelled()
+        return degrade("Gemini is unavailable", UNAVAILABLE_MESSAGE)
+    if deadline.cancelled:
+        # Too late for the tenant who asked, but the next ask gets it from
+        # the cache; it never reached the conversation, so skip memory
+        if not follow_up:
+            answer_cache.put_late(question, answer)
+        trace.update(served_from="late", total_ms=_elapsed_ms(started))
+        return answer, orig_tokens, comp_tokens, None
+    if not follow_up:
+        answer_cache.put(question, answer)
+    if memory is not None:
+        memory.add_exchange(question, answer)
+    trace.update(served_from="gemini", total_ms=_elapsed_ms(started))
+    return answer, orig_tokens, comp_tokens, None
+
+
+def submit_answer(question, user_id, memory=None, trace=None, deadline=None):
+    """answer_question() on a worker thread. Returns a Future, so a caller
+    that may stop waiting (a Streamlit rerun) can cancel `deadline`
+    instead of being stuck inside the call."""
+    return _workers.submit(answer_question, question, user_id, memory, trace, deadline)
+
+
+def _split_usd(text):
+    """Split off a trailing partial "USD " so format_answer never sees half
+    of the token; the held-back tail is prepended to the next chunk."""
+    for k in range(min(3, len(text)), 0, -1):
+        if text.endswith("USD "[:k]):
+            return text[:-k], text[-k:]
+    return text, ""
+
+
+# Same pipeline as answer_question(), but yields formatted answer text as
+# Gemini produces it. The admission slot is held until the generator is
+# exhausted or closed. A degraded answer arrives as one chunk and its note
+# is left in trace["note"].
+def stream_answer(question, user_id, memory=None, trace=None, deadline=None):
+    trace = {} if trace is None else trace
+    deadline = Deadline() if deadline is None else deadline
+    started = time.perf_counter()
+    follow_up = memory is not None and memory.is_follow_up(question)
+    cached = None if follow_up else answer_cache.get(question)
+    trace["cache"] = "bypass" if follow_up else "hit" if cached else "miss"
+
+    def degrade(reason, message):
+        fallback = degraded_answer(question, cached, reason)
+        trace["total_ms"] = _elapsed_ms(started)
+        if fallback:
+            trace["served_from"] = "cache" if fallback[0] is cached else "extractive"
+            trace["note"] = fallback[1]
+            return fallback[0]
+        trace["served_from"] = "none"
+        return message
+
+    parts = []
+    with llm_gate.slot(user_id, deadline) as admission:
+        trace["admission_ms"] = _elapsed_ms(started)
+        if not admission.admitted:
+            yield degrade("Assistant is busy",
+                          SLOW_DOWN_MESSAGE if admission.reason == "rate_limited" else BUSY_MESSAGE)
+            return
+        models = cached_models()
+        prompt, _, _ = prepare_context(question, memory, trace, models, deadline)
+        if deadline.expired:
+            yield degrade("Assistant took too long", UNAVAILABLE_MESSAGE)
+            return
+        stage = time.perf_counter()
+        held = ""
+        try:
+            for text, route in model_router.stream(question, prompt, timeout=GEMINI_TIMEOUT,
+                                                   models=models, deadline=deadline):
+                if deadline.expired:
+                    # Stop reading; closing the stream ends the generation
+                    raise TimeoutError(deadline.reason or "turn deadline passed")
+                trace["route"] = route
+                ready, held = _split_usd(held + text)
+                if ready:
+                    parts.append(format_answer(ready))
+                    yield parts[-1]
+            if held:
+                parts.append(format_answer(held))
+                yield parts[-1]
+        except Exception:
+            trace["generate_ms"] = _elapsed_ms(stage)
+            if models:
+                context_cache.invalidate()
+            if not parts:
+                yield degrade("Gemini is unavailable", UNAVAILABLE_MESSAGE)
+                return
+            # Part of the answer is already on screen; say it was cut short
+            trace.update(served_from="partial", total_ms=_elapsed_ms(started))
+            yield "\n\n_(The answer was cut off — please ask again.)_"
+            return
+        trace["generate_ms"] = _elapsed_ms(stage)
+    answer = "".join(parts)
+    trace["prompt_tokens"] = estimate_tokens(prompt)
+    trace["answer_tokens"] = estimate_tokens(answer)
+    if memory is not None:
+        memory.add_exchange(question, answer)
+    if not follow_up:
+        answer_cache.put(question, answer)
+    trace.update(served_from="gemini", total_ms=_elapsed_ms(started))
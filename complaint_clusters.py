@@ -0,0 +1,181 @@
+import os
+import threading
+import zlib
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from extractive import tokenize, _stem
+
+load_dotenv()
+
+# Cosine similarity to a group's centroid needed to join it
+COMPLAINT_CLUSTER_THRESHOLD = float(os.getenv("COMPLAINT_CLUSTER_THRESHOLD", "0.4"))
+# A complaint only joins groups whose latest report is this recent
+COMPLAINT_CLUSTER_WINDOW_HOURS = float(os.getenv("COMPLAINT_CLUSTER_WINDOW_HOURS", "72"))
+# Hashed feature space; fixed, so vectors never need rebuilding as words appear
+DIMENSIONS = 2 ** 12
+# Words that describe the state of almost any complaint rather than what it
+# is about; left in, "AC not working" and "elevator not working" look alike
+GENERIC_TERMS = frozenset(_stem(w) for w in """
+not no working work broken broke stuck out order issue problem please since
+still again fix help today yesterday morning
+""".split())
+
+
+def _terms(text):
+    return [t for t in tokenize(str(text or "")) if t not in GENERIC_TERMS]
+
+
+def complaint_vector(subject, message):
+    """Unit-length hashed term vector. Subject words and subject bigrams
+    ("hot water") count double, term counts are log-scaled so one repeated
+    word doesn't dominate."""
+    v = np.zeros(DIMENSIONS, dtype=np.float32)
+    subject = _terms(subject)
+    bigrams = [f"{a} {b}" for a, b in zip(subject, subject[1:])]
+    for tokens, weight in ((subject, 2.0), (bigrams, 2.0), (_terms(message), 1.0)):
+        for token in tokens:
+            v[zlib.crc32(token.encode()) % DIMENSIONS] += weight
+    np.log1p(v, out=v)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def _time(value):
+    t = pd.to_datetime(value, errors="coerce", utc=True)
+    return None if pd.isna(t) else t.timestamp()
+
+
+class ComplaintClusters:
+    """Open complaints grouped into incidents, updated one row at a time.
+
+    Each group keeps the sum of its members' vectors and a normalized
+    centroid row in one matrix, so placing a new complaint is a single
+    matrix-vector product. Greedy assignment like
+    question_log.cluster_questions: join the most similar recent group of
+    the same category at or above `threshold`, otherwise start a new one.
+    Resolved complaints leave their group; empty groups free their row for
+    reuse.
+    """
+
+    def __init__(self, threshold=COMPLAINT_CLUSTER_THRESHOLD, window_hours=COMPLAINT_CLUSTER_WINDOW_HOURS):
+        self.threshold = threshold
+        self.window = window_hours * 3600
+        self._centroids = np.zeros((16, DIMENSIONS), dtype=np.float32)
+        self._sums = np.zeros((16, DIMENSIONS), dtype=np.float32)
+        self._latest = np.full(16, -np.inf)
+        self._categories = np.full(16, None, dtype=object)
+        self._members = {}  # group slot -> {complaint id: row}
+        self._vectors = {}  # complaint id -> vector
+        self._group_of = {}  # complaint id -> group slot
+        self._free = list(range(15, -1, -1))
+        self._lock = threading.Lock()
+
+    def _new_slot(self):
+        if not self._free:
+            n = len(self._centroids)
+            self._centroids = np.vstack([self._centroids, np.zeros_like(self._centroids)])
+            self._sums = np.vstack([self._sums, np.zeros_like(self._sums)])
+            self._latest = np.concatenate([self._latest, np.full(n, -np.inf)])
+            self._categories = np.concatenate([self._categories, np.full(n, None, dtype=object)])
+            self._free = list(range(2 * n - 1, n - 1, -1))
+        return self._free.pop()
+
+    def _refresh(self, slot):
+        norm = np.linalg.norm(self._sums[slot])
+        self._centroids[slot] = self._sums[slot] / norm if norm else 0.0
+
+    def _add(self, row):
+        v = complaint_vector(row.get("subject"), row.get("message"))
+        at = _time(row.get("date"))
+        category = str(row.get("category") or "").lower()
+        sims = self._centroids @ v
+        # A noise report never joins a maintenance incident
+        sims[self._categories != category] = -1.0
+        if at is not None:
+            # Reports of an old incident don't absorb a new one
+            sims[self._latest < at - self.window] = -1.0
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold or best not in self._members:
+            best = self._new_slot()
+            self._members[best] = {}
+            self._categories[best] = category
+        self._members[best][row["id"]] = row
+        self._sums[best] += v
+        self._refresh(best)
+        self._latest[best] = max(self._latest[best], at if at is not None else np.inf)
+        self._vectors[row["id"]] = v
+        self._group_of[row["id"]] = best
+
+    def _remove(self, complaint_id):
+        slot = self._group_of.pop(complaint_id)
+        v = self._vectors.pop(complaint_id)
+        del self._members[slot][complaint_id]
+        if self._members[slot]:
+            self._sums[slot] -= v
+            self._refresh(slot)
+            return
+        del self._members[slot]
+        self._sums[slot] = 0.0
+        self._centroids[slot] = 0.0
+        self._latest[slot] = -np.inf
+        self._categories[slot] = None
+        self._free.append(slot)
+
+    def apply(self, row, op="UPDATE"):
+        """Track one complaint insert/update/delete from the change feed."""
+        if not row or row.get("id") is None:
+            return
+        with self._lock:
+            known = row["id"] in self._group_of
+            if op == "DELETE" or row.get("status") == "Resolved":
+                if known:
+                    self._remove(row["id"])
+            elif known:
+                self._members[self._group_of[row["id"]]][row["id"]] = row
+            else:
+                self._add(row)
+
+    def load(self, rows):
+        for row in sorted(rows, key=lambda r: str(r.get("date") or "")):
+            self.apply(row, "INSERT")
+        return self
+
+    def groups(self):
+        """Open incidents, largest and then most recent first. Each is a
+        dict with a stable `key` (its oldest complaint id), the complaint
+        `ids` and `rows` oldest first, the distinct `units` and `latest`."""
+        with self._lock:
+            groups = []
+            for members in self._members.values():
+                rows = sorted(members.values(), key=lambda r: str(r.get("date") or ""))
+                groups.append({
+                    "key": rows[0]["id"],
+                    "ids": [r["id"] for r in rows],
+                    "rows": rows,
+                    "units": sorted({str(r.get("unit") or "") for r in rows}),
+                    "latest": str(rows[-1].get("date") or ""),
+                })
+        groups.sort(key=lambda g: g["latest"], reverse=True)
+        groups.sort(key=lambda g: len(g["ids"]), reverse=True)
+        return groups
+
+
+_clusters = None
+_init_lock = threading.Lock()
+
+
+def get_complaint_clusters():
+    """Process-wide groups of open complaints, kept current by the change
+    feed's complaint events."""
+    global _clusters
+    if _clusters is None:
+        with _init_lock:
+            if _clusters is None:
+                from change_feed import get_feed
+
+                feed = get_feed()
+                clusters = ComplaintClusters()
+                feed.add_listener(lambda table, op, row: clusters.apply(row, op) if table == "complaints" else None)
+                _clusters = clusters.load(feed.rows("complaints"))
+    return _clusters
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import timedelta
+from dotenv import load_dotenv
+from shared_store import get_json, set_json
+
+load_dotenv()
+
+# Gemini explicit context caching for the static prompt prefix (instructions
+# + the whole knowledge base). With a live cache each turn sends only the
+# conversation and the question; the prefix is billed at the cached rate.
+CONTEXT_CACHE_ENABLED = os.getenv("GEMINI_CONTEXT_CACHE", "1").lower() not in ("0", "false", "no", "off")
+CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# Extend an entry's TTL once it is this close to expiring
+CONTEXT_CACHE_REFRESH = int(os.getenv("GEMINI_CONTEXT_CACHE_REFRESH", "600"))
+# After a failed create, use the uncached prompt for this long
+CONTEXT_CACHE_RETRY = 300
+
+
+def prefix_version(system_instruction, contents):
+    """Changes whenever the instructions or anything under data/ changes."""
+    digest = hashlib.sha256(f"{system_instruction}\x00{contents}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class GeminiCachingAPI:
+    """google.generativeai's CachedContent calls, behind the small interface
+    ContextCache uses."""
+
+    def create(self, model_name, display_name, system_instruction, contents, ttl):
+        from google.generativeai import caching
+
+        entry = caching.CachedContent.create(
+            model=model_name, display_name=display_name, system_instruction=system_instruction,
+            contents=[contents], ttl=timedelta(seconds=ttl),
+        )
+        return entry.name
+
+    def extend(self, name, ttl):
+        from google.generativeai import caching
+
+        caching.CachedContent.get(name).update(ttl=timedelta(seconds=ttl))
+
+    def model(self, name):
+        import google.generativeai as genai
+        from google.generativeai import caching
+
+        return genai.GenerativeModel.from_cached_content(caching.CachedContent.get(name))
+
+
+class _Usage:
+    def __init__(self, usage, cached_tokens):
+        self.prompt_token_count = (getattr(usage, "prompt_token_count", 0) or 0) + cached_tokens
+        self.candidates_token_count = getattr(usage, "candidates_token_count", None)
+        self.cached_content_token_count = cached_tokens
+
+
+class _Response:
+    def __init__(self, response, cached_tokens):
+        self.text = response.text
+        self.usage_metadata = _Usage(getattr(response, "usage_metadata", None), cached_tokens)
+
+
+class _LocalCachedModel:
+    def __init__(self, api, name, model):
+        self.api, self.name, self._model = api, name, model
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        entry = self.api.entry(self.name)
+        if entry is None:
+            raise LookupError(f"CachedContent not found (or expired): {self.name}")
+        response = self._model.generate_content(prompt, stream=stream, **kwargs)
+        return response if stream else _Response(response, entry["tokens"])
+
+
+class LocalCachingAPI:
+    """In-process stand-in for the caching API, for tests and loadtest.py.
+    Entries expire on their TTL like the real ones; cached models wrap
+    `model_factory(model_name)`, receive only the per-turn prompt and
+    report the prefix as cached_content_token_count."""
+
+    def __init__(self, model_factory, clock=time.time):
+        self.model_factory = model_factory
+        self.clock = clock
+        self.created = 0
+        self.extended = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def entry(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry["expires"] <= self.clock():
+                self._entries.pop(name, None)
+                return None
+            return entry
+
+    def create(self, model_name, display_name, system_instruction, contents, ttl):
+        from conversation import estimate_tokens
+
+        with self._lock:
+            self.created += 1
+            name = f"cachedContents/local-{self.created}"
+            self._entries[name] = {
+                "model": model_name, "display_name": display_name,
+                "tokens": estimate_tokens(system_instruction) + estimate_tokens(contents),
+                "expires": self.clock() + ttl,
+            }
+        return name
+
+    def extend(self, name, ttl):
+        if self.entry(name) is None:
+            raise LookupError(f"CachedContent not found (or expired): {name}")
+        with self._lock:
+            self.extended += 1
+            self._entries[name]["expires"] = self.clock() + ttl
+
+    def model(self, name):
+        entry = self.entry(name)
+        if entry is None:
+            raise LookupError(f"CachedContent not found (or expired): {name}")
+        return _LocalCachedModel(self, name, self.model_factory(entry["model"]))
+
+
+class ContextCache:
+    """One cached-content entry per (model, prefix version).
+
+    Entry names are published in the shared store, so replicas reuse one
+    entry instead of each creating their own. Entries are extended lazily
+    when a turn finds them close to expiry, and left to expire while the
+    assistant is idle. Every failure returns None and the caller falls back
+    to the uncached prompt.
+    """
+
+    def __init__(self, system_instruction, contents, api=None, ttl=CONTEXT_CACHE_TTL,
+                 refresh=CONTEXT_CACHE_REFRESH, enabled=CONTEXT_CACHE_ENABLED, clock=time.time):
+        self.system_instruction = system_instruction
+        self.contents = contents
+        self.version = prefix_version(system_instruction, contents)
+        self.api = api or GeminiCachingAPI()
+        self.ttl = ttl
+        self.refresh = refresh
+        self.enabled = enabled
+        self.clock = clock
+        self._entries = {}  # model name -> {"name", "expires", "model"}
+        self._failed_at = {}
+        self._inflight = set()  # model names with a create/extend under way
+        self._lock = threading.Lock()
+
+    def _key(self, model_name):
+        return f"ctxcache:{model_name}:{self.version}"
+
+    def _bind(self, name, expires):
+        return {"name": name, "expires": expires, "model": self.api.model(name)}
+
+    def _acquire(self, model_name, entry, now):
+        """Network side of `models`: find, create or extend the entry for
+        `model_name`. Runs outside `_lock`; returns the new local entry."""
+        if entry is None or entry["expires"] <= now:
+            # Another replica may already have one for this version
+            shared = get_json(self._key(model_name))
+            if shared and shared.get("expires", 0) > now + 60:
+                try:
+                    entry = self._bind(shared["name"], shared["expires"])
+                except Exception:
+                    entry = None
+            else:
+                entry = None
+        if entry is None:
+            name = self.api.create(model_name, f"tenant-kb-{self.version}",
+                                   self.system_instruction, self.contents, self.ttl)
+            entry = self._bind(name, now + self.ttl)
+            set_json(self._key(model_name), {"name": name, "expires": entry["expires"]}, self.ttl)
+        elif entry["expires"] - now < self.refresh:
+            self.api.extend(entry["name"], self.ttl)
+            entry = {**entry, "expires": now + self.ttl}
+            set_json(self._key(model_name), {"name": entry["name"], "expires": entry["expires"]}, self.ttl)
+        return entry
+
+    def _model(self, model_name):
+        with self._lock:
+            now = self.clock()
+            if now - self._failed_at.get(model_name, float("-inf")) < CONTEXT_CACHE_RETRY:
+                return None
+            entry = self._entries.get(model_name)
+            usable = entry is not None and entry["expires"] > now
+            if usable and entry["expires"] - now >= self.refresh:
+                return entry["model"]
+            if model_name in self._inflight:
+                # Another turn is creating or extending it; don't wait on
+                # that call, use the entry while it lasts or skip the cache
+                return entry["model"] if usable else None
+            self._inflight.add(model_name)
+        try:
+            entry = self._acquire(model_name, entry, now)
+        except Exception:
+            # e.g. prefix below the model's minimum cacheable size
+            with self._lock:
+                self._entries.pop(model_name, None)
+                self._failed_at[model_name] = self.clock()
+            return None
+        else:
+            with self._lock:
+                self._entries[model_name] = entry
+            return entry["model"]
+        finally:
+            with self._lock:
+                self._inflight.discard(model_name)
+
+    def models(self, model_names):
+        """{model name: model bound to the cached prefix} for every name,
+        or None if caching is off or any entry can't be had right now.
+        Cache API calls run outside the lock, one per model at a time, so
+        a slow create or extend never holds up other sessions' lookups."""
+        if not self.enabled:
+            return None
+        models = {}
+        for model_name in dict.fromkeys(model_names):
+            model = self._model(model_name)
+            if model is None:
+                return None
+            models[model_name] = model
+        return models
+
+    def invalidate(self):
+        """Forget local entries (e.g. after a cached call failed because the
+        entry was deleted server-side); the next turn looks them up again."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        now = self.clock()
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "version": self.version,
+                "entries": {m: round(e["expires"] - now) for m, e in self._entries.items() if e["expires"] > now},
+            }
@@ -0,0 +1,148 @@
+import os
+import re
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+HISTORY_EXCHANGES = int(os.getenv("HISTORY_EXCHANGES", "3"))
+HISTORY_SUMMARY_TOKENS = int(os.getenv("HISTORY_SUMMARY_TOKENS", "250"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "700"))
+# Cap for the whole Gemini prompt; history only gets whatever room is left
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3500"))
+
+# Openers that only make sense as a continuation of the last exchange
+FOLLOW_UP = re.compile(r"^(and|but|also|or|so|then|what about|how about|what if|same|ok|okay)\b")
+# Pronouns that may point back at the last exchange
+REFERENCE = re.compile(r"\b(it|that|this|they|them|those|these)\b")
+# Knowledge-base words too generic to name a topic ("is it allowed?")
+GENERIC_TERMS = frozenset(
+    "allow permit cost charge fee pay have same then that they them those these".split()
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def _topic_terms(question):
+    from extractive import get_answerer, tokenize
+
+    vocab = get_answerer().vocab
+    return [t for t in tokenize(question) if t in vocab and t not in GENERIC_TERMS]
+
+
+def _clip(text, max_chars):
+    text = " ".join((text or "").split())
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def _first_sentence(text, max_chars):
+    text = (text or "").replace("\\$", "$")
+    match = re.search(r"(.+?[.!?])(\s|$)", " ".join(text.split()))
+    return _clip(match.group(1) if match else text, max_chars)
+
+
+class ConversationMemory:
+    """Multi-turn context for the chat prompt.
+
+    The last `keep_exchanges` question/answer pairs are kept verbatim. Older
+    pairs are folded, one at a time as they age out, into a short rolling
+    summary that is itself capped at `summary_tokens`. `render()` then fits
+    both into a fixed token budget, so the prompt size does not grow with the
+    length of the conversation.
+
+    A chat turn updates the memory on a worker thread while the session may
+    be persisting it (`to_dict`) on the script thread, so every read and
+    write holds `_lock`.
+    """
+
+    def __init__(self, keep_exchanges=HISTORY_EXCHANGES, summary_tokens=HISTORY_SUMMARY_TOKENS):
+        self.keep_exchanges = keep_exchanges
+        self.summary_tokens = summary_tokens
+        self.exchanges = deque()
+        self.summary = deque()
+        self._summary_used = 0
+        self._lock = threading.RLock()
+
+    def add_exchange(self, question, answer):
+        with self._lock:
+            self.exchanges.append((question, answer.replace("\\$", "$")))
+            while len(self.exchanges) > self.keep_exchanges:
+                self._fold(*self.exchanges.popleft())
+
+    def _fold(self, question, answer):
+        line = f"- Tenant asked: {_clip(question, 120)} Answer: {_first_sentence(answer, 160)}"
+        self.summary.append(line)
+        self._summary_used += estimate_tokens(line)
+        while self._summary_used > self.summary_tokens and len(self.summary) > 1:
+            self._summary_used -= estimate_tokens(self.summary.popleft())
+
+    def is_follow_up(self, question):
+        """Short questions that open with a connective, or that use a pronoun
+        and name no knowledge-base topic of their own. "Is there a gym in
+        this building?" mentions the building, so it stands alone."""
+        q = (question or "").lower().strip()
+        with self._lock:
+            has_history = bool(self.exchanges)
+        if not has_history or len(q.split()) > 12:
+            return False
+        if FOLLOW_UP.search(q):
+            return True
+        return bool(REFERENCE.search(q)) and not _topic_terms(q)
+
+    def retrieval_query(self, question):
+        """Standalone query for knowledge-base compression: follow-ups like
+        "and what about cats?" are joined with the previous question."""
+        if self.is_follow_up(question):
+            with self._lock:
+                if self.exchanges:
+                    return f"{self.exchanges[-1][0]} {question}"
+        return question
+
+    def render(self, budget=HISTORY_TOKEN_BUDGET):
+        with self._lock:
+            summary = list(self.summary)
+            recent = [f"Tenant: {q}\nAssistant: {a}" for q, a in self.exchanges]
+
+        def build():
+            parts = []
+            if summary:
+                parts.append("Earlier in this conversation:\n" + "\n".join(summary))
+            if recent:
+                parts.append("Most recent exchanges:\n" + "\n\n".join(recent))
+            return "\n\n".join(parts)
+
+        text = build()
+        # Drop the oldest material first until the block fits the budget
+        while estimate_tokens(text) > budget and (summary or len(recent) > 1):
+            if summary:
+                summary.pop(0)
+            else:
+                recent.pop(0)
+            text = build()
+        if estimate_tokens(text) > budget:
+            text = _clip(text, max(budget * 4, 0)) if budget > 0 else ""
+        return text
+
+    def to_dict(self):
+        with self._lock:
+            return {"exchanges": [list(e) for e in self.exchanges], "summary": list(self.summary)}
+
+    @classmethod
+    def from_dict(cls, data):
+        memory = cls()
+        for question, answer in (data or {}).get("exchanges", []):
+            memory.exchanges.append((question, answer))
+        for line in (data or {}).get("summary", []):
+            memory.summary.append(line)
+            memory._summary_used += estimate_tokens(line)
+        return memory
+
+    def clear(self):
+        with self._lock:
+            self.exchanges.clear()
+            self.summary.clear()
+            self._summary_used = 0
@@ -1,8 +1,11 @@
 import os
+import threading
 import bcrypt
+from cachetools import TTLCache
 from supabase import create_client, Client
 from datetime import datetime
 from dotenv import load_dotenv
+from lease_terms import LEASE_TERMS
 
 load_dotenv()
 
@@ -11,6 +14,18 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Per-user dashboard snapshots; dropped whenever that user's data changes
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "300"))
+_dashboard_cache = TTLCache(maxsize=4096, ttl=DASHBOARD_CACHE_TTL)
+_dashboard_lock = threading.Lock()
+
+def invalidate_dashboard(user_id=None):
+    with _dashboard_lock:
+        if user_id is None:
+            _dashboard_cache.clear()
+        else:
+            _dashboard_cache.pop(user_id, None)
+
 def register_user(username, password, name, email, unit, phone):
     try:
         # Check if username already exists
@@ -43,8 +58,8 @@ def register_user(username, password, name, email, unit, phone):
             "email": email,
             "unit": unit,
             "phone": phone,
-            "rent": 1850,
-            "balance": 1850
+            "rent": LEASE_TERMS["monthly_rent"],
+            "balance": LEASE_TERMS["monthly_rent"]
         }).execute()
         
         return True, "Account created successfully"
@@ -103,49 +118,79 @@ def get_tenant_payments(user_id):
     except Exception:
         return []
 
+def _record_payment(user_id, tenant_name, unit, amount, date):
+    # The record_payment() Postgres function inserts the payment and takes
+    # it off the balance in one statement, so concurrent payments can't
+    # overwrite each other's balance. Partial payments leave the remainder
+    # outstanding; the month-end close (billing.py) recomputes the exact
+    # balance with fees and aging
+    supabase.rpc("record_payment", {
+        "p_user_id": user_id,
+        "p_tenant_name": tenant_name,
+        "p_unit": unit,
+        "p_amount": amount,
+        "p_date": date,
+    }).execute()
+    invalidate_dashboard(user_id)
+
 def add_payment(user_id, tenant_name, unit, amount):
     try:
         today = datetime.now().strftime("%Y-%m-%d")
-        supabase.table("payments").insert({
-            "user_id": user_id,
-            "tenant_name": tenant_name,
-            "unit": unit,
-            "amount": amount,
-            "date": today,
-            "status": "Paid"
-        }).execute()
-        supabase.table("users")\
-            .update({"balance": 0})\
-            .eq("id", user_id)\
-            .execute()
+        _record_payment(user_id, tenant_name, unit, amount, today)
         return True
     except Exception as e:
         return False
 
 def record_manual_payment(user_id, tenant_name, unit, amount, date):
     try:
-        supabase.table("payments").insert({
-            "user_id": user_id,
-            "tenant_name": tenant_name,
-            "unit": unit,
-            "amount": amount,
-            "date": date,
-            "status": "Paid"
-        }).execute()
-        supabase.table("users")\
-            .update({"balance": 0})\
-            .eq("id", user_id)\
-            .execute()
+        _record_payment(user_id, tenant_name, unit, amount, date)
+        return True
+    except Exception:
+        return False
+
+def apply_rent_roll(rows):
+    # One round trip: the apply_rent_roll() Postgres function upserts every
+    # row into rent_roll and updates users.balance in a single transaction
+    try:
+        supabase.rpc("apply_rent_roll", {"rows": rows}).execute()
+        invalidate_dashboard()
         return True
     except Exception:
         return False
 
+def get_rent_roll():
+    try:
+        result = supabase.table("rent_roll")\
+            .select("*")\
+            .execute()
+        return result.data
+    except Exception:
+        return []
+
+def get_tenant_dashboard(user_id):
+    """Everything the tenant dashboard shows, in one round trip via the
+    tenant_dashboard() Postgres function: balance, rent, next due date,
+    lease dates, open complaint count and the latest payments."""
+    with _dashboard_lock:
+        if user_id in _dashboard_cache:
+            return _dashboard_cache[user_id]
+    try:
+        result = supabase.rpc("tenant_dashboard", {"p_user_id": user_id}).execute()
+        dashboard = result.data
+    except Exception:
+        return None
+    if dashboard:
+        with _dashboard_lock:
+            _dashboard_cache[user_id] = dashboard
+    return dashboard
+
 def update_user_balance(user_id, balance):
     try:
         supabase.table("users")\
             .update({"balance": balance})\
             .eq("id", user_id)\
             .execute()
+        invalidate_dashboard(user_id)
         return True
     except Exception:
         return False
@@ -162,10 +207,24 @@ def add_complaint(user_id, tenant_name, unit,
             "message": message,
             "status": "Open"
         }).execute()
+        invalidate_dashboard(user_id)
         return True
     except Exception:
         return False
 
+def insert_rows(table, rows):
+    # Bulk insert used by the write-behind queue. Rows carry a unique
+    # `reference`, so re-sending a batch after a timeout is a no-op
+    try:
+        supabase.table(table)\
+            .upsert(rows, on_conflict="reference", ignore_duplicates=True)\
+            .execute()
+        for user_id in {r.get("user_id") for r in rows if table == "complaints"}:
+            invalidate_dashboard(user_id)
+        return True, None
+    except Exception as e:
+        return False, str(e)
+
 def get_all_complaints():
     try:
         result = supabase.table("complaints")\
@@ -178,10 +237,27 @@ def get_all_complaints():
 
 def resolve_complaint(complaint_id):
     try:
-        supabase.table("complaints")\
-            .update({"status": "Resolved"})\
+        result = supabase.table("complaints")\
+            .update({"status": "Resolved", "resolved_at": datetime.utcnow().isoformat()})\
             .eq("id", complaint_id)\
             .execute()
+        for row in result.data:
+            invalidate_dashboard(row.get("user_id"))
+        return True
+    except Exception:
+        return False
+
+def resolve_complaints(complaint_ids):
+    # Resolve a whole incident group in one update
+    if not complaint_ids:
+        return True
+    try:
+        result = supabase.table("complaints")\
+            .update({"status": "Resolved", "resolved_at": datetime.utcnow().isoformat()})\
+            .in_("id", list(complaint_ids))\
+            .execute()
+        for user_id in {row.get("user_id") for row in result.data}:
+            invalidate_dashboard(user_id)
         return True
     except Exception:
         return False
@@ -232,3 +308,48 @@ def get_announcements():
         return result.data
     except Exception:
         return []
+
+def search_rows(function, query, limit):
+    # Indexed admin search through the search_tenants / search_complaints /
+    # search_feedback Postgres functions. None means the call failed (e.g.
+    # the functions aren't installed); search_index.py then searches locally.
+    try:
+        result = supabase.rpc(function, {"p_query": query, "p_limit": limit}).execute()
+        return result.data or []
+    except Exception:
+        return None
+
+def get_latest_row(table, column):
+    # The newest row by `column`, used to start a high-water mark without
+    # reading the whole table
+    try:
+        result = supabase.table(table).select("*")\
+            .not_.is_(column, "null")\
+            .order(column, desc=True)\
+            .limit(1)\
+            .execute()
+        return result.data[0] if result.data else None
+    except Exception:
+        return None
+
+def get_rows_since(table, column, since=None, page_size=1000, columns="*"):
+    # Incremental read for aggregates: rows whose `column` is at or after
+    # `since`, oldest first, fetched page by page
+    try:
+        rows = []
+        offset = 0
+        while True:
+            query = supabase.table(table).select(columns)
+            if since is None:
+                query = query.not_.is_(column, "null")
+            else:
+                query = query.gte(column, since)
+            result = query.order(column)\
+                .range(offset, offset + page_size - 1)\
+                .execute()
+            rows.extend(result.data)
+            if len(result.data) < page_size:
+                return rows
+            offset += page_size
+    except Exception:
+        return []
@@ -0,0 +1,48 @@
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Time budget for one chat turn: admission wait, compression and generation
+CHAT_TURN_DEADLINE = float(os.getenv("CHAT_TURN_DEADLINE", "45"))
+
+
+class Deadline:
+    """Per-turn time budget plus a cancellation flag.
+
+    Passed down through admission, compression and generation: each stage
+    checks `expired` before it starts and caps its own timeout with
+    `timeout()`. Whoever stops waiting for the turn (a tenant who asked
+    something else or signed out, a disconnected API client) calls
+    `cancel()`, and the stages that haven't started yet are skipped.
+    """
+
+    def __init__(self, seconds=CHAT_TURN_DEADLINE):
+        self.started = time.monotonic()
+        self.expires = self.started + seconds if seconds else None
+        self.reason = ""
+        self._cancelled = threading.Event()
+
+    def cancel(self, reason="cancelled"):
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def remaining(self):
+        if self.expires is None:
+            return float("inf")
+        return max(self.expires - time.monotonic(), 0.0)
+
+    @property
+    def expired(self):
+        return self.cancelled or self.remaining() <= 0
+
+    def timeout(self, cap):
+        """`cap` seconds, or less if the turn's budget runs out sooner."""
+        return min(cap, self.remaining())
@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+DOCUMENTS = {
+    "Lease Agreement": "lease_agreement.txt",
+    "Building Policies": "building_policies.txt",
+}
+
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from how i if in is it its me my of on or
+our the there this to was what when where which who will with you your am any
+""".split())
+
+
+def _stem(word):
+    for suffix in ("ing", "es", "ed", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text):
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return [_stem(w) for w in words if w not in STOPWORDS]
+
+
+def _is_header(line):
+    letters = re.sub(r"[^A-Za-z]", "", line)
+    return bool(letters) and line.isupper() and len(line) <= 60 and not line.startswith("-")
+
+
+def segment(doc_name, text):
+    """Split a knowledge file into (doc, section, sentence) triples.
+
+    Section headers are the all-caps lines; every bullet or line below a
+    header is one or more sentences of that section."""
+    sentences = []
+    section = doc_name
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if _is_header(line):
+            section = line.title()
+            continue
+        line = line.lstrip("-• ").strip()
+        for sentence in re.split(r"(?<=[.!?])\s+(?=[A-Z])", line):
+            if sentence:
+                sentences.append((doc_name, section, sentence))
+    return sentences
+
+
+class ExtractiveAnswerer:
+    """Offline BM25 sentence retriever over the knowledge base.
+
+    The term-frequency matrix (sentences x vocabulary) is built once with
+    NumPy; scoring a question is a handful of column gathers and vector ops,
+    so answers come back in well under a millisecond for this corpus.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.sentences = []
+        for name, text in documents.items():
+            self.sentences.extend(segment(name, text))
+        # Section titles are indexed with their sentences so "pet policy"
+        # finds everything under PETS even when the line itself doesn't say it
+        token_lists = [tokenize(f"{sec} {sent}") for _, sec, sent in self.sentences]
+        self.vocab = {}
+        for tokens in token_lists:
+            for t in tokens:
+                self.vocab.setdefault(t, len(self.vocab))
+
+        tf = np.zeros((len(token_lists), len(self.vocab)), dtype=np.float32)
+        for i, tokens in enumerate(token_lists):
+            for t in tokens:
+                tf[i, self.vocab[t]] += 1
+        lengths = tf.sum(axis=1)
+        df = (tf > 0).sum(axis=0)
+        n = len(token_lists)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1.0))
+        # Precompute the BM25 term weight for every (sentence, term) pair
+        self.weights = (tf * (k1 + 1)) / (tf + norm[:, None])
+        self.weights *= self.idf[None, :]
+
+    def score(self, question):
+        cols = [self.vocab[t] for t in set(tokenize(question)) if t in self.vocab]
+        if not cols:
+            return np.zeros(len(self.sentences), dtype=np.float32)
+        return self.weights[:, cols].sum(axis=1)
+
+    def top_sentences(self, question, k=4, min_score=1.0):
+        scores = self.score(question)
+        if not len(scores):
+            return []
+        k = min(k, len(scores))
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [(float(scores[i]), *self.sentences[i]) for i in idx if scores[i] >= min_score]
+
+    def context(self, question, k=12):
+        """Query-focused excerpt of the knowledge base, grouped by section.
+        Used in place of ScaleDown output when compression is unavailable."""
+        hits = self.top_sentences(question, k=k, min_score=0.0)
+        grouped = {}
+        for _, doc, section, sentence in hits:
+            grouped.setdefault(f"=== {doc.upper()} / {section.upper()} ===", []).append(sentence)
+        return "\n".join(f"{header}\n" + "\n".join(lines) for header, lines in grouped.items())
+
+    def answer(self, question, k=3):
+        """Assemble an answer from the best-matching sentences, each cited to
+        its section. Returns None when nothing in the knowledge base matches."""
+        hits = self.top_sentences(question, k=k)
+        if not hits:
+            return None
+        lines = [f"- {sentence} _({doc} › {section})_" for _, doc, section, sentence in hits]
+        return "Here's what the lease and building policies say:\n\n" + "\n".join(lines)
+
+
+_answerer = None
+_lock = threading.Lock()
+
+
+def get_answerer():
+    global _answerer
+    if _answerer is None:
+        with _lock:
+            if _answerer is None:
+                docs = {}
+                for name, filename in DOCUMENTS.items():
+                    with open(os.path.join(DATA_DIR, filename), "r", encoding="utf-8") as f:
+                        docs[name] = f.read()
+                _answerer = ExtractiveAnswerer(docs)
+    return _answerer
@@ -0,0 +1,42 @@
+import os
+import re
+from datetime import datetime
+
+LEASE_PATH = os.path.join(os.path.dirname(__file__), "data", "lease_agreement.txt")
+
+
+def _money(pattern, text, default):
+    match = re.search(pattern + r"\s*\$([\d,]+(?:\.\d+)?)", text, re.IGNORECASE)
+    return float(match.group(1).replace(",", "")) if match else default
+
+
+def _date(pattern, text):
+    match = re.search(pattern + r"\s*([A-Za-z]+ \d{1,2}, \d{4})", text, re.IGNORECASE)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1), "%B %d, %Y").date()
+    except ValueError:
+        return None
+
+
+def load_lease_terms(path=LEASE_PATH):
+    """Billing rules read from the lease document so rent, late fee and
+    grace period stay in step with what the chatbot tells tenants."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except OSError:
+        text = ""
+    grace = re.search(r"Grace Period:\s*(\d+)\s*days", text, re.IGNORECASE)
+    return {
+        "monthly_rent": _money(r"Monthly Rent:", text, 1850.0),
+        "late_fee": _money(r"Late Fee:", text, 75.0),
+        "grace_days": int(grace.group(1)) if grace else 5,
+        "due_day": 1,
+        "lease_start": _date(r"Lease Start Date:", text),
+        "lease_end": _date(r"Lease End Date:", text),
+    }
+
+
+LEASE_TERMS = load_lease_terms()
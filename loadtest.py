@@ -0,0 +1,521 @@
+"""Load and rerun-latency harness for app.py.
+
+Drives many simulated browser sessions through Streamlit's AppTest against
+an in-memory stand-in for Supabase and stubbed ScaleDown/Gemini calls, so
+it needs no network or credentials. Tenants sign in, rerun the dashboard,
+ask chat questions, use a sidebar quick question and file a complaint;
+admins sign in, rerun the overview and run the month-end close.
+
+    python loadtest.py --sessions 50 --concurrency 8
+    python loadtest.py --sessions 200 --db-latency 20 --llm-latency 800 --csv runs.csv
+
+Reports rerun latency per view, traced memory per open session and how
+many calls each upstream (Supabase table/RPC, ScaleDown, Gemini) received.
+Gemini context caching runs against context_cache.LocalCachingAPI; pass
+--no-context-cache to compare with the compressed-prompt path.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+PASSWORD = "loadtest-password"
+QUESTIONS = [
+    "What is the pet policy?",
+    "When is rent due and what is the late fee?",
+    "How do I book the rooftop lounge?",
+    "What are the quiet hours?",
+    "Can I sublet my apartment if I travel for three months, and what happens to my deposit?",
+]
+
+calls = Counter()
+_calls_lock = threading.Lock()
+
+
+def count(name, n=1):
+    with _calls_lock:
+        calls[name] += n
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _next_due():
+    today = date.today()
+    if today.day == 1:
+        return today.isoformat()
+    return (today.replace(day=28) + timedelta(days=4)).replace(day=1).isoformat()
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """The slice of the supabase-py query builder database.py uses."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.filters = []
+        self.negate = False
+        self.sort = None
+        self.window = None
+        self.payload = None
+        self.columns = None
+
+    def select(self, columns="*"):
+        if columns != "*":
+            self.columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    @property
+    def not_(self):
+        self.negate = True
+        return self
+
+    def _filter(self, fn):
+        negate, self.negate = self.negate, False
+        self.filters.append((lambda r: not fn(r)) if negate else fn)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(lambda r: r.get(column) == value)
+
+    def in_(self, column, values):
+        values = set(values)
+        return self._filter(lambda r: r.get(column) in values)
+
+    def gte(self, column, value):
+        return self._filter(lambda r: r.get(column) is not None and str(r[column]) >= str(value))
+
+    def is_(self, column, value):
+        return self._filter(lambda r: r.get(column) is None if value == "null" else r.get(column) == value)
+
+    def order(self, column, desc=False):
+        self.sort = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def limit(self, n):
+        self.window = (0, n)
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self.op, self.payload = "upsert", (rows, on_conflict)
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def execute(self):
+        count(f"supabase.{self.table}.{self.op}")
+        self.db.wait()
+        with self.db.lock:
+            return _Result(getattr(self, "_" + self.op)())
+
+    def _match(self):
+        return [r for r in self.db.tables[self.table] if all(f(r) for f in self.filters)]
+
+    def _select(self):
+        rows = self._match()
+        if self.sort:
+            column, desc = self.sort
+            rows.sort(key=lambda r: str(r.get(column) or ""), reverse=desc)
+        if self.window:
+            rows = rows[self.window[0]:self.window[1]]
+        if self.columns:
+            return [{c: r.get(c) for c in self.columns} for r in rows]
+        return [dict(r) for r in rows]
+
+    def _insert(self):
+        rows = self.payload if isinstance(self.payload, list) else [self.payload]
+        return [self.db.add(self.table, row) for row in rows]
+
+    def _upsert(self):
+        rows, key = self.payload
+        existing = {r.get(key) for r in self.db.tables[self.table]} if key else set()
+        return [self.db.add(self.table, row) for row in rows if not key or row.get(key) not in existing]
+
+    def _update(self):
+        matched = self._match()
+        for r in matched:
+            r.update(self.payload)
+            self.db.touch(self.table, r)
+        return [dict(r) for r in matched]
+
+
+class _Rpc:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self):
+        count(f"supabase.rpc.{self.name}")
+        self.db.wait()
+        with self.db.lock:
+            return _Result(getattr(self.db, "rpc_" + self.name)(**self.params))
+
+
+class FakeSupabase:
+    """In-memory tables with the column defaults the real schema has."""
+
+    DEFAULTS = {"announcements": "date", "complaints": "date", "feedback": "date",
+                "payments": "created_at", "question_log": "created_at", "users": "updated_at"}
+    # Columns the schema's triggers set on every update
+    TOUCHED = {"users": "updated_at"}
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.tables = {t: [] for t in ("users", "payments", "complaints", "feedback", "announcements",
+                                       "rent_roll", "chat_transcripts", "question_log")}
+        self._next_id = 1
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add(self, table, row):
+        row = dict(row)
+        row.setdefault("id", self._next_id)
+        self._next_id += 1
+        column = self.DEFAULTS.get(table)
+        if column and not row.get(column):
+            row[column] = _now()
+        self.tables[table].append(row)
+        return dict(row)
+
+    def touch(self, table, row):
+        if table in self.TOUCHED:
+            row[self.TOUCHED[table]] = _now()
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rpc(self, name, params):
+        return _Rpc(self, name, params)
+
+    def rpc_tenant_dashboard(self, p_user_id):
+        user = next((u for u in self.tables["users"] if u["id"] == p_user_id), None)
+        if user is None:
+            return None
+        roll = next((r for r in self.tables["rent_roll"] if r["user_id"] == p_user_id), {})
+        payments = sorted((p for p in self.tables["payments"] if p.get("user_id") == p_user_id),
+                          key=lambda p: p["created_at"], reverse=True)[:5]
+        return {
+            "rent": user["rent"], "balance": user["balance"],
+            "lease_start": user.get("lease_start"), "lease_end": user.get("lease_end"),
+            "next_due_date": max(filter(None, (roll.get("next_due_date"), _next_due()))),
+            "late_fees": roll.get("late_fees", 0),
+            "open_complaints": sum(1 for c in self.tables["complaints"]
+                                   if c.get("user_id") == p_user_id and c.get("status") == "Open"),
+            "recent_payments": [{k: p.get(k) for k in ("amount", "date", "status", "created_at")}
+                                for p in payments],
+        }
+
+    def rpc_record_payment(self, p_user_id, p_tenant_name, p_unit, p_amount, p_date):
+        self.add("payments", {"user_id": p_user_id, "tenant_name": p_tenant_name, "unit": p_unit,
+                              "amount": p_amount, "date": p_date, "status": "Paid"})
+        for user in self.tables["users"]:
+            if user["id"] == p_user_id:
+                user["balance"] = max((user.get("balance") or 0) - p_amount, 0)
+                self.touch("users", user)
+
+    def rpc_apply_rent_roll(self, rows):
+        by_user = {r["user_id"]: r for r in rows}
+        self.tables["rent_roll"] = [r for r in self.tables["rent_roll"] if r["user_id"] not in by_user]
+        for row in rows:
+            self.add("rent_roll", row)
+        for user in self.tables["users"]:
+            if user["id"] in by_user:
+                user["balance"] = by_user[user["id"]]["balance"]
+                self.touch("users", user)
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel; answers after `latency` seconds."""
+
+    latency = 0.0
+
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt, stream=False, **_):
+        count(f"gemini.{self.name}")
+        count("gemini.input_tokens", len(prompt) // 4)
+        time.sleep(self.latency)
+        text = "Per the lease, rent of USD 1850 is due on the 1st; a USD 75 late fee applies after day 5."
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        if stream:
+            return iter([SimpleNamespace(text=text)])
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+def configure_environment(workdir):
+    """Point every local store at `workdir` and give the app dummy
+    credentials. Must run before app modules are imported."""
+    os.environ.update({
+        "SUPABASE_URL": "http://127.0.0.1:54321",
+        "SUPABASE_KEY": "loadtest",
+        "SCALEDOWN_API_KEY": "loadtest",
+        "GEMINI_API_KEY": "loadtest",
+        "CHANGE_FEED_MODE": "poll",
+        "ANALYTICS_DB_PATH": os.path.join(workdir, "analytics.db"),
+        "WRITE_QUEUE_PATH": os.path.join(workdir, "write_queue.db"),
+        "CHAT_ARCHIVE_PATH": os.path.join(workdir, "chat_archive.db"),
+        "SHARED_STORE_URL": "sqlite:///" + os.path.join(workdir, "shared_store.db"),
+    })
+
+
+def install_stubs(db, llm_latency, compress_latency, context_cache=True):
+    import bcrypt
+    import chat_service
+    import database
+    from context_cache import LocalCachingAPI
+    from extractive import get_answerer
+    from model_router import router
+
+    class CachingAPI(LocalCachingAPI):
+        def create(self, *args):
+            count("gemini.cache_create")
+            return super().create(*args)
+
+    database.supabase = db
+    FakeModel.latency = llm_latency
+    router._factory = FakeModel
+    router._models.clear()
+
+    def compress_knowledge(question, deadline=None):
+        count("scaledown.compress")
+        time.sleep(compress_latency)
+        return get_answerer().context(question), 1200, 600
+
+    chat_service.compress_knowledge = compress_knowledge
+    chat_service.context_cache.api = CachingAPI(FakeModel)
+    chat_service.context_cache.enabled = context_cache
+    return bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=4)).decode()
+
+
+def seed(db, password_hash, tenants, payments_per_tenant):
+    db.add("users", {"username": "admin", "password_hash": password_hash, "role": "admin",
+                     "name": "Admin", "email": "admin@example.com", "unit": "-", "phone": "",
+                     "rent": 0, "balance": 0})
+    today = date.today()
+    for i in range(tenants):
+        user = db.add("users", {
+            "username": f"tenant{i}", "password_hash": password_hash, "role": "tenant",
+            "name": f"Tenant {i}", "email": f"tenant{i}@example.com", "unit": f"{i // 8 + 1}{'ABCDEFGH'[i % 8]}",
+            "phone": "", "rent": 1850.0, "balance": 1850.0 if i % 3 else 0.0,
+            "lease_start": "2025-01-01", "lease_end": "2026-12-31",
+        })
+        for m in range(payments_per_tenant):
+            paid = today.replace(day=1, month=(today.month - m - 2) % 12 + 1)
+            db.add("payments", {"user_id": user["id"], "tenant_name": user["name"], "unit": user["unit"],
+                                "amount": 1850.0, "date": paid.isoformat(), "status": "Paid"})
+    db.add("announcements", {"title": "Water shutoff", "message": "Tuesday 10am-12pm", "priority": "High"})
+
+
+def share_apptest_runtime():
+    """AppTest installs a fresh mock Runtime in a class attribute for each
+    run and clears it afterwards, so sessions on different threads clobber
+    each other. Install one shared mock and let AppTest's per-run swap land
+    on a subclass instead."""
+    from unittest.mock import MagicMock
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1 import app_test
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    app_test.Runtime = type("AppTestRuntime", (Runtime,), {})
+    config.set_option("global.appTest", True)
+
+
+def share_script_bytecode():
+    """AppTest compiles app.py afresh on every run through a new ScriptCache,
+    and ast.parse/compile from several threads at once is not thread-safe
+    (SystemError: AST constructor recursion depth mismatch). Compile each
+    script once, under one lock, and hand every run the same code object."""
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    compile_script = ScriptCache.get_bytecode
+    shared = {}
+    lock = threading.Lock()
+
+    def get_bytecode(self, script_path):
+        with lock:
+            if script_path not in shared:
+                shared[script_path] = compile_script(self, script_path)
+            return shared[script_path]
+
+    ScriptCache.get_bytecode = get_bytecode
+
+
+def _timed(log, view, at, action):
+    started = time.perf_counter()
+    action()
+    elapsed = (time.perf_counter() - started) * 1000
+    log.append({"view": view, "ms": elapsed, "error": bool(at.exception)})
+
+
+def _sign_in(at, log, username, view):
+    """Sign in, then carry on in a fresh AppTest restored from the ?sid=
+    session, the way a reload or another replica would. (AppTest keeps the
+    login widgets in its tree after st.rerun(), which breaks later runs.)"""
+    from streamlit.testing.v1 import AppTest
+
+    _timed(log, "login_page", at, at.run)
+    at.text_input(key="login_username").input(username)
+    at.text_input(key="login_password").input(PASSWORD)
+    _timed(log, view, at, at.button(key="signin_btn").click().run)
+    restored = AppTest.from_file(APP_PATH, default_timeout=at.default_timeout)
+    restored.query_params["sid"] = at.query_params.get("sid", [])
+    _timed(log, "session_restore", restored, restored.run)
+    return restored
+
+
+def tenant_journey(at, index, questions, log):
+    at = _sign_in(at, log, f"tenant{index}", "tenant_login")
+    _timed(log, "tenant_rerun", at, at.run)
+    for q in questions:
+        _timed(log, "chat_question", at, at.chat_input[0].set_value(q).run)
+    quick = next((b for b in at.sidebar.button if b.label == "Pet Policy"), None)
+    if quick is not None:
+        _timed(log, "quick_question", at, quick.click().run)
+    at.text_input(key="complaint_subject").input(f"Noise from unit above ({index})")
+    at.text_area(key="complaint_message").input("Loud music after quiet hours most nights this week.")
+    submit = next(b for b in at.button if b.label == "Submit Complaint")
+    _timed(log, "complaint_submit", at, submit.click().run)
+    return at
+
+
+def admin_journey(at, log):
+    at = _sign_in(at, log, "admin", "admin_login")
+    _timed(log, "admin_rerun", at, at.run)
+    _timed(log, "month_end_close", at, at.button(key="month_end_close").click().run)
+    resolve = next((b for b in at.button if str(b.key).startswith("resolve_")), None)
+    if resolve is not None:
+        _timed(log, "resolve_complaint", at, resolve.click().run)
+    return at
+
+
+def run_session(index, args, log, sessions):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+    try:
+        if args.admin_every and index % args.admin_every == args.admin_every - 1:
+            at = admin_journey(at, log)
+        else:
+            picks = [QUESTIONS[(index + k) % len(QUESTIONS)] for k in range(args.questions)]
+            at = tenant_journey(at, index % args.tenants, picks, log)
+    except Exception as e:
+        log.append({"view": "harness_error", "ms": 0.0, "error": True, "detail": repr(e)})
+    # Keep the session alive so its memory counts until the report
+    sessions.append(at)
+
+
+def report(log, sessions, memory_bytes, wall):
+    import pandas as pd
+
+    df = pd.DataFrame(log)
+    views = df.groupby("view")["ms"].agg(
+        runs="size", mean="mean", p50="median",
+        p95=lambda s: s.quantile(0.95), max="max",
+    ).round(1)
+    views["errors"] = df.groupby("view")["error"].sum().astype(int)
+    print(f"\n{sessions} sessions, {len(df)} reruns in {wall:.1f}s")
+    print("\nRerun latency by view (ms):")
+    print(views.sort_values("p95", ascending=False).to_string())
+    if memory_bytes is not None:
+        print(f"\nTraced memory per open session: {memory_bytes / 1024:,.0f} KiB")
+    print("\nUpstream calls:")
+    for name, n in sorted(calls.items()):
+        print(f"  {name:<40} {n:>7}  ({n / max(sessions, 1):.2f} per session)")
+    return views
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent sessions of app.py.")
+    parser.add_argument("--sessions", type=int, default=20, help="simulated browser sessions")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions running at once")
+    parser.add_argument("--tenants", type=int, default=100, help="seeded tenant accounts")
+    parser.add_argument("--payments", type=int, default=6, help="seeded payments per tenant")
+    parser.add_argument("--questions", type=int, default=2, help="chat questions per tenant session")
+    parser.add_argument("--admin-every", type=int, default=10, help="every Nth session is an admin (0: none)")
+    parser.add_argument("--db-latency", type=float, default=0.0, help="ms added to each Supabase call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="ms added to each Gemini call")
+    parser.add_argument("--compress-latency", type=float, default=0.0, help="ms added to each ScaleDown call")
+    parser.add_argument("--no-context-cache", action="store_true",
+                        help="send the compressed knowledge base with every prompt")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds allowed per rerun")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (lower overhead)")
+    parser.add_argument("--csv", help="also write per-view latency to this CSV path")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="tenant-loadtest-")
+    configure_environment(workdir)
+    sys.path.insert(0, os.path.dirname(APP_PATH))
+
+    db = FakeSupabase(latency=args.db_latency / 1000)
+    password_hash = install_stubs(db, args.llm_latency / 1000, args.compress_latency / 1000,
+                                  context_cache=not args.no_context_cache)
+    seed(db, password_hash, args.tenants, args.payments)
+    share_apptest_runtime()
+    share_script_bytecode()
+
+    # One warm-up session loads modules and process-wide caches, so the
+    # measured sessions see steady-state reruns
+    run_session(0, argparse.Namespace(**{**vars(args), "questions": 1, "admin_every": 0}), [], [])
+    calls.clear()
+
+    if not args.no_memory:
+        tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0] if not args.no_memory else 0
+    log, sessions = [], []
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(lambda i: run_session(i, args, log, sessions), range(args.sessions)))
+    wall = time.perf_counter() - started
+    memory = None
+    if not args.no_memory:
+        memory = (tracemalloc.get_traced_memory()[0] - baseline) / max(len(sessions), 1)
+        tracemalloc.stop()
+
+    from write_queue import get_queue
+    get_queue().flush()
+    views = report(log, args.sessions, memory, wall)
+    errors = [e for e in log if e.get("detail")]
+    for e in errors[:5]:
+        print("harness error:", e["detail"])
+    if args.csv:
+        views.to_csv(args.csv)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-2.5-flash-lite")
+ROUTER_COMPLEXITY_THRESHOLD = int(os.getenv("ROUTER_COMPLEXITY_THRESHOLD", "3"))
+
+# Topics where the answer usually combines several lease clauses
+COMPLEX_TOPICS = re.compile(
+    r"\b(terminat\w*|break(ing)? (my |the )?lease|sublet\w*|subleas\w*|deduct\w*|"
+    r"refund\w*|renew\w*|penalt\w*|evict\w*|prorat\w*|transfer|legal|dispute|"
+    r"liab\w*|insurance|damage\w*|owe|calculate|total)\b"
+)
+CONJUNCTIONS = re.compile(r"\b(and|or|but|if|unless|while|whereas|also|then|because)\b")
+CONDITIONALS = re.compile(r"\b(what happens|what if|would|could i|can i still|in case)\b")
+
+
+def question_complexity(question):
+    """Cheap local score: higher means the question needs the full model."""
+    q = (question or "").lower()
+    words = q.split()
+    score = 0
+    if len(words) > 12:
+        score += 1
+    if len(words) > 25:
+        score += 1
+    score += min(len(CONJUNCTIONS.findall(q)), 2)
+    score += 2 * min(len(COMPLEX_TOPICS.findall(q)), 2)
+    if CONDITIONALS.search(q):
+        score += 1
+    if q.count("?") > 1:
+        score += 1
+    if re.search(r"\d", q):
+        score += 1
+    return score
+
+
+class RouteStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.latencies = deque(maxlen=500)
+
+    def snapshot(self):
+        lat = sorted(self.latencies)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "fallbacks": self.fallbacks,
+            "avg_latency": sum(lat) / len(lat) if lat else 0.0,
+            "p95_latency": lat[int(len(lat) * 0.95) - 1] if lat else 0.0,
+        }
+
+
+def _request_options(timeout, deadline):
+    """Per-attempt timeout: `timeout`, capped by what is left of the turn's
+    deadline at the moment the attempt starts."""
+    if deadline is not None:
+        timeout = deadline.timeout(timeout) if timeout else deadline.remaining()
+    if not timeout or timeout == float("inf"):
+        return {}
+    return {"request_options": {"timeout": timeout}}
+
+
+class ModelRouter:
+    """Sends simple questions to a lighter Gemini model and everything else
+    to the full one. If the fast model fails, the call is retried on the
+    full model and counted as a fallback for the fast route, unless the
+    turn's deadline has passed or it was cancelled in the meantime."""
+
+    def __init__(self, fast_model=GEMINI_FAST_MODEL, full_model=GEMINI_MODEL,
+                 threshold=ROUTER_COMPLEXITY_THRESHOLD, model_factory=None):
+        self.model_names = {"fast": fast_model, "full": full_model}
+        self.threshold = threshold
+        self._factory = model_factory
+        self._models = {}
+        self._stats = {"fast": RouteStats(), "full": RouteStats()}
+        self._lock = threading.Lock()
+
+    def _model(self, route, models=None):
+        # `models` maps model names to overrides, e.g. models bound to a
+        # cached prompt prefix (see context_cache.py)
+        if models:
+            return models[self.model_names[route]]
+        if route not in self._models:
+            factory = self._factory
+            if factory is None:
+                import google.generativeai as genai
+                factory = genai.GenerativeModel
+            self._models[route] = factory(self.model_names[route])
+        return self._models[route]
+
+    def route(self, question):
+        if self.model_names["fast"] == self.model_names["full"]:
+            return "full"
+        return "full" if question_complexity(question) >= self.threshold else "fast"
+
+    def _record(self, route, started, ok=True, fallback=False):
+        with self._lock:
+            stats = self._stats[route]
+            stats.calls += 1
+            if ok:
+                stats.latencies.append(time.monotonic() - started)
+            else:
+                stats.errors += 1
+            if fallback:
+                stats.fallbacks += 1
+
+    def generate(self, question, prompt, timeout=None, models=None, deadline=None):
+        """Returns (response, route_used). Raises if the full model fails, or
+        if the fast one fails once `deadline` has expired."""
+        route = self.route(question)
+        started = time.monotonic()
+        if route == "fast":
+            try:
+                response = self._model("fast", models).generate_content(
+                    prompt, **_request_options(timeout, deadline))
+                self._record("fast", started)
+                return response, "fast"
+            except Exception:
+                retry = deadline is None or not deadline.expired
+                self._record("fast", started, ok=False, fallback=retry)
+                if not retry:
+                    raise
+                started = time.monotonic()
+        try:
+            response = self._model("full", models).generate_content(
+                prompt, **_request_options(timeout, deadline))
+        except Exception:
+            self._record("full", started, ok=False)
+            raise
+        self._record("full", started)
+        return response, "full"
+
+    def stream(self, question, prompt, timeout=None, models=None, deadline=None):
+        """Yields (text_chunk, route_used). Falls back to the full model only
+        if the fast one fails before producing any text and `deadline`
+        hasn't expired."""
+        route = self.route(question)
+        started = time.monotonic()
+        if route == "fast":
+            produced = False
+            try:
+                kwargs = _request_options(timeout, deadline)
+                for chunk in self._model("fast", models).generate_content(prompt, stream=True, **kwargs):
+                    if chunk.text:
+                        produced = True
+                        yield chunk.text, "fast"
+                self._record("fast", started)
+                return
+            except Exception:
+                retry = not produced and (deadline is None or not deadline.expired)
+                self._record("fast", started, ok=False, fallback=retry)
+                if not retry:
+                    raise
+                started = time.monotonic()
+        try:
+            kwargs = _request_options(timeout, deadline)
+            for chunk in self._model("full", models).generate_content(prompt, stream=True, **kwargs):
+                if chunk.text:
+                    yield chunk.text, "full"
+        except Exception:
+            self._record("full", started, ok=False)
+            raise
+        self._record("full", started)
+
+    def stats(self):
+        with self._lock:
+            return {
+                route: {"model": self.model_names[route], **s.snapshot()}
+                for route, s in self._stats.items()
+            }
+
+
+router = ModelRouter()
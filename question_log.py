@@ -0,0 +1,165 @@
+"""Question log and offline question analytics.
+
+Every chat turn is recorded through the write-behind queue (batched, off
+the request path) into the `question_log` table. Run this module as a
+script to cluster the logged questions and report the most frequent and
+most expensive ones:
+
+    python question_log.py --days 30 --top 20
+    python question_log.py --warmup 25      # FAQ warm-up candidates
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from answer_cache import normalize_question
+
+NO_INFO_MARKER = "I don't have that information"
+
+
+def log_question(user, question, answer, trace):
+    """Queue one log row. `trace` is filled in by chat_service.answer_question()."""
+    from write_queue import get_queue
+
+    return get_queue().enqueue("question_log", {
+        "user_id": user.get("id"),
+        "unit": user.get("unit"),
+        "question": question,
+        "normalized": normalize_question(question),
+        "cache": trace.get("cache"),
+        "served_from": trace.get("served_from"),
+        "route": trace.get("route"),
+        "admission_ms": trace.get("admission_ms"),
+        "compress_ms": trace.get("compress_ms"),
+        "generate_ms": trace.get("generate_ms"),
+        "total_ms": trace.get("total_ms"),
+        "original_tokens": trace.get("original_tokens"),
+        "compressed_tokens": trace.get("compressed_tokens"),
+        "prompt_tokens": trace.get("prompt_tokens"),
+        "answer_tokens": trace.get("answer_tokens"),
+        "no_info": NO_INFO_MARKER.lower() in (answer or "").lower(),
+    })
+
+
+def cluster_questions(questions, threshold=0.6):
+    """Greedy TF-IDF cosine clustering of normalized questions.
+
+    Distinct questions are vectorized once; each joins the first cluster
+    whose centroid is at least `threshold` similar, otherwise it starts a
+    new one. Returns an array of cluster ids aligned with `questions`.
+    """
+    from extractive import tokenize
+
+    unique, inverse = np.unique(np.asarray(questions, dtype=object), return_inverse=True)
+    docs = [tokenize(q) for q in unique]
+    vocab = {t: i for i, t in enumerate(sorted({t for d in docs for t in d}))}
+    if not vocab:
+        return np.zeros(len(questions), dtype=int)
+    tf = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+    for i, d in enumerate(docs):
+        for t in d:
+            tf[i, vocab[t]] += 1
+    idf = np.log((1 + len(docs)) / (1 + (tf > 0).sum(axis=0))) + 1
+    vecs = tf * idf
+    vecs /= np.maximum(np.linalg.norm(vecs, axis=1, keepdims=True), 1e-9)
+
+    labels = np.empty(len(docs), dtype=int)
+    centroids = np.zeros((0, len(vocab)), dtype=np.float32)
+    sizes = []
+    for i, v in enumerate(vecs):
+        if len(sizes):
+            sims = centroids @ v
+            best = int(np.argmax(sims))
+            if sims[best] >= threshold:
+                labels[i] = best
+                c = centroids[best] * sizes[best] + v
+                centroids[best] = c / max(np.linalg.norm(c), 1e-9)
+                sizes[best] += 1
+                continue
+        labels[i] = len(sizes)
+        centroids = np.vstack([centroids, v])
+        sizes.append(1)
+    return labels[inverse]
+
+
+def question_report(rows, threshold=0.6):
+    """Per-cluster frequency, cost and cacheability for every cluster, most
+    asked first. Callers cut each ranking to size themselves, so a rare but
+    expensive question still shows up when ranked by cost."""
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    df["normalized"] = df["normalized"].fillna(df["question"].map(normalize_question))
+    for col in ("prompt_tokens", "answer_tokens", "total_ms"):
+        df[col] = pd.to_numeric(df.get(col), errors="coerce").fillna(0)
+    df["tokens"] = df["prompt_tokens"] + df["answer_tokens"]
+    for col in ("cache", "served_from"):
+        if col not in df:
+            df[col] = None
+    df["cluster"] = cluster_questions(df["normalized"].tolist(), threshold)
+    example = df.groupby("cluster")["question"].agg(lambda s: s.value_counts().index[0])
+    report = df.groupby("cluster").agg(
+        asked=("question", "size"),
+        tenants=("user_id", "nunique"),
+        variants=("normalized", "nunique"),
+        # A saved answer existed; chat_service still calls Gemini unless degraded
+        would_hit_rate=("cache", lambda s: (s == "hit").mean()),
+        # Turns actually answered from a cache, without a Gemini call
+        served_cached_rate=("served_from", lambda s: s.isin(["cache", "late_cache"]).mean()),
+        total_tokens=("tokens", "sum"),
+        avg_ms=("total_ms", "mean"),
+        no_info_rate=("no_info", "mean"),
+    )
+    report.insert(0, "example", example)
+    return report.sort_values(["asked", "total_tokens"], ascending=False).reset_index(drop=True)
+
+
+def rankings(report, top=20):
+    """The views `main` prints, each ranked over every cluster and then cut
+    to `top`: most asked, most tokens, and likely knowledge-base gaps."""
+    return {
+        "frequency": report.head(top),
+        "cost": report.sort_values("total_tokens", ascending=False).head(top),
+        "gaps": report[report["no_info_rate"] >= 0.5].head(top),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cluster logged tenant questions.")
+    parser.add_argument("--days", type=int, default=30, help="look-back window")
+    parser.add_argument("--top", type=int, default=20, help="clusters to show")
+    parser.add_argument("--threshold", type=float, default=0.6, help="cosine similarity to merge")
+    parser.add_argument("--warmup", type=int, default=0, help="print N FAQ warm-up questions")
+    parser.add_argument("--csv", help="also write the report to this CSV path")
+    args = parser.parse_args(argv)
+
+    from database import get_rows_since
+
+    since = (datetime.now(timezone.utc) - timedelta(days=args.days)).isoformat()
+    rows = get_rows_since("question_log", "created_at", since)
+    report = question_report(rows, threshold=args.threshold)
+    if report.empty:
+        print("No questions logged in this window.")
+        return 0
+    if args.warmup:
+        for q in report["example"].head(args.warmup):
+            print(q)
+        return 0
+    ranked = rankings(report, args.top)
+    with pd.option_context("display.max_colwidth", 60, "display.width", 160):
+        print("Top questions by frequency:")
+        print(ranked["frequency"].to_string(index=False))
+        print("\nTop questions by token cost:")
+        print(ranked["cost"].to_string(index=False))
+        gaps = ranked["gaps"]
+        if not gaps.empty:
+            print("\nLikely knowledge-base gaps (answered 'I don't have that information'):")
+            print(gaps[["example", "asked", "no_info_rate"]].to_string(index=False))
+    if args.csv:
+        report.to_csv(args.csv, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
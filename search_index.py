@@ -0,0 +1,158 @@
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from dotenv import load_dotenv
+from extractive import tokenize
+
+load_dotenv()
+
+# "postgres" uses the indexed search functions (README, step 4) and falls
+# back to the local index if a call fails; "local" always searches locally
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "postgres")
+# How long the local index serves before it is rebuilt from Supabase
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", "60"))
+SEARCH_LIMIT = 20
+# After a failed Postgres search, search locally for this long
+SEARCH_RETRY = 300
+
+TENANT_FIELDS = ("id", "name", "unit", "email", "phone", "rent", "balance")
+# Full-text fields and their weights (Postgres setweight A and B)
+TEXT_FIELDS = {
+    "complaints": {"subject": 2.0, "message": 1.0},
+    "feedback": {"topic": 2.0, "details": 1.0},
+}
+WORD = re.compile(r"[a-z0-9]+")
+
+
+def _normalize(value):
+    return " ".join(str(value or "").lower().split())
+
+
+class SearchIndex:
+    """In-process stand-in for the Postgres search functions.
+
+    Tenants get a sorted key list (name, each word of the name, unit and
+    email) searched by prefix with bisect. Complaints and feedback get an
+    inverted index over the same stemmed tokens the extractive answerer
+    uses; every query term must match, and results rank by weighted term
+    hits, then newest first.
+    """
+
+    def __init__(self):
+        self.built_at = 0.0
+        self._tenants = {}
+        self._keys = []
+        self._docs = {table: {} for table in TEXT_FIELDS}
+        self._postings = {table: defaultdict(dict) for table in TEXT_FIELDS}
+
+    def load(self, tenants, complaints, feedback):
+        keys = []
+        for t in tenants:
+            row = {f: t.get(f) for f in TENANT_FIELDS}
+            self._tenants[row["id"]] = row
+            name = _normalize(row["name"])
+            words = name.split()[1:] + WORD.findall(name)[1:]
+            for key in {name, *words, _normalize(row["unit"]), _normalize(row["email"])}:
+                if key:
+                    keys.append((key, row["id"]))
+        self._keys = sorted(set(keys))
+        for table, rows in (("complaints", complaints), ("feedback", feedback)):
+            for row in rows:
+                self._docs[table][row["id"]] = row
+                for field, weight in TEXT_FIELDS[table].items():
+                    for term in tokenize(str(row.get(field) or "")):
+                        hits = self._postings[table][term]
+                        hits[row["id"]] = hits.get(row["id"], 0.0) + weight
+        self.built_at = time.time()
+        return self
+
+    def tenants(self, query, limit=SEARCH_LIMIT):
+        q = _normalize(query)
+        if not q:
+            return []
+        found = set()
+        i = bisect_left(self._keys, (q,))
+        while i < len(self._keys) and self._keys[i][0].startswith(q):
+            found.add(self._keys[i][1])
+            i += 1
+
+        # Hits on the start of the name or unit sort ahead of later-word hits
+        def rank(tenant_id):
+            row = self._tenants[tenant_id]
+            name = _normalize(row["name"])
+            return (not (name.startswith(q) or _normalize(row["unit"]).startswith(q)), name, str(tenant_id))
+
+        return [dict(self._tenants[t]) for t in sorted(found, key=rank)[:limit]]
+
+    def text(self, table, query, limit=SEARCH_LIMIT):
+        terms = tokenize(query or "")
+        if not terms:
+            return []
+        postings = [self._postings[table].get(term, {}) for term in terms]
+        ids = set(postings[0]).intersection(*postings[1:])
+        docs = self._docs[table]
+        score = {d: sum(p[d] for p in postings) for d in ids}
+        # Newest first, then a stable sort by score keeps that among ties
+        ranked = sorted(ids, key=lambda d: str(docs[d].get("date") or ""), reverse=True)
+        ranked.sort(key=lambda d: -score[d])
+        return [dict(docs[d]) for d in ranked[:limit]]
+
+
+_index = None
+_postgres_failed_at = None
+_init_lock = threading.Lock()
+
+
+def get_search_index():
+    """The local index, rebuilt from Supabase once it is SEARCH_INDEX_TTL old."""
+    global _index
+    if _index is None or time.time() - _index.built_at > SEARCH_INDEX_TTL:
+        with _init_lock:
+            if _index is None or time.time() - _index.built_at > SEARCH_INDEX_TTL:
+                from database import get_all_complaints, get_all_feedback
+                from snapshot import tenants_table
+                _index = SearchIndex().load(tenants_table().to_pylist(), get_all_complaints(), get_all_feedback())
+    return _index
+
+
+def _search(function, query, limit):
+    global _postgres_failed_at
+    if SEARCH_BACKEND != "local" and (
+            _postgres_failed_at is None or time.time() - _postgres_failed_at > SEARCH_RETRY):
+        from database import search_rows
+        rows = search_rows(function, query, limit)
+        if rows is not None:
+            return rows
+        _postgres_failed_at = time.time()
+    return None
+
+
+def search_tenants(query, limit=SEARCH_LIMIT):
+    """Tenants whose name (or any word of it), unit or email starts with
+    `query`. Rows carry TENANT_FIELDS only, never the password hash."""
+    query = (query or "").strip()
+    if not query:
+        return []
+    rows = _search("search_tenants", query, limit)
+    return rows if rows is not None else get_search_index().tenants(query, limit)
+
+
+def search_complaints(query, limit=SEARCH_LIMIT):
+    """Complaints matching every word of `query` in subject or message."""
+    query = (query or "").strip()
+    if not query:
+        return []
+    rows = _search("search_complaints", query, limit)
+    return rows if rows is not None else get_search_index().text("complaints", query, limit)
+
+
+def search_feedback(query, limit=SEARCH_LIMIT):
+    """Feedback matching every word of `query` in topic or details."""
+    query = (query or "").strip()
+    if not query:
+        return []
+    rows = _search("search_feedback", query, limit)
+    return rows if rows is not None else get_search_index().text("feedback", query, limit)
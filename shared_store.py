@@ -0,0 +1,191 @@
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# sqlite:///path/to/file.db (default, single node) or redis://host:6379/0
+# (any Redis-protocol server: Redis, Valkey, KeyDB, Dragonfly)
+SHARED_STORE_URL = os.getenv(
+    "SHARED_STORE_URL",
+    "sqlite:///" + os.path.join(os.path.dirname(os.path.abspath(__file__)), ".shared_store.db"),
+)
+# Signed-in sessions expire after this long without activity
+SESSION_TTL = int(os.getenv("SESSION_TTL", "28800"))
+# Signed-in reruns push the expiry back, but write the session at most this often
+SESSION_REFRESH_SECONDS = float(os.getenv("SESSION_REFRESH_SECONDS", "60"))
+
+
+class SQLiteStore:
+    """Key/value store with TTLs in a local SQLite file. Shared by every
+    process on one machine; use RedisStore once replicas span nodes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+        )
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + ttl if ttl else None
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)", (key, value, expires))
+            self._writes += 1
+            if self._writes % 500 == 0:
+                self._conn.execute("DELETE FROM kv WHERE expires <= ?", (time.time(),))
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def take_token(self, key, rate, capacity):
+        """Atomic token bucket shared by every process using this file."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+                tokens, updated = json.loads(row[0]) if row else (capacity, now)
+                tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                # Idle buckets refill completely, so they can simply expire
+                idle = (capacity / rate if rate else 3600) + 60
+                self._conn.execute("INSERT OR REPLACE INTO kv VALUES (?, ?, ?)",
+                                   (key, json.dumps([tokens, now]), now + idle))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return allowed
+
+
+# KEYS[1] = bucket, ARGV = rate per second, capacity, idle ttl (s)
+_TOKEN_BUCKET_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(now - updated, 0) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return allowed
+"""
+
+
+class RedisStore:
+    """Same interface backed by a Redis-protocol server, for replicas on
+    several nodes. Needs the optional `redis` package."""
+
+    def __init__(self, url):
+        import redis
+
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._bucket = self._redis.register_script(_TOKEN_BUCKET_LUA)
+
+    def get(self, key):
+        return self._redis.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._redis.set(key, value, ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self._redis.delete(key)
+
+    def take_token(self, key, rate, capacity):
+        idle = int((capacity / rate if rate else 3600) + 60)
+        return bool(self._bucket(keys=[key], args=[rate, capacity, idle]))
+
+
+def open_store(url=SHARED_STORE_URL):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStore(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):])
+    raise ValueError(f"Unsupported SHARED_STORE_URL: {url}")
+
+
+_store = None
+_init_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _init_lock:
+            if _store is None:
+                _store = open_store()
+    return _store
+
+
+def get_json(key, store=None):
+    try:
+        value = (store or get_store()).get(key)
+        return json.loads(value) if value else None
+    except Exception:
+        return None
+
+
+def set_json(key, value, ttl=None, store=None):
+    try:
+        (store or get_store()).set(key, json.dumps(value), ttl)
+        return True
+    except Exception:
+        return False
+
+
+# Sessions: the login and chat state a replica needs to pick up a tenant's
+# session, keyed by an unguessable id the browser carries in the URL
+def create_session(data, browser=None):
+    """New session id. `browser` is a value the browser holds outside the
+    URL (app.py uses its Streamlit XSRF cookie); a session created with one
+    only restores for requests presenting the same value, so a shared or
+    leaked ?sid= link on its own signs nobody in."""
+    session_id = secrets.token_urlsafe(24)
+    set_json(f"session:{session_id}", {**data, "browser": browser}, SESSION_TTL)
+    return session_id
+
+
+def load_session(session_id, browser=None):
+    data = get_json(f"session:{session_id}") if session_id else None
+    if data and data.get("browser") and not hmac.compare_digest(data["browser"], browser or ""):
+        return None
+    return data
+
+
+def save_session(session_id, data, browser=None):
+    if session_id:
+        set_json(f"session:{session_id}", {**data, "browser": browser}, SESSION_TTL)
+
+
+def end_session(session_id):
+    try:
+        if session_id:
+            get_store().delete(f"session:{session_id}")
+    except Exception:
+        pass
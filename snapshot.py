@@ -0,0 +1,273 @@
+import os
+import threading
+import time
+import pyarrow as pa
+import pyarrow.compute as pc
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How often the tenant snapshot reads users changed since its high-water mark
+# (users.updated_at, README step 4); payments arrive through the change feed
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "15"))
+# Columns read from users; password_hash is never selected
+TENANT_COLUMNS = ("id", "username", "role", "name", "email", "unit", "phone", "rent", "balance",
+                  "lease_start", "lease_end", "created_at", "updated_at")
+TENANT_VIEW_COLUMNS = ("Name", "Unit", "Email", "Phone", "Rent", "Balance", "Status")
+# Rows attached without a re-sort add a chunk each; compact past this many
+MAX_CHUNKS = 64
+
+
+class ColumnarSnapshot:
+    """Read-only Arrow copy of one table, shared by every session.
+
+    Changes are queued by `apply` and merged on the next read into a new
+    immutable pa.Table. New rows that sort past either end of the table (e.g.
+    the latest payments) are attached as a new chunk; rows whose id changed
+    are filtered out and the result re-sorted. Sessions hold whichever
+    version they read, so nothing is copied per session or per rerun; `view`
+    caches tables derived from a version the same way.
+    """
+
+    def __init__(self, sort_keys, mark_column=None):
+        self.sort_keys = sort_keys
+        self.mark_column = mark_column
+        self.mark = None
+        self._table = pa.table({})
+        self._stamps = {}  # id -> mark_column value ("" without one) of rows held
+        self._pending = {}  # id -> new row, or None to drop it
+        self._fresh = set()  # pending ids not yet in the table
+        self._views = {}
+        self._lock = threading.RLock()
+
+    def apply(self, row, op="UPDATE"):
+        if not row or row.get("id") is None:
+            return
+        with self._lock:
+            if op == "DELETE":
+                if self._stamps.pop(row["id"], None) is not None:
+                    self._pending[row["id"]] = None
+                return
+            stamp = str(row.get(self.mark_column) or "") if self.mark_column else ""
+            if self.mark_column and self._stamps.get(row["id"]) == stamp:
+                return
+            if row["id"] not in self._stamps:
+                self._fresh.add(row["id"])
+            self._stamps[row["id"]] = stamp
+            if stamp and (self.mark is None or stamp > self.mark):
+                self.mark = stamp
+            self._pending[row["id"]] = dict(row)
+
+    def load(self, rows):
+        """Replace the whole snapshot with `rows`."""
+        with self._lock:
+            self._table = pa.table({})
+            self._stamps.clear()
+            self._pending.clear()
+            self._fresh.clear()
+            self.mark = None
+            for row in rows:
+                self.apply(row, "INSERT")
+        return self
+
+    def seed(self, rows):
+        """Add `rows` whose ids the snapshot doesn't hold yet; changes that
+        arrived while they were being read win over them."""
+        with self._lock:
+            for row in rows:
+                if row.get("id") not in self._stamps:
+                    self.apply(row, "INSERT")
+        return self
+
+    def _sort(self, table):
+        keys = [(c, order) for c, order in self.sort_keys if c in table.column_names]
+        return table.sort_by(keys) if keys else table
+
+    def _in_order(self, first, second):
+        """True if row `first` sorts at or before row `second`."""
+        for column, order in self.sort_keys:
+            a, b = first.get(column), second.get(column)
+            if a is None or b is None:
+                return False
+            if a != b:
+                return a < b if order == "ascending" else a > b
+        return True
+
+    def _merge(self, table, pending, fresh):
+        rows = [r for r in pending.values() if r is not None]
+        changed = [i for i in pending if i not in fresh]
+        if table.num_rows and changed:
+            changed = pa.array(changed, type=table.schema.field("id").type)
+            table = table.filter(pc.invert(pc.is_in(table["id"], value_set=changed)))
+        if not rows:
+            return table
+        new = self._sort(pa.Table.from_pylist(rows))
+        if not table.num_rows:
+            return new
+        if new.column_names == table.column_names and not new.schema.equals(table.schema):
+            try:
+                new = new.cast(table.schema)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass
+        if not changed and new.schema.equals(table.schema):
+            # Only new rows: if they all sort past one end, attach them as a
+            # chunk instead of re-sorting the whole table
+            first, last = table.slice(0, 1).to_pylist()[0], table.slice(table.num_rows - 1).to_pylist()[0]
+            if self._in_order(new.slice(new.num_rows - 1).to_pylist()[0], first):
+                return pa.concat_tables([new, table])
+            if self._in_order(last, new.slice(0, 1).to_pylist()[0]):
+                return pa.concat_tables([table, new])
+        return self._sort(pa.concat_tables([table, new], promote_options="permissive"))
+
+    def table(self):
+        with self._lock:
+            if self._pending:
+                pending, self._pending = self._pending, {}
+                fresh, self._fresh = self._fresh, set()
+                try:
+                    self._table = self._merge(self._table, pending, fresh)
+                except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                    # A column changed type (e.g. numbers, then text); rebuild
+                    # it from Python rows so Arrow infers one type for all
+                    kept = [r for r in self._table.to_pylist() if r.get("id") not in pending]
+                    rows = {r["id"]: r for r in kept} | pending
+                    self._table = self._merge(pa.table({}), rows, set(rows))
+                if self._table.num_columns and self._table.column(0).num_chunks > MAX_CHUNKS:
+                    self._table = self._table.combine_chunks()
+            return self._table
+
+    def view(self, name, build):
+        """`build(table)`, computed once per snapshot version."""
+        table = self.table()
+        with self._lock:
+            cached = self._views.get(name)
+            if cached is not None and cached[0] is table:
+                return cached[1]
+        result = build(table)
+        with self._lock:
+            self._views[name] = (table, result)
+        return result
+
+
+_tenants = None
+_payments = None
+_tenants_checked_at = 0.0
+_refresh_lock = threading.Lock()
+_init_lock = threading.Lock()
+
+
+def _refresh_tenants(snapshot):
+    from database import get_rows_since, get_all_tenants
+
+    rows = get_rows_since("users", "updated_at", snapshot.mark, columns=", ".join(TENANT_COLUMNS))
+    if snapshot.mark is None and not rows:
+        # users.updated_at isn't set up yet: reload everything each time
+        snapshot.load({k: v for k, v in t.items() if k != "password_hash"} for t in get_all_tenants())
+        return
+    for row in rows:
+        snapshot.apply(row, "UPDATE" if row.get("role") == "tenant" else "DELETE")
+
+
+def get_tenants_snapshot():
+    """Process-wide tenant rows (no password hashes), refreshed with the
+    users changed since the last read at most every SNAPSHOT_REFRESH_SECONDS."""
+    global _tenants, _tenants_checked_at
+    if _tenants is None:
+        with _init_lock:
+            if _tenants is None:
+                snapshot = ColumnarSnapshot([("name", "ascending"), ("id", "ascending")], mark_column="updated_at")
+                _refresh_tenants(snapshot)
+                _tenants_checked_at = time.time()
+                _tenants = snapshot
+    elif time.time() - _tenants_checked_at > SNAPSHOT_REFRESH_SECONDS and _refresh_lock.acquire(blocking=False):
+        # One session refreshes; the others keep reading the current version
+        try:
+            _refresh_tenants(_tenants)
+            _tenants_checked_at = time.time()
+        finally:
+            _refresh_lock.release()
+    return _tenants
+
+
+def get_payments_snapshot():
+    """Process-wide payments, newest first, kept current by the change feed."""
+    global _payments
+    if _payments is None:
+        with _init_lock:
+            if _payments is None:
+                from change_feed import get_feed
+
+                feed = get_feed()
+                snapshot = ColumnarSnapshot([("created_at", "descending"), ("id", "descending")])
+
+                def _on_change(table, op, row):
+                    global _tenants_checked_at
+                    if table == "payments":
+                        snapshot.apply(row, op)
+                        # The payment moved a balance; re-read users on the next look
+                        _tenants_checked_at = 0.0
+
+                # Listen first, then read the table once. The feed neither
+                # keeps nor reads payment rows (only the newest, to start its
+                # watermark), so this is the one full read and the only copy
+                feed.add_listener(_on_change)
+                from database import get_rows_since
+                _payments = snapshot.seed(get_rows_since("payments", "created_at"))
+    return _payments
+
+
+def _column(table, name, fill=None):
+    if name in table.column_names:
+        return table[name] if fill is None else pc.fill_null(table[name], fill)
+    return pa.nulls(table.num_rows) if fill is None else pa.array([fill] * table.num_rows)
+
+
+def _money(values):
+    return pa.array([f"₹{v:,.0f}" for v in values.to_pylist()], pa.string())
+
+
+def _tenant_view(table):
+    balance = _column(table, "balance", 0)
+    status = pc.if_else(pc.greater(balance, 0), "Overdue", "Current")
+    if isinstance(status, pa.ChunkedArray):
+        status = status.combine_chunks()
+    offsets = pa.array(range(table.num_rows + 1), pa.int32())
+    return pa.table({
+        "id": _column(table, "id"),
+        "Name": _column(table, "name"),
+        "Unit": _column(table, "unit"),
+        "Email": _column(table, "email"),
+        "Phone": _column(table, "phone"),
+        "Rent": _money(_column(table, "rent", 0)),
+        "Balance": _money(balance),
+        # One-item lists so st.dataframe can show the status as a colored label
+        "Status": pa.ListArray.from_arrays(offsets, status),
+    })
+
+
+def tenants_table():
+    return get_tenants_snapshot().table()
+
+
+def tenant_view(ids=None):
+    """Display table for the admin Tenants tab: every tenant, or the rows for
+    `ids` in that order. Built once per snapshot version and shared."""
+    view = get_tenants_snapshot().view("tenants", _tenant_view)
+    if ids is None or not view.num_rows:
+        return view
+    positions = pc.index_in(pa.array(ids, view.schema.field("id").type), value_set=view["id"])
+    return view.take(positions.drop_null())
+
+
+def tenant_counts():
+    """(tenants, tenants with a balance due) from the current snapshot."""
+    def count(table):
+        if not table.num_rows:
+            return 0, 0
+        return table.num_rows, pc.sum(pc.greater(_column(table, "balance", 0), 0)).as_py() or 0
+
+    return get_tenants_snapshot().view("counts", count)
+
+
+def payments_table():
+    return get_payments_snapshot().table()
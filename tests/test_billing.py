@@ -0,0 +1,94 @@
+import pytest
+
+from billing import build_rent_roll
+
+TERMS = {"monthly_rent": 1000.0, "late_fee": 75.0, "grace_days": 5, "due_day": 1}
+
+
+def tenant(user_id=1, **fields):
+    return {"id": user_id, "role": "tenant", "rent": 1000.0, "created_at": "2025-01-01T00:00:00+00:00",
+            "lease_start": "2025-01-01", "lease_end": None, **fields}
+
+
+def payment(amount, date, user_id=1):
+    return {"user_id": user_id, "amount": amount, "date": date}
+
+
+def roll_for(users, payments, as_of):
+    roll = build_rent_roll(users, payments, as_of, TERMS)
+    return roll.set_index("user_id").to_dict("index")
+
+
+def test_on_time_payments_leave_nothing_due():
+    payments = [payment(1000, f"2025-0{m}-03") for m in (1, 2, 3)]
+    row = roll_for([tenant()], payments, "2025-03-31")[1]
+    assert row["balance"] == 0
+    assert row["late_fees"] == 0
+
+
+def test_late_fee_after_grace_period():
+    # Paid on the 6th: one day past the five-day grace period
+    row = roll_for([tenant()], [payment(1000, "2025-01-06")], "2025-01-31")[1]
+    assert row["late_fees"] == 75
+    assert row["balance"] == 75
+
+
+def test_no_late_fee_before_deadline_passes():
+    row = roll_for([tenant()], [], "2025-01-05")[1]
+    assert row["late_fees"] == 0
+    assert row["balance"] == 1000
+
+
+def test_partial_payment_leaves_remainder_and_fee():
+    row = roll_for([tenant()], [payment(600, "2025-01-02")], "2025-01-20")[1]
+    assert row["late_fees"] == 75
+    assert row["balance"] == pytest.approx(475)
+    assert row["current"] == pytest.approx(475)
+    # Thirty days after the due date the unpaid rent moves to the next bucket
+    row = roll_for([tenant()], [payment(600, "2025-01-02")], "2025-01-31")[1]
+    assert row["days_30"] == pytest.approx(400)
+
+
+def test_payments_clear_oldest_charges_first():
+    # Two months charged, 1500 paid on time in January: February keeps the 500
+    row = roll_for([tenant()], [payment(1500, "2025-01-02")], "2025-02-28")[1]
+    assert row["balance"] == pytest.approx(575)
+    assert row["current"] == pytest.approx(575)
+    assert row["days_30"] == 0
+
+
+def test_aging_buckets():
+    # Nothing paid January to April; each month adds rent and a late fee
+    row = roll_for([tenant()], [], "2025-04-30")[1]
+    assert row["days_90"] == pytest.approx(1075)   # Jan 1 rent, Jan 6 fee
+    assert row["days_60"] == pytest.approx(2075)   # Feb 1 rent, Feb 6 fee, Mar 1 rent
+    assert row["days_30"] == pytest.approx(75)     # Mar 6 fee
+    assert row["current"] == pytest.approx(1075)   # Apr 1 rent, Apr 6 fee
+    assert row["balance"] == pytest.approx(4300)
+    assert row["late_fees"] == pytest.approx(300)
+
+
+def test_no_rent_after_lease_end():
+    payments = [payment(1000, "2025-01-02"), payment(1000, "2025-02-02")]
+    row = roll_for([tenant(lease_end="2025-02-28")], payments, "2025-06-30")[1]
+    assert row["balance"] == 0
+    assert row["late_fees"] == 0
+
+
+def test_no_rent_before_lease_start():
+    users = [tenant(1), tenant(2, lease_start="2025-05-01", created_at="2025-01-15")]
+    roll = roll_for(users, [payment(1000, "2025-03-02")], "2025-03-31")
+    assert roll[2]["balance"] == 0
+    assert roll[1]["balance"] == pytest.approx(2225)   # 3000 rent + 3 late fees - 1000
+
+
+def test_created_at_used_without_lease_start():
+    # Moved in mid-month: first charge is due on move-in
+    row = roll_for([tenant(lease_start=None, created_at="2025-03-15T10:00:00+00:00")], [], "2025-03-18")[1]
+    assert row["balance"] == 1000
+    assert row["late_fees"] == 0
+
+
+def test_admins_are_not_billed():
+    roll = roll_for([tenant(), tenant(2, role="admin")], [], "2025-01-03")
+    assert list(roll) == [1]
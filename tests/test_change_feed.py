@@ -0,0 +1,86 @@
+from change_feed import ChangeFeed, dashboard_invalidator
+
+
+class Tables:
+    """Stands in for database.get_rows_since over in-memory rows."""
+
+    def __init__(self, **rows):
+        self.rows = {"announcements": [], "complaints": [], "payments": [], **rows}
+        self.reads = []
+
+    def __call__(self, table, column, since):
+        self.reads.append((table, column, since))
+        return [r for r in self.rows[table]
+                if r.get(column) and (since is None or str(r[column]) >= since)]
+
+
+def complaint(complaint_id, user_id, date, **fields):
+    return {"id": complaint_id, "user_id": user_id, "subject": "Leak", "status": "Open",
+            "date": date, "resolved_at": None, **fields}
+
+
+def test_poll_applies_only_changes():
+    tables = Tables(complaints=[complaint(1, 7, "2025-03-01"), complaint(2, 8, "2025-03-02")])
+    feed = ChangeFeed(fetch_since=tables)
+    events = []
+    feed.add_listener(lambda table, op, row: events.append((table, op, row["id"])))
+    assert feed.poll(notify=False) == 2
+    # Rows re-read at the high-water mark are already cached
+    assert feed.poll() == 0
+    tables.rows["complaints"][1].update(status="Resolved", resolved_at="2025-03-05")
+    tables.rows["complaints"].append(complaint(3, 9, "2025-03-06"))
+    assert feed.poll() == 2
+    assert events[2:] == [("complaints", "UPDATE", 2), ("complaints", "INSERT", 3)]
+    assert [c["id"] for c in feed.rows("complaints")] == [3, 2, 1]
+
+
+def test_subscriptions_see_only_new_events():
+    tables = Tables(complaints=[complaint(1, 7, "2025-03-01")])
+    feed = ChangeFeed(fetch_since=tables)
+    feed.poll(notify=False)
+    sub = feed.subscribe(["complaints"])
+    feed.apply("complaints", "INSERT", complaint(2, 8, "2025-03-02"))
+    feed.apply("announcements", "INSERT", {"id": 1, "title": "Hi", "date": "2025-03-02"})
+    assert [(t, op, row["id"]) for t, op, row in sub.drain()] == [("complaints", "INSERT", 2)]
+
+
+def test_delete_passes_on_the_old_row():
+    feed = ChangeFeed(fetch_since=Tables())
+    events = []
+    feed.add_listener(lambda table, op, row: events.append((op, row.get("user_id"))))
+    feed.apply("complaints", "INSERT", complaint(1, 7, "2025-03-01"))
+    assert feed.apply("complaints", "DELETE", {"id": 1})
+    assert events == [("INSERT", 7), ("DELETE", 7)]
+    assert feed.rows("complaints") == []
+
+
+def test_events_without_a_user_do_not_clear_every_dashboard():
+    invalidated = []
+    listener = dashboard_invalidator(invalidated.append)
+    listener("complaints", "UPDATE", {"id": 1, "user_id": 7})
+    listener("payments", "DELETE", {"id": 2})
+    listener("announcements", "INSERT", {"id": 3, "user_id": 8})
+    assert invalidated == [7]
+
+
+def test_bootstrap_reads_only_the_newest_payment():
+    payments = [{"id": i, "user_id": 7, "amount": 100.0, "created_at": f"2025-03-0{i}"} for i in (1, 2, 3)]
+    tables = Tables(payments=payments)
+    latest = []
+
+    def fetch_latest(table, column):
+        latest.append((table, column))
+        return max(tables.rows[table], key=lambda r: r[column])
+
+    feed = ChangeFeed(fetch_since=tables, fetch_latest=fetch_latest)
+    events = []
+    feed.add_listener(lambda table, op, row: events.append((table, row["id"])))
+    feed.bootstrap()
+    assert latest == [("payments", "created_at")]
+    assert "payments" not in {table for table, _, _ in tables.reads}
+    # Polling continues from the newest payment; only later ones are news
+    events.clear()
+    tables.rows["payments"].append({"id": 4, "user_id": 7, "amount": 50.0, "created_at": "2025-03-04"})
+    assert feed.poll() == 1
+    assert events == [("payments", 4)]
+    assert ("payments", "created_at", "2025-03-03") in tables.reads
@@ -0,0 +1,71 @@
+from complaint_clusters import COMPLAINT_CLUSTER_THRESHOLD, ComplaintClusters, complaint_vector
+
+
+def complaint(complaint_id, subject, message, category="Maintenance", date="2025-03-01T09:00:00+00:00"):
+    return {"id": complaint_id, "subject": subject, "message": message, "category": category,
+            "unit": f"{complaint_id}A", "status": "Open", "date": date}
+
+
+def similarity(a, b):
+    return float(complaint_vector(*a) @ complaint_vector(*b))
+
+
+def test_same_incident_scores_above_threshold():
+    elevator = [("Elevator out", "The elevator is not working"),
+                ("Elevator broken", "elevator stuck on floor 3"),
+                ("Elevator not working", "lift stopped between floors")]
+    assert similarity(elevator[0], elevator[1]) >= COMPLAINT_CLUSTER_THRESHOLD
+    assert similarity(elevator[2], elevator[0]) >= COMPLAINT_CLUSTER_THRESHOLD
+    assert similarity(("No hot water", "There is no hot water in my shower since morning"),
+                      ("Hot water outage", "hot water not coming in kitchen or bathroom")) >= COMPLAINT_CLUSTER_THRESHOLD
+
+
+def test_shared_generic_words_do_not_group():
+    assert similarity(("AC not working", "air conditioner not working"),
+                      ("Elevator out", "The elevator is not working")) < COMPLAINT_CLUSTER_THRESHOLD
+    assert similarity(("Broken window", "my bedroom window is broken"),
+                      ("Elevator broken", "elevator stuck on floor 3")) < COMPLAINT_CLUSTER_THRESHOLD
+    assert similarity(("Water leak", "water leaking from ceiling in bathroom"),
+                      ("No hot water", "There is no hot water in my shower since morning")) < COMPLAINT_CLUSTER_THRESHOLD
+
+
+def test_outage_reports_form_one_group():
+    clusters = ComplaintClusters().load([
+        complaint(1, "Elevator out", "The elevator is not working"),
+        complaint(2, "Elevator broken", "elevator stuck on floor 3"),
+        complaint(3, "Elevator not working", "lift stopped between floors"),
+        complaint(4, "Water leak", "water leaking from ceiling in bathroom"),
+        complaint(5, "Loud music", "music from the unit above late at night", category="Noise"),
+    ])
+    groups = clusters.groups()
+    assert groups[0]["ids"] == [1, 2, 3]
+    assert sorted(len(g["ids"]) for g in groups) == [1, 1, 3]
+
+
+def test_categories_never_share_a_group():
+    clusters = ComplaintClusters().load([
+        complaint(1, "Noise from elevator", "the elevator makes a loud noise", category="Maintenance"),
+        complaint(2, "Noise from elevator", "the elevator makes a loud noise", category="Noise"),
+    ])
+    assert len(clusters.groups()) == 2
+
+
+def test_old_incident_does_not_absorb_new_one():
+    clusters = ComplaintClusters(window_hours=72).load([
+        complaint(1, "Elevator out", "The elevator is not working", date="2025-03-01T09:00:00+00:00"),
+        complaint(2, "Elevator broken", "elevator stuck on floor 3", date="2025-03-10T09:00:00+00:00"),
+    ])
+    assert len(clusters.groups()) == 2
+
+
+def test_resolving_removes_complaint_and_frees_empty_group():
+    clusters = ComplaintClusters().load([
+        complaint(1, "Elevator out", "The elevator is not working"),
+        complaint(2, "Elevator broken", "elevator stuck on floor 3"),
+        complaint(3, "Water leak", "water leaking from ceiling in bathroom"),
+    ])
+    clusters.apply({**complaint(1, "Elevator out", "The elevator is not working"), "status": "Resolved"})
+    clusters.apply({"id": 3}, "DELETE")
+    groups = clusters.groups()
+    assert [g["ids"] for g in groups] == [[2]]
+    assert groups[0]["key"] == 2
@@ -0,0 +1,97 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import context_cache
+from context_cache import ContextCache, LocalCachingAPI
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowAPI(LocalCachingAPI):
+    """Creates block until `release` is set, like a slow Gemini call."""
+
+    def __init__(self, clock):
+        super().__init__(lambda name: SimpleNamespace(name=name), clock)
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def create(self, *args):
+        self.started.set()
+        self.release.wait(5)
+        return super().create(*args)
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    store = {}
+    monkeypatch.setattr(context_cache, "get_json", lambda key: store.get(key))
+    monkeypatch.setattr(context_cache, "set_json", lambda key, value, ttl=None: store.__setitem__(key, value))
+    return store
+
+
+def make_cache(clock, api=None):
+    api = api or SlowAPI(clock)
+    return ContextCache("instructions", "knowledge base", api=api, ttl=3600, refresh=600,
+                        enabled=True, clock=clock), api
+
+
+def test_entry_is_created_once_and_extended_near_expiry(shared):
+    clock = Clock()
+    cache, api = make_cache(clock)
+    first = cache.models(["fast", "full"])
+    assert set(first) == {"fast", "full"} and api.created == 2
+    assert cache.models(["fast"])["fast"] is first["fast"]
+    clock.now += 3100
+    cache.models(["fast"])
+    assert api.created == 2 and api.extended == 1
+    assert cache.stats()["entries"]["fast"] == 3600
+
+
+def test_replicas_reuse_the_published_entry(shared):
+    clock = Clock()
+    _, api = make_cache(clock)
+    make_cache(clock, api)[0].models(["fast"])
+    make_cache(clock, api)[0].models(["fast"])
+    assert api.created == 1
+
+
+def test_slow_create_does_not_block_other_lookups(shared):
+    clock = Clock()
+    cache, api = make_cache(clock)
+    cache.models(["full"])
+    api.release.clear()
+    slow = threading.Thread(target=cache.models, args=(["fast"],))
+    slow.start()
+    assert api.started.wait(5)
+    started = time.monotonic()
+    # Another model's entry, stats, and the same model while it's being created
+    assert set(cache.models(["full"])) == {"full"}
+    assert cache.stats()["enabled"]
+    assert cache.models(["fast"]) is None
+    assert time.monotonic() - started < 0.5
+    api.release.set()
+    slow.join()
+    assert set(cache.models(["fast", "full"])) == {"fast", "full"}
+    assert api.created == 2
+
+
+def test_failed_create_falls_back_until_retry(shared):
+    clock = Clock()
+    api = SlowAPI(clock)
+    api.create = lambda *args: (_ for _ in ()).throw(ValueError("below minimum cacheable size"))
+    cache, _ = make_cache(clock, api)
+    assert cache.models(["fast"]) is None
+    assert cache.models(["fast"]) is None
+    api.create = lambda *args: LocalCachingAPI.create(api, *args)
+    clock.now += context_cache.CONTEXT_CACHE_RETRY + 1
+    assert set(cache.models(["fast"])) == {"fast"}
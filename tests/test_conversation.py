@@ -0,0 +1,45 @@
+import threading
+
+from conversation import ConversationMemory
+
+
+def test_keeps_recent_exchanges_and_folds_older_ones():
+    memory = ConversationMemory(keep_exchanges=2, summary_tokens=1000)
+    for i in range(4):
+        memory.add_exchange(f"Question {i}?", f"Answer {i}. More detail.")
+    data = memory.to_dict()
+    assert [q for q, _ in data["exchanges"]] == ["Question 2?", "Question 3?"]
+    assert data["summary"] == [f"- Tenant asked: Question {i}? Answer: Answer {i}." for i in (0, 1)]
+    restored = ConversationMemory.from_dict(data)
+    assert restored.render() == memory.render()
+
+
+def test_persisting_while_a_turn_adds_an_exchange():
+    # The chat worker adds exchanges while the script thread saves the session
+    memory = ConversationMemory(keep_exchanges=3, summary_tokens=60)
+    done = threading.Event()
+    errors = []
+
+    def worker():
+        for i in range(20000):
+            memory.add_exchange(f"Question {i}?", f"Answer {i}.")
+        done.set()
+
+    def reader():
+        while not done.is_set():
+            try:
+                data = memory.to_dict()
+                memory.render()
+            except RuntimeError as e:  # deque mutated during iteration
+                errors.append(e)
+                return
+            if len(data["exchanges"]) > 3:
+                errors.append(f"saved mid-update: {len(data['exchanges'])} exchanges")
+                return
+
+    threads = [threading.Thread(target=worker), threading.Thread(target=reader)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
@@ -0,0 +1,65 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from deadline import Deadline
+from model_router import ModelRouter
+
+
+class SlowFailingModel:
+    """The fast model fails after `delay` seconds, or once its request
+    timeout runs out if that comes first (a hung call)."""
+
+    def __init__(self, name, calls, delay=60.0):
+        self.name, self.calls, self.delay = name, calls, delay
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        timeout = (request_options or {}).get("timeout")
+        self.calls.append((self.name, timeout))
+        if self.name == "fast":
+            time.sleep(min(timeout or 0, self.delay))
+            raise TimeoutError("fast model timed out")
+        text = SimpleNamespace(text="ok")
+        return iter([text]) if stream else text
+
+
+def make_router(calls, delay=60.0):
+    return ModelRouter(fast_model="fast", full_model="full", threshold=99,
+                       model_factory=lambda name: SlowFailingModel(name, calls, delay))
+
+
+def test_retry_gets_only_the_remaining_budget():
+    calls = []
+    started = time.monotonic()
+    router = make_router(calls, delay=0.2)
+    response, route = router.generate("pet fee?", "prompt", timeout=30, deadline=Deadline(0.5))
+    assert route == "full" and response.text == "ok"
+    assert time.monotonic() - started < 0.45
+    assert calls[0] == ("fast", pytest.approx(0.5, abs=0.05))
+    assert calls[1] == ("full", pytest.approx(0.3, abs=0.05))
+
+
+def test_no_retry_once_the_deadline_has_passed():
+    calls = []
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        make_router(calls).generate("pet fee?", "prompt", timeout=0.3, deadline=Deadline(0.3))
+    assert [name for name, _ in calls] == ["fast"]
+    assert time.monotonic() - started < 0.45
+
+
+def test_no_retry_for_a_cancelled_turn():
+    calls = []
+    deadline = Deadline(30)
+    deadline.cancel("superseded")
+    with pytest.raises(TimeoutError):
+        list(make_router(calls).stream("pet fee?", "prompt", timeout=0.05, deadline=deadline))
+    assert [name for name, _ in calls] == ["fast"]
+
+
+def test_retry_without_a_deadline():
+    calls = []
+    response, route = make_router(calls).generate("pet fee?", "prompt", timeout=0.05)
+    assert route == "full"
+    assert calls == [("fast", 0.05), ("full", 0.05)]
@@ -0,0 +1,32 @@
+from question_log import question_report, rankings
+
+
+def logged(question, tokens=100, user_id=1, no_info=False):
+    return {"question": question, "normalized": None, "user_id": user_id, "prompt_tokens": tokens,
+            "answer_tokens": 0, "total_ms": 500, "cache": "miss", "served_from": "gemini", "no_info": no_info}
+
+
+def cheap_and_frequent():
+    topics = ["pet policy", "quiet hours", "rooftop lounge booking", "parking permit", "laundry room hours"]
+    return [logged(f"What is the {topic}?", tokens=50, user_id=u) for topic in topics for u in range(1, 5)]
+
+
+def test_report_keeps_every_cluster():
+    report = question_report(cheap_and_frequent())
+    assert len(report) == 5
+    assert report["asked"].tolist() == [4] * 5
+
+
+def test_rare_expensive_question_ranks_by_cost():
+    rows = cheap_and_frequent() + [logged("Can I sublet my apartment while I travel abroad?", tokens=5000)]
+    ranked = rankings(question_report(rows), top=3)
+    assert len(ranked["frequency"]) == 3
+    assert "sublet" not in " ".join(ranked["frequency"]["example"])
+    assert ranked["cost"]["example"].iloc[0] == "Can I sublet my apartment while I travel abroad?"
+    assert ranked["cost"]["total_tokens"].iloc[0] == 5000
+
+
+def test_gaps_come_from_every_cluster():
+    rows = cheap_and_frequent() + [logged("Is there a sauna in the building?", no_info=True)]
+    gaps = rankings(question_report(rows), top=2)["gaps"]
+    assert gaps["example"].tolist() == ["Is there a sauna in the building?"]
@@ -0,0 +1,60 @@
+import pytest
+
+from change_feed import ChangeFeed
+from snapshot import ColumnarSnapshot
+
+
+def payment(payment_id, created_at, amount=1000.0, status="Paid"):
+    return {"id": payment_id, "user_id": 1, "amount": amount, "status": status, "created_at": created_at}
+
+
+def payments_snapshot(rows):
+    snapshot = ColumnarSnapshot([("created_at", "descending"), ("id", "descending")]).load(rows)
+    snapshot.table()
+    return snapshot
+
+
+def ids(snapshot):
+    return snapshot.table()["id"].to_pylist()
+
+
+def test_new_payments_are_attached_without_a_resort():
+    snapshot = payments_snapshot([payment(1, "2025-03-01"), payment(2, "2025-03-02")])
+    before = snapshot.table()
+    snapshot.apply(payment(3, "2025-03-03", amount=500), "INSERT")
+    after = snapshot.table()
+    assert ids(snapshot) == [3, 2, 1]
+    # The new row is a chunk of its own in front of the old version's data
+    assert after["id"].num_chunks == 2
+    assert after.schema.equals(before.schema)
+
+
+def test_out_of_order_rows_and_updates_are_sorted_in():
+    snapshot = payments_snapshot([payment(1, "2025-03-01"), payment(3, "2025-03-03")])
+    snapshot.apply(payment(2, "2025-03-02"), "INSERT")
+    assert ids(snapshot) == [3, 2, 1]
+    snapshot.apply(payment(3, "2025-03-03", status="Refunded"))
+    snapshot.apply({"id": 1}, "DELETE")
+    table = snapshot.table()
+    assert table["id"].to_pylist() == [3, 2]
+    assert table["status"].to_pylist() == ["Refunded", "Paid"]
+
+
+def test_seed_keeps_changes_that_arrived_first():
+    snapshot = ColumnarSnapshot([("created_at", "descending")])
+    snapshot.apply(payment(1, "2025-03-01", status="Refunded"))
+    snapshot.seed([payment(1, "2025-03-01"), payment(2, "2025-03-02")])
+    assert snapshot.table().to_pylist()[1]["status"] == "Refunded"
+    assert ids(snapshot) == [2, 1]
+
+
+def test_feed_passes_payments_on_without_keeping_them():
+    seen = []
+    feed = ChangeFeed(fetch_since=lambda table, column, since: [payment(1, "2025-03-01")] if table == "payments" else [])
+    feed.add_listener(lambda table, op, row: seen.append((table, op, row["id"])))
+    assert feed.poll() == 1
+    # Re-reading the same row at the high-water mark is not a new event
+    assert feed.poll() == 0
+    assert seen == [("payments", "INSERT", 1)]
+    with pytest.raises(ValueError):
+        feed.rows("payments")
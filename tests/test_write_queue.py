@@ -0,0 +1,97 @@
+import pytest
+
+import write_queue
+from write_queue import WriteQueue
+
+
+class Sender:
+    """Stands in for database.insert_rows: rejects any batch holding a
+    row whose message is "bad", or everything while `down`."""
+
+    def __init__(self):
+        self.down = False
+        self.calls = []
+        self.delivered = []
+
+    def __call__(self, table, rows):
+        self.calls.append((table, len(rows)))
+        if self.down:
+            return False, "connection refused"
+        if any(r.get("message") == "bad" for r in rows):
+            return False, "invalid input syntax"
+        self.delivered.extend(r["message"] for r in rows)
+        return True, None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(write_queue.time, "time", lambda: now[0])
+    return now
+
+
+def make_queue(tmp_path, sender, **options):
+    return WriteQueue(path=str(tmp_path / "outbox.db"), sender=sender, **options)
+
+
+def complaint(queue, message):
+    return queue.enqueue("complaint", {"user_id": 1, "subject": "Leak", "message": message})
+
+
+def attempts(queue):
+    return queue._conn.execute("SELECT payload, attempts, status FROM outbox ORDER BY id").fetchall()
+
+
+def test_flush_sends_one_batch_and_clears_it(tmp_path, clock):
+    sender = Sender()
+    queue = make_queue(tmp_path, sender)
+    for i in range(3):
+        complaint(queue, f"m{i}")
+    assert queue.flush() == 3
+    assert sender.calls == [("complaints", 3)]
+    assert sender.delivered == ["m0", "m1", "m2"]
+    assert queue.stats()["pending"] == 0
+
+
+def test_outage_backs_off_then_retries(tmp_path, clock):
+    sender = Sender()
+    queue = make_queue(tmp_path, sender)
+    complaint(queue, "m0")
+    complaint(queue, "m1")
+    sender.down = True
+    assert queue.flush() == 0
+    assert [(a, s) for _, a, s in attempts(queue)] == [(1, "pending"), (1, "pending")]
+    sender.down = False
+    # Not due yet
+    assert queue.flush() == 0
+    clock[0] += 2
+    assert queue.flush() == 2
+    assert sender.delivered == ["m0", "m1"]
+
+
+def test_poison_row_does_not_hold_back_the_batch(tmp_path, clock):
+    sender = Sender()
+    queue = make_queue(tmp_path, sender, max_attempts=3)
+    for message in ("m0", "m1", "bad", "m3", "m4"):
+        complaint(queue, message)
+    assert queue.flush() == 4
+    assert sender.delivered == ["m0", "m1", "m3", "m4"]
+    rows = attempts(queue)
+    assert len(rows) == 1 and '"bad"' in rows[0][0] and rows[0][1:] == (1, "pending")
+    for _ in range(2):
+        clock[0] += 600
+        queue.flush()
+    assert queue.stats() == {"pending": 0, "failed": 1, "oldest_pending": None}
+
+
+def test_retry_failed_requeues(tmp_path, clock):
+    sender = Sender()
+    queue = make_queue(tmp_path, sender, max_attempts=1)
+    complaint(queue, "m0")
+    sender.down = True
+    queue.flush()
+    assert queue.stats()["failed"] == 1
+    sender.down = False
+    queue.retry_failed()
+    assert queue.flush() == 1
+    assert queue.stats()["failed"] == 0
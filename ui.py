@@ -0,0 +1,144 @@
+import os
+import re
+from functools import lru_cache
+from html import escape
+
+THEME_CSS_PATH = os.path.join(os.path.dirname(__file__), "assets", "theme.css")
+
+ICONS = {
+    "alert": "<path d='M12 9v4m0 3h.01M10.29 3.86l-8.18 14.15A1 1 0 0 0 3 19.5h18a1 1 0 0 0 .87-1.49L13.71 3.86a1 1 0 0 0-1.42 0z'/>",
+    "list": "<path d='M4 7h16M4 12h16M4 17h10'/>",
+    "shield": "<path d='M12 2l8 4v6c0 5-3.4 9.4-8 10-4.6-.6-8-5-8-10V6l8-4z'/><path d='M12 8v4m0 4h.01'/>",
+}
+PRIORITY_TONES = {"High": "amber", "Medium": "blue"}
+
+
+@lru_cache(maxsize=1)
+def theme_style():
+    """The residual theme CSS as one minified <style> tag, read once per
+    process. Colors and fonts are in .streamlit/config.toml."""
+    try:
+        with open(THEME_CSS_PATH, "r", encoding="utf-8") as f:
+            css = f.read()
+    except OSError:
+        return ""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css).replace(";}", "}")
+    return f"<style>{css.strip()}</style>"
+
+
+# Card markup helpers. Each is memoized on its arguments, so repeated reruns
+# reuse the built string; tenant-entered text is escaped here.
+
+@lru_cache(maxsize=256)
+def badge(text, tone="green"):
+    return f"<span class='badge-{tone}'>{escape(str(text))}</span>"
+
+
+def priority_badge(priority):
+    return badge(priority, PRIORITY_TONES.get(priority, "green"))
+
+
+def _icon(name):
+    return f"<span class='section-icon' aria-hidden='true'><svg viewBox='0 0 24 24'>{ICONS[name]}</svg></span>"
+
+
+@lru_cache(maxsize=256)
+def section_header(title, icon=None):
+    return f"<div class='section-header'>{_icon(icon) if icon else ''}{escape(title)}</div>"
+
+
+def _sub(text):
+    return f"<div class='metric-sub'>{text}</div>"
+
+
+@lru_cache(maxsize=1024)
+def metric_card(label, value, sub="", footer=""):
+    """`sub` is a line or a tuple of lines; `footer` is trusted HTML (a
+    badge). Everything but the footer is escaped."""
+    subs = sub if isinstance(sub, tuple) else (sub,) if sub else ()
+    return (
+        "<div class='metric-card'>"
+        f"<div class='metric-label'>{escape(str(label))}</div>"
+        f"<div class='metric-value'>{escape(str(value))}</div>"
+        + "".join(_sub(escape(str(line))) for line in subs)
+        + (f"<div class='metric-footer'>{footer}</div>" if footer else "")
+        + "</div>"
+    )
+
+
+@lru_cache(maxsize=4096)
+def announcement_card(title, message, date, priority, is_new=False):
+    new = " &nbsp;" + badge("New", "blue") if is_new else ""
+    return (
+        "<div class='metric-card'>"
+        f"<div><strong>{escape(str(title))}</strong> &nbsp;{priority_badge(priority)}{new}</div>"
+        + _sub(escape(str(message))) + _sub(escape(str(date)))
+        + "</div>"
+    )
+
+
+@lru_cache(maxsize=4096)
+def complaint_card(tenant_name, unit, category, subject, message, date, resolved):
+    status = badge("Resolved", "green") if resolved else badge("Open", "amber")
+    return (
+        "<div class='metric-card'>"
+        f"<div><strong>{escape(str(tenant_name))}</strong> — Unit {escape(str(unit))} &nbsp;{status}</div>"
+        + _sub(f"<strong>Category:</strong> {escape(str(category))}")
+        + _sub(f"<strong>Subject:</strong> {escape(str(subject))}")
+        + _sub(escape(str(message)))
+        + _sub(f"Filed: {escape(str(date))}")
+        + "</div>"
+    )
+
+
+@lru_cache(maxsize=1024)
+def complaint_group_card(subject, category, count, units, first_date, latest_date):
+    """One incident: `count` open complaints from the tuple of `units`."""
+    shown = ", ".join(escape(str(u)) for u in units[:8]) + (f" +{len(units) - 8} more" if len(units) > 8 else "")
+    return (
+        "<div class='metric-card'>"
+        f"<div><strong>{escape(str(subject))}</strong> &nbsp;{badge(f'{count} reports', 'amber')}</div>"
+        + _sub(f"<strong>Category:</strong> {escape(str(category))}")
+        + _sub(f"<strong>Units:</strong> {shown}")
+        + _sub(f"First filed: {escape(str(first_date))} · latest: {escape(str(latest_date))}")
+        + "</div>"
+    )
+
+
+@lru_cache(maxsize=4096)
+def feedback_card(tenant_name, unit, topic, rating, details, follow_up):
+    return (
+        "<div class='metric-card'>"
+        f"<div><strong>{escape(str(tenant_name))}</strong> — Unit {escape(str(unit))}</div>"
+        + _sub(f"<strong>Topic:</strong> {escape(str(topic))} | <strong>Rating:</strong> {escape(str(rating))}/5")
+        + _sub(escape(str(details)))
+        + _sub(f"Follow-up: {'Yes' if follow_up else 'No'}")
+        + "</div>"
+    )
+
+
+@lru_cache(maxsize=256)
+def sidebar_brand(name, subtitle):
+    return (f"<div class='sidebar-brand'>{escape(str(name))}</div>"
+            f"<div class='sidebar-sub'>{escape(str(subtitle))}</div>")
+
+
+BUILDING_ALERTS = (
+    "<div class='metric-card building-alert-card'>"
+    f"<div class='metric-label'>{_icon('alert')}Building Alerts</div>"
+    + _sub("Elevator C maintenance scheduled Feb 25 — use elevators A or B")
+    + _sub("Pool opens May 1 — registration opens April 15")
+    + _sub("Pest control treatment second Tuesday of each month")
+    + "</div>"
+)
+
+EMERGENCY_CONTACTS = (
+    "<div class='metric-card'>"
+    + _sub("<strong>Leasing Office:</strong> +91 98765 43210 | leasing@riversideapts.com")
+    + _sub("<strong>Emergency Maintenance:</strong> +91 98765 43211 (24/7)")
+    + _sub("<strong>Non-emergency police:</strong> 100")
+    + _sub("<strong>Fire / Medical:</strong> 112")
+    + "</div>"
+)
@@ -0,0 +1,218 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WRITE_QUEUE_PATH = os.getenv(
+    "WRITE_QUEUE_PATH",
+    os.path.join(os.path.dirname(__file__), ".write_queue.db"),
+)
+WRITE_QUEUE_FLUSH_SECONDS = float(os.getenv("WRITE_QUEUE_FLUSH_SECONDS", "2"))
+WRITE_QUEUE_BATCH_SIZE = int(os.getenv("WRITE_QUEUE_BATCH_SIZE", "100"))
+WRITE_QUEUE_MAX_ATTEMPTS = int(os.getenv("WRITE_QUEUE_MAX_ATTEMPTS", "20"))
+
+# kind -> (Supabase table, reference prefix)
+KINDS = {
+    "complaint": ("complaints", "CMP"),
+    "feedback": ("feedback", "FB"),
+    "chat_turn": ("chat_transcripts", "CHT"),
+    "question_log": ("question_log", "QL"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    reference TEXT UNIQUE NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt);
+"""
+
+
+def new_reference(prefix):
+    """Human-friendly unique reference, e.g. CMP-261019-7K3QX9."""
+    alphabet = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+    suffix = "".join(secrets.choice(alphabet) for _ in range(6))
+    return f"{prefix}-{datetime.now(timezone.utc).strftime('%y%m%d')}-{suffix}"
+
+
+class WriteQueue:
+    """Local durable outbox for tenant submissions.
+
+    `enqueue()` commits the row to a SQLite file and returns its reference
+    immediately; a background worker flushes pending rows to Supabase in
+    batches, retrying with exponential backoff. A failed batch is split until
+    the rows that fail on their own are found; only those are retried. Rows carry their reference
+    into Supabase (unique column), so a retried batch never duplicates rows.
+    `date` is left to the database default on purpose: the analytics and
+    change-feed high-water marks rely on it increasing with insert order.
+    """
+
+    def __init__(self, path=WRITE_QUEUE_PATH, sender=None,
+                 flush_seconds=WRITE_QUEUE_FLUSH_SECONDS,
+                 batch_size=WRITE_QUEUE_BATCH_SIZE,
+                 max_attempts=WRITE_QUEUE_MAX_ATTEMPTS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self._sender = sender
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._worker = None
+
+    def _send(self, table, rows):
+        if self._sender is None:
+            from database import insert_rows
+            self._sender = insert_rows
+        return self._sender(table, rows)
+
+    def enqueue(self, kind, payload):
+        table, prefix = KINDS[kind]
+        reference = new_reference(prefix)
+        created = datetime.now(timezone.utc).isoformat()
+        row = {**payload, "reference": reference}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO outbox (reference, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+                (reference, kind, json.dumps(row), created),
+            )
+            self._conn.commit()
+        self._wake.set()
+        return reference
+
+    def flush(self):
+        """Send every due batch once. Returns the number of rows delivered."""
+        delivered = 0
+        for kind, (table, _) in KINDS.items():
+            with self._lock:
+                batch = self._conn.execute(
+                    "SELECT id, payload, attempts FROM outbox"
+                    " WHERE status = 'pending' AND kind = ? AND next_attempt <= ?"
+                    " ORDER BY id LIMIT ?",
+                    (kind, time.time(), self.batch_size),
+                ).fetchall()
+            if not batch:
+                continue
+            sent, failed = self._deliver(table, batch)
+            with self._lock:
+                self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(i,) for i, _, _ in sent])
+                delivered += len(sent)
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ?,"
+                    " status = ? WHERE id = ?",
+                    [(a + 1, now + min(2 ** a, 300), str(error)[:500],
+                      "failed" if a + 1 >= self.max_attempts else "pending", i)
+                     for (i, _, a), error in failed],
+                )
+                self._conn.commit()
+        return delivered
+
+    def _deliver(self, table, batch):
+        """Send `batch`; if the insert fails, split it in halves and send
+        each, so one bad row can't hold back (or fail) the rest. Returns the
+        rows sent and (row, error) for each row that failed on its own."""
+        ok, error = self._send(table, [json.loads(payload) for _, payload, _ in batch])
+        if ok:
+            return batch, []
+        if len(batch) == 1:
+            return [], [(batch[0], error)]
+        middle = len(batch) // 2
+        sent, failed = self._deliver(table, batch[:middle])
+        more_sent, more_failed = self._deliver(table, batch[middle:])
+        return sent + more_sent, failed + more_failed
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="write-queue", daemon=True)
+            self._worker.start()
+
+    def retry_failed(self):
+        with self._lock:
+            self._conn.execute("UPDATE outbox SET status = 'pending', attempts = 0, next_attempt = 0"
+                               " WHERE status = 'failed'")
+            self._conn.commit()
+        self._wake.set()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+            oldest = self._conn.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status = 'pending'").fetchone()[0]
+        return {"pending": counts.get("pending", 0), "failed": counts.get("failed", 0),
+                "oldest_pending": oldest}
+
+
+_queue = None
+_init_lock = threading.Lock()
+
+
+def get_queue():
+    global _queue
+    if _queue is None:
+        with _init_lock:
+            if _queue is None:
+                queue = WriteQueue()
+                queue.start()
+                _queue = queue
+    return _queue
+
+
+def submit_complaint(user_id, tenant_name, unit, subject, category, message):
+    return get_queue().enqueue("complaint", {
+        "user_id": user_id,
+        "tenant_name": tenant_name,
+        "unit": unit,
+        "subject": subject,
+        "category": category,
+        "message": message,
+        "status": "Open",
+    })
+
+
+def submit_feedback(user_id, tenant_name, unit, topic, rating, details, follow_up):
+    return get_queue().enqueue("feedback", {
+        "user_id": user_id,
+        "tenant_name": tenant_name,
+        "unit": unit,
+        "topic": topic,
+        "rating": rating,
+        "details": details,
+        "follow_up": follow_up,
+    })
+
+
+def submit_chat_turn(user_id, session_id, question, answer):
+    return get_queue().enqueue("chat_turn", {
+        "user_id": user_id,
+        "session_id": session_id,
+        "question": question,
+        "answer": answer,
+        "asked_at": datetime.now(timezone.utc).isoformat(),
+    })